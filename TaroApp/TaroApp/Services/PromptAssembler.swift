@@ -1,5 +1,16 @@
 import Foundation
 
+// MARK: - Prompt Layout
+
+/// Section order of the user prompt (mirrored by build_prompt's `layout` in training)
+enum PromptLayout: String, CaseIterable, Codable {
+    /// Timing and question first, then cards
+    case standard
+    /// Most shared sections first (instruction, today's timing, cards, question last)
+    /// so consecutive readings reuse a longer KV-cache prefix
+    case prefixStable = "prefix_stable"
+}
+
 // MARK: - Prompt Assembler
 
 /// Singleton service for building optimized prompts from pre-calculated data
@@ -24,11 +35,13 @@ final class PromptAssembler {
     ///   - drawnCards: The cards drawn for this reading
     ///   - question: Optional user question
     ///   - style: Reading style (balanced, mystical, practical)
+    ///   - layout: Section order (see PromptLayout)
     /// - Returns: Optimized prompt string in Phi-3 chat format
     func assemblePrompt(
         for drawnCards: [DrawnCard],
         question: String?,
-        style: ReadingStyle = .balanced
+        style: ReadingStyle = .balanced,
+        layout: PromptLayout = .standard
     ) -> String {
         // Moon phase context
         let moonPhase = MoonPhaseCalculator.current()
@@ -56,10 +69,19 @@ final class PromptAssembler {
         You are crafting a tarot reading. Weave the provided card interpretations into a cohesive narrative. \(styleInstruction)
         """
 
-        let userPrompt = """
-        \(timingContext)\(questionContext)\(cardContext)\(combinationsContext)\(elementalContext)
-        Weave these elements into a flowing interpretation (3-4 paragraphs). Address the seeker directly. End with actionable insight.
-        """
+        let readingInstruction = "Weave these elements into a flowing interpretation (3-4 paragraphs). Address the seeker directly. End with actionable insight."
+
+        let userPrompt: String
+        switch layout {
+        case .standard:
+            userPrompt = """
+            \(timingContext)\(questionContext)\(cardContext)\(combinationsContext)\(elementalContext)
+            \(readingInstruction)
+            """
+        case .prefixStable:
+            userPrompt = "\(readingInstruction)\n\n\(timingContext)\(cardContext)\(combinationsContext)\(elementalContext)\(questionContext)"
+                .trimmingCharacters(in: .newlines)
+        }
 
         // Use Phi-3 chat format tokens
         return """
@@ -5,17 +5,30 @@ Creates JSON batches that Claude reads and processes directly.
 
 import json
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 
+import eventlog
+from impact import load_resets
 from prompt_generator import TrainingPrompt, load_prompts
 
 
-def create_batch(prompts: List[TrainingPrompt], batch_num: int, output_dir: Path) -> Path:
-    """Create a batch file with prompts for Claude to process."""
+def create_batch(prompts: List[TrainingPrompt], batch_num: int, output_dir: Path,
+                 resets: Optional[Dict[str, int]] = None) -> Path:
+    """
+    Create a batch file with prompts for Claude to process.
+
+    Entries for reset prompts carry their reset generation (see impact.py).
+    """
+    entries = []
+    for p in prompts:
+        entry = {"id": p.id, "input": p.input_text}
+        if resets and p.id in resets:
+            entry["reset"] = resets[p.id]
+        entries.append(entry)
     batch_data = {
         "batch_id": batch_num,
         "output_file": f"responses/batch_{batch_num:04d}_responses.jsonl",
-        "prompts": [{"id": p.id, "input": p.input_text} for p in prompts]
+        "prompts": entries
     }
 
     path = output_dir / f"batch_{batch_num:04d}.json"
@@ -24,26 +37,64 @@ def create_batch(prompts: List[TrainingPrompt], batch_num: int, output_dir: Path
     return path
 
 
+def response_path(output_dir: Path, batch_num: int) -> Path:
+    return output_dir / "responses" / f"batch_{batch_num:04d}_responses.jsonl"
+
+
+def next_batch_number(output_dir: Path) -> int:
+    """One past the highest existing batch number (0 for an empty dir)."""
+    numbers = [int(path.stem.split("_")[1]) for path in output_dir.glob("batch_[0-9]*.json")]
+    return max(numbers) + 1 if numbers else 0
+
+
 def generate_all_batches(
     prompts_path: Path,
     output_dir: Path,
     batch_size: int = 25,
     start_batch: int = 0,
-    max_batches: Optional[int] = None
+    max_batches: Optional[int] = None,
+    order: str = "shuffled",
+    skip: Optional[Set[str]] = None
 ) -> List[Path]:
-    """Generate batch files from prompts."""
+    """
+    Generate batch files from prompts.
+
+    order "shuffled" keeps prompts.json order; "coverage" puts first the
+    prompts that add the most not-yet-covered draw features (see schedule.py).
+    Pending prompts in skip (e.g. already in an unanswered batch) are left
+    out. Raises ValueError rather than overwrite a batch that has a response
+    file, since its prompts would never be offered again.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
     (output_dir / "responses").mkdir(exist_ok=True)
 
     prompts = load_prompts(prompts_path)
-    pending = [p for p in prompts if p.status == "pending"]
+    pending = [p for p in prompts if p.status == "pending" and not (skip and p.id in skip)]
+    resets = load_resets(prompts_path.parent)
 
     print(f"Loaded {len(prompts)} prompts ({len(pending)} pending)")
 
+    if order == "coverage":
+        from schedule import coverage_order, prefix_balance
+        shuffled = pending
+        pending = coverage_order(pending, [p for p in prompts if p.status == "completed"])
+        before, after = prefix_balance(shuffled, 0.1), prefix_balance(pending, 0.1)
+        print(f"Ordered by coverage value. First 10% of pending prompts: "
+              f"{after['covered']}/{after['features']} draw features covered, least covered "
+              f"{after['min_count']}x (shuffled: {before['covered']}, {before['min_count']}x)")
+    elif order != "shuffled":
+        raise ValueError(f"Unknown batch order: {order}")
+
     total_batches = (len(pending) + batch_size - 1) // batch_size
     if max_batches:
         total_batches = min(total_batches, max_batches)
 
+    answered = [start_batch + i for i in range(total_batches)
+                if response_path(output_dir, start_batch + i).exists()]
+    if answered:
+        raise ValueError(f"batch_{answered[0]:04d}.json already has a response file; start after "
+                         f"the last batch with --start {next_batch_number(output_dir)}")
+
     print(f"Creating {total_batches} batches of {batch_size} each")
 
     batch_files = []
@@ -55,8 +106,9 @@ def generate_all_batches(
         if not batch_prompts:
             break
 
-        path = create_batch(batch_prompts, batch_num, output_dir)
+        path = create_batch(batch_prompts, batch_num, output_dir, resets)
         batch_files.append(path)
+        eventlog.emit("batch_written", file=path.name, prompts=len(batch_prompts))
 
         if (i + 1) % 100 == 0:
             print(f"  Created {i + 1} batches...")
@@ -67,6 +119,7 @@ def generate_all_batches(
             "total_prompts": len(prompts),
             "pending": len(pending),
             "batch_size": batch_size,
+            "order": order,
             "total_batches": len(batch_files),
         }, f, indent=2)
 
@@ -111,12 +164,10 @@ Progress: `python run.py status`
 
 def get_next_unprocessed(batches_dir: Path, n: int = 5) -> List[str]:
     """Find next N unprocessed batches."""
-    responses_dir = batches_dir / "responses"
     unprocessed = []
 
-    for batch_file in sorted(batches_dir.glob("batch_*.json")):
-        batch_num = batch_file.stem.split("_")[1]
-        if not (responses_dir / f"batch_{batch_num}_responses.jsonl").exists():
+    for batch_file in sorted(batches_dir.glob("batch_[0-9]*.json")):
+        if not response_path(batches_dir, int(batch_file.stem.split("_")[1])).exists():
             unprocessed.append(batch_file.name)
             if len(unprocessed) >= n:
                 break
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the training data pipeline.
+
+Usage:
+    python bench.py parser --size-mb 300     # Stream-parse a synthetic response dump
+    python run.py bench                      # Hot-path suite vs the saved baseline
+    python run.py bench --save-baseline      # Record the current numbers as baseline
+"""
+
+import contextlib
+import io
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import eventlog
+from response_parser import iter_jsonl, parse_jsonl
+
+SAMPLE_RESPONSE = (
+    "The cards reveal a meaningful arc in response to your question. "
+    "Beginning with The Star in the Past position, the foundation is set. "
+    "Hope and renewal shaped the path that led you here.\n\n"
+    "Moving deeper into the reading, the Three of Cups reversed occupies "
+    "your Present position — energy working beneath the surface. "
+)
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def write_response_dump(path: Path, size_mb: int, seed: int = 42) -> Dict[str, int]:
+    """
+    Write a synthetic response dump mixing the shapes Claude sessions produce:
+    plain JSONL, fenced blocks, concatenated objects, pretty-printed objects
+    and malformed lines.
+    """
+    rng = random.Random(seed)
+    target = size_mb << 20
+    written = 0
+    counts = {"records": 0, "malformed": 0}
+
+    def record() -> Dict[str, str]:
+        counts["records"] += 1
+        rid = f"{rng.getrandbits(48):012x}"
+        return {"id": rid, "response": SAMPLE_RESPONSE * rng.randint(2, 6)}
+
+    with open(path, "w") as f:
+        while written < target:
+            kind = rng.random()
+            if kind < 0.70:
+                text = json.dumps(record()) + "\n"
+            elif kind < 0.80:
+                text = "```jsonl\n" + json.dumps(record()) + "\n" + json.dumps(record()) + "\n```\n"
+            elif kind < 0.90:
+                text = json.dumps(record()) + json.dumps(record()) + "\n"
+            elif kind < 0.98:
+                text = json.dumps(record(), indent=2) + "\n"
+            else:
+                counts["malformed"] += 1
+                text = '{"id": "broken", "response": "unterminated\n'
+            f.write(text)
+            written += len(text)
+
+    counts["bytes"] = path.stat().st_size
+    return counts
+
+
+def bench_parser(size_mb: int = 300, compare: bool = False) -> Dict:
+    """Time streaming parse of a synthetic dump, optionally against whole-file parsing."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "responses.jsonl"
+        print(f"Writing {size_mb} MB synthetic response dump...")
+        expected = write_response_dump(path, size_mb)
+        mb = expected["bytes"] / (1 << 20)
+
+        rss_before = _peak_rss_mb()
+        errors = []
+        start = time.perf_counter()
+        records = sum(1 for _ in iter_jsonl(path, errors))
+        elapsed = time.perf_counter() - start
+        result = {
+            "size_mb": round(mb, 1),
+            "records": records,
+            "expected_records": expected["records"],
+            "errors": len(errors),
+            "expected_errors": expected["malformed"],
+            "stream_seconds": round(elapsed, 3),
+            "stream_mb_per_s": round(mb / elapsed, 1),
+            "stream_peak_rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+        }
+
+        if compare:
+            rss_before = _peak_rss_mb()
+            start = time.perf_counter()
+            responses, _ = parse_jsonl(path.read_text())
+            elapsed = time.perf_counter() - start
+            result["whole_file_seconds"] = round(elapsed, 3)
+            result["whole_file_peak_rss_growth_mb"] = round(_peak_rss_mb() - rss_before, 1)
+            del responses
+
+    return result
+
+
+# MARK: - Suite
+
+BASELINE_FILE = "bench_baseline.json"
+GENERATE_SIZES = (1000, 25000, 200000)
+
+
+def _best_of(fn: Callable[[], None], repeat: int) -> float:
+    """Minimum wall time of repeat calls; the minimum is the least noisy estimate."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _result(seconds: float, items: int, unit: str) -> Dict:
+    return {
+        "seconds": round(seconds, 4),
+        "items": items,
+        "unit": unit,
+        "per_s": round(items / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def bench_build_prompt(n: int = 2000, repeat: int = 5) -> Dict[str, Dict]:
+    """build_prompt throughput per spread over pre-drawn cards."""
+    from prompt_generator import SPREADS, build_prompt, draw_cards, get_random_moon_phase, sample_question
+    results = {}
+    for spread_id in SPREADS:
+        rng = random.Random(42)
+        inputs = [(draw_cards(spread_id, rng), sample_question(rng)[0], get_random_moon_phase(rng))
+                  for _ in range(n)]
+
+        def run():
+            for cards, question, phase in inputs:
+                build_prompt(cards, question, style="balanced", moon_phase=phase)
+
+        results[f"build_prompt/{spread_id}"] = _result(_best_of(run, repeat), n, "prompts")
+    return results
+
+
+def bench_generate(sizes: Sequence[int] = GENERATE_SIZES) -> Dict[str, Dict]:
+    from prompt_generator import generate_dataset
+    results = {}
+    for count in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            seconds = _best_of(lambda: generate_dataset(count, seed=42), 1 if count > 10000 else 3)
+        results[f"generate_dataset/{count}"] = _result(seconds, count, "prompts")
+    return results
+
+
+def bench_variants(draws: int = 200, repeat: int = 3) -> Dict[str, Dict]:
+    """Every style x moon phase per draw: build_prompt per variant vs sections computed once."""
+    from prompt_generator import (
+        MOON_PHASES, SPREADS, STYLE_INSTRUCTIONS, build_prompt, draw_cards,
+        prompt_sections, render_prompt, sample_question,
+    )
+    rng = random.Random(42)
+    spread_ids = list(SPREADS)
+    draws_ = [(draw_cards(spread_ids[i % len(spread_ids)], rng), sample_question(rng)[0])
+              for i in range(draws)]
+    variants = [(style, phase) for style in STYLE_INSTRUCTIONS for phase in MOON_PHASES]
+
+    def per_variant():
+        for cards, question in draws_:
+            for style, phase in variants:
+                build_prompt(cards, question, style, phase)
+
+    def cached_sections():
+        for cards, question in draws_:
+            sections = prompt_sections(cards)
+            for style, phase in variants:
+                render_prompt(sections, question, style, phase)
+
+    n = draws * len(variants)
+    slow = _result(_best_of(per_variant, repeat), n, "prompts")
+    fast = _result(_best_of(cached_sections, repeat), n, "prompts")
+    fast["speedup"] = round(slow["seconds"] / fast["seconds"], 2) if fast["seconds"] else None
+    return {"variants/build_prompt": slow, "variants/sections_render": fast}
+
+
+def bench_parse_jsonl(size_mb: int = 20, repeat: int = 3) -> Dict[str, Dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "responses.jsonl"
+        write_response_dump(path, size_mb)
+        text = path.read_text()
+    records = len(parse_jsonl(text)[0])
+    return {"parse_jsonl": _result(_best_of(lambda: parse_jsonl(text), repeat), records, "records")}
+
+
+def bench_merge_convert(count: int = 5000, files: int = 10) -> Dict[str, Dict]:
+    """merge_responses and convert_to_sft on a synthetic dataset with every prompt answered."""
+    from convert_to_sft import convert_to_sft
+    from prompt_generator import generate_dataset, save_prompts
+    from response_parser import merge_responses
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        tmp = Path(tmp)
+        prompts_path = tmp / "prompts.json"
+        prompts = generate_dataset(count, seed=42)
+        save_prompts(prompts, prompts_path)
+
+        responses_dir = tmp / "responses"
+        responses_dir.mkdir()
+        handles = [open(responses_dir / f"responses_{i:04d}.jsonl", "w") for i in range(files)]
+        for i, p in enumerate(prompts):
+            record = {"id": p.id, "response": SAMPLE_RESPONSE * rng.randint(2, 6)}
+            handles[i % files].write(json.dumps(record) + "\n")
+        for f in handles:
+            f.close()
+        del prompts
+
+        start = time.perf_counter()
+        merge_responses(prompts_path, responses_dir)
+        merge_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert_to_sft(prompts_path, tmp / "sft")
+        convert_seconds = time.perf_counter() - start
+
+    return {
+        "merge_responses": _result(merge_seconds, count, "responses"),
+        "convert_to_sft": _result(convert_seconds, count, "examples"),
+    }
+
+
+SUITE_GROUPS = ("build_prompt", "variants", "generate_dataset", "parse_jsonl", "merge")
+
+
+def run_suite(generate_sizes: Sequence[int] = GENERATE_SIZES,
+              groups: Sequence[str] = SUITE_GROUPS) -> Dict[str, Dict]:
+    """
+    Run the selected benchmark groups; 'merge' covers merge_responses and convert_to_sft.
+
+    The event log is suspended so synthetic ingests and stages stay out of it.
+    """
+    runners = {
+        "build_prompt": bench_build_prompt,
+        "variants": bench_variants,
+        "generate_dataset": lambda: bench_generate(generate_sizes),
+        "parse_jsonl": bench_parse_jsonl,
+        "merge": bench_merge_convert,
+    }
+    results = {}
+    with eventlog.suspended():
+        for name in SUITE_GROUPS:
+            if name in groups:
+                print(f"  {name}...", flush=True)
+                results.update(runners[name]())
+    return results
+
+
+def load_baseline(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, Dict]):
+    """Merge results into the baseline file, keeping benchmarks not re-run."""
+    baseline = load_baseline(path) or {"results": {}}
+    baseline["results"].update(results)
+    baseline.update({
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+    })
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float = 0.2) -> List[Dict]:
+    """One row per benchmark; regressed when slower than baseline by more than threshold."""
+    rows = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        change = None
+        if base and base["seconds"] > 0:
+            change = r["seconds"] / base["seconds"] - 1
+        rows.append({
+            "name": name,
+            "seconds": r["seconds"],
+            "per_s": r["per_s"],
+            "unit": r["unit"],
+            "baseline_seconds": base["seconds"] if base else None,
+            "change": change,
+            "regressed": change is not None and change > threshold,
+        })
+    return rows
+
+
+def format_comparison(rows: List[Dict], threshold: float) -> str:
+    lines = [f"{'benchmark':<28} {'seconds':>9} {'throughput':>20} {'baseline':>9} {'change':>8}"]
+    for r in rows:
+        rate = f"{r['per_s']:,.0f} {r['unit']}/s" if r["per_s"] else "-"
+        base = f"{r['baseline_seconds']:.4f}" if r["baseline_seconds"] is not None else "-"
+        change = f"{r['change'] * 100:+.1f}%" if r["change"] is not None else "new"
+        flag = "  REGRESSION" if r["regressed"] else ""
+        lines.append(f"{r['name']:<28} {r['seconds']:>9.4f} {rate:>20} {base:>9} {change:>8}{flag}")
+    regressions = sum(r["regressed"] for r in rows)
+    lines.append(f"\n{regressions} regression(s) beyond {threshold * 100:.0f}%")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks")
+    sub = parser.add_subparsers(dest="bench")
+    p = sub.add_parser("parser", help="Streaming response parser")
+    p.add_argument("--size-mb", type=int, default=300)
+    p.add_argument("--compare", action="store_true", help="Also time whole-file parse_jsonl")
+    args = parser.parse_args()
+
+    if args.bench == "parser":
+        result = bench_parser(args.size_mb, args.compare)
+        print(json.dumps(result, indent=2))
+    else:
+        parser.print_help()
@@ -0,0 +1,55 @@
+"""
+Atomic checkpoints for long-running generation.
+
+A checkpoint is a small JSON file holding an RNG state, a loop position and
+the byte offset up to which the output file was flushed when it was taken.
+Resuming truncates the output back to that offset, restores the RNG and
+continues, so the result is identical to an uninterrupted run.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fsutil import atomic_write_json
+
+
+def rng_state(rng) -> list:
+    """JSON-serialisable state of a random.Random (or the random module)."""
+    version, internal, gauss_next = rng.getstate()
+    return [version, list(internal), gauss_next]
+
+
+def restore_rng(rng, state: list):
+    version, internal, gauss_next = state
+    rng.setstate((version, tuple(internal), gauss_next))
+
+
+def save_checkpoint(path: Path, output, **state: Any):
+    """Flush and fsync output, then atomically record its offset with state."""
+    output.flush()
+    os.fsync(output.fileno())
+    atomic_write_json(path, {"offset": output.tell(), **state}, indent=None)
+
+
+def load_checkpoint(path: Path) -> Optional[Dict]:
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def reopen_output(path: Path, checkpoint: Optional[Dict]):
+    """Open output for appending after truncating it to the checkpoint offset."""
+    if checkpoint is None:
+        return open(path, "wb")
+    with open(path, "r+b") as f:
+        f.truncate(checkpoint["offset"])
+    return open(path, "ab")
+
+
+def clear_checkpoint(path: Path, *outputs: Path):
+    for p in (path, *outputs):
+        if p.exists():
+            p.unlink()
@@ -2,12 +2,18 @@
 Convert completed prompts to SFT training format for MLX.
 """
 
+import hashlib
 import json
 import random
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Set
 
-from prompt_generator import TrainingPrompt, load_prompts
+from profiling import timed
+from prompt_generator import TrainingPrompt, load_prompts, iter_prompts, estimate_tokens
+
+SPLITS = ("train", "valid", "test")
+IDS_FILE = "ids.tsv"
+PACK_SEPARATOR = "\n"
 
 SYSTEM_PROMPT = """You are a wise tarot reader with deep knowledge of card symbolism and archetypes. Provide thoughtful interpretations that:
 - Honor traditional meanings while offering fresh perspectives
@@ -18,6 +24,7 @@ SYSTEM_PROMPT = """You are a wise tarot reader with deep knowledge of card symbo
 - Offer guidance without fortune-telling"""
 
 
+@timed("format_for_phi")
 def format_for_phi(prompt: TrainingPrompt) -> Dict[str, str]:
     """Format for Phi chat template."""
     return {"text": f"""<|system|>
@@ -31,19 +38,77 @@ def format_for_phi(prompt: TrainingPrompt) -> Dict[str, str]:
 <|end|>"""}
 
 
+@timed("format_canonical")
+def format_canonical(prompt: TrainingPrompt) -> Dict[str, str]:
+    """
+    Single chat structure: the iOS-format prompt followed by the response.
+
+    input_text already holds a complete <|system|>/<|user|>/<|assistant|>
+    prompt, so this trains on exactly what the app sends at inference time
+    without a second system block or nested role markers.
+    """
+    return {"text": f"{prompt.input_text}{prompt.response}<|end|>"}
+
+
+FORMATS = {
+    "phi": format_for_phi,
+    "canonical": format_canonical,
+}
+
+
+def format_savings(prompts_path: Path,
+                   count_tokens: Optional[Callable[[str], int]] = None) -> Dict[str, Dict]:
+    """Average tokens per example by spread for each format, over completed prompts."""
+    count_tokens = count_tokens or estimate_tokens
+    totals: Dict[str, Dict[str, int]] = {}
+    for p in iter_prompts(prompts_path):
+        if p.status != "completed" or not p.response:
+            continue
+        t = totals.setdefault(p.spread_name, {"examples": 0, **{name: 0 for name in FORMATS}})
+        t["examples"] += 1
+        for name, fmt in FORMATS.items():
+            t[name] += count_tokens(fmt(p)["text"])
+
+    report = {}
+    for spread, t in totals.items():
+        n = t["examples"]
+        phi, canonical = t["phi"] / n, t["canonical"] / n
+        report[spread] = {
+            "examples": n,
+            "phi_tokens": round(phi, 1),
+            "canonical_tokens": round(canonical, 1),
+            "saved_per_example": round(phi - canonical, 1),
+            "saved_pct": round((phi - canonical) / phi * 100, 1),
+        }
+    return report
+
+
 def convert_to_sft(
     prompts_path: Path,
     output_dir: Path,
     train_ratio: float = 0.9,
     valid_ratio: float = 0.05,
-    seed: int = 42
+    seed: int = 42,
+    exclude_ids: Optional[Set[str]] = None,
+    fmt: str = "phi"
 ) -> Dict[str, int]:
-    """Convert to train/valid/test JSONL files."""
+    """
+    Convert to train/valid/test JSONL files, skipping any IDs in exclude_ids.
+
+    ids.tsv is rewritten to match, so no IDs from an earlier streaming run
+    survive the reshuffle.
+    """
+    format_example = FORMATS[fmt]
     output_dir.mkdir(parents=True, exist_ok=True)
 
     prompts = load_prompts(prompts_path)
     completed = [p for p in prompts if p.status == "completed" and p.response]
 
+    if exclude_ids:
+        before = len(completed)
+        completed = [p for p in completed if p.id not in exclude_ids]
+        print(f"Excluded {before - len(completed)} near-duplicates")
+
     if not completed:
         raise ValueError("No completed prompts found")
 
@@ -63,20 +128,211 @@ def convert_to_sft(
     }
 
     counts = {}
-    for name, data in splits.items():
-        path = output_dir / f"{name}.jsonl"
-        with open(path, 'w') as f:
-            for p in data:
-                f.write(json.dumps(format_for_phi(p)) + '\n')
-        counts[name] = len(data)
-        print(f"  {name}: {len(data)}")
+    with open(output_dir / IDS_FILE, 'w') as ids_file:
+        for name, data in splits.items():
+            path = output_dir / f"{name}.jsonl"
+            with open(path, 'w') as f:
+                for p in data:
+                    f.write(json.dumps(format_example(p)) + '\n')
+                    ids_file.write(f"{p.id}\t{name}\n")
+            counts[name] = len(data)
+            print(f"  {name}: {len(data)}")
 
     with open(output_dir / "metadata.json", 'w') as f:
-        json.dump({"total_examples": len(completed), "splits": counts, "seed": seed}, f, indent=2)
+        json.dump({"total_examples": len(completed), "splits": counts, "split_mode": "shuffled",
+                   "seed": seed, "format": fmt}, f, indent=2)
+
+    return counts
+
+
+def hash_split(prompt_id: str, train_ratio: float = 0.9, valid_ratio: float = 0.05) -> str:
+    """Assign a split from a hash of the prompt ID, independent of dataset size."""
+    x = int(hashlib.md5(prompt_id.encode()).hexdigest()[:8], 16) / 0x100000000
+    if x < train_ratio:
+        return "train"
+    if x < train_ratio + valid_ratio:
+        return "valid"
+    return "test"
+
+
+def load_written_ids(output_dir: Path) -> Dict[str, str]:
+    """IDs already written to the split files, mapped to their split."""
+    path = output_dir / IDS_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return dict(line.rstrip("\n").split("\t") for line in f if line.strip())
+
+
+def convert_to_sft_streaming(
+    prompts_path: Path,
+    output_dir: Path,
+    train_ratio: float = 0.9,
+    valid_ratio: float = 0.05,
+    exclude_ids: Optional[Set[str]] = None,
+    fmt: str = "phi"
+) -> Dict[str, int]:
+    """
+    Append newly completed prompts to train/valid/test JSONL files.
+
+    Splits are chosen by hash_split, so an example never moves between splits
+    and existing eval sets stay comparable as the dataset grows. Prompts are
+    streamed and only IDs already written (ids.tsv) are held in memory.
+    Existing split files from a shuffled conversion, different ratios or a
+    different format are rewritten from scratch once, as they are when
+    exclude_ids (e.g. a newer duplicates.json) covers an example already
+    written, since appending can't remove it.
+    """
+    format_example = FORMATS[fmt]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    metadata_path = output_dir / "metadata.json"
+
+    meta = {}
+    if metadata_path.exists():
+        with open(metadata_path) as f:
+            meta = json.load(f)
+    ratios = {"train_ratio": train_ratio, "valid_ratio": valid_ratio}
+    append = (meta.get("split_mode") == "hash" and meta.get("ratios") == ratios
+              and meta.get("format", "phi") == fmt)
+
+    written = load_written_ids(output_dir) if append else {}
+    if exclude_ids and any(pid in exclude_ids for pid in written):
+        print("Some written examples are now excluded")
+        append = False
+        written = {}
+    counts = {name: 0 for name in SPLITS}
+    for split in written.values():
+        counts[split] += 1
+
+    print("Appending to existing hash splits" if append else "Writing new hash splits")
+    mode = 'a' if append else 'w'
+    files = {name: open(output_dir / f"{name}.jsonl", mode) for name in SPLITS}
+    added = {name: 0 for name in SPLITS}
+    try:
+        with open(output_dir / IDS_FILE, mode) as ids_file:
+            for p in iter_prompts(prompts_path):
+                if p.status != "completed" or not p.response or p.id in written:
+                    continue
+                if exclude_ids and p.id in exclude_ids:
+                    continue
+                split = hash_split(p.id, train_ratio, valid_ratio)
+                files[split].write(json.dumps(format_example(p)) + '\n')
+                ids_file.write(f"{p.id}\t{split}\n")
+                written[p.id] = split
+                added[split] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    for name in SPLITS:
+        counts[name] += added[name]
+        print(f"  {name}: {counts[name]} (+{added[name]})")
+
+    with open(metadata_path, 'w') as f:
+        json.dump({
+            "total_examples": sum(counts.values()),
+            "splits": counts,
+            "split_mode": "hash",
+            "ratios": ratios,
+            "format": fmt,
+        }, f, indent=2)
 
     return counts
 
 
+def first_fit_decreasing(lengths: List[int], capacity: int) -> List[List[int]]:
+    """
+    Pack items into bins of the given capacity with first-fit-decreasing.
+
+    Returns bins as lists of item indices. A max segment tree over remaining
+    bin capacity finds the first fitting bin in O(log n). Items larger than
+    the capacity get a bin of their own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    size = 1
+    while size < max(len(lengths), 1):
+        size *= 2
+    tree = [capacity] * (2 * size)   # tree[size + b] = remaining capacity of bin b
+    bins: List[List[int]] = []
+    oversized: List[List[int]] = []
+
+    for i in order:
+        need = lengths[i]
+        if need > capacity:
+            oversized.append([i])
+            continue
+        node = 1
+        while node < size:
+            node = 2 * node if tree[2 * node] >= need else 2 * node + 1
+        b = node - size
+        if b == len(bins):
+            bins.append([])
+        bins[b].append(i)
+        tree[node] -= need
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+
+    return bins + oversized
+
+
+def pack_split(input_path: Path, output_path: Path, max_tokens: int = 2048) -> Dict:
+    """
+    Pack a split's examples into sequences of up to max_tokens estimated tokens.
+
+    Each output line holds the concatenated texts plus "segments", the
+    [start, end) character span of every original example, so loaders that
+    reset attention at example boundaries can do so.
+    """
+    with open(input_path) as f:
+        texts = [json.loads(line)["text"] for line in f if line.strip()]
+    lengths = [estimate_tokens(t) for t in texts]
+    # n examples need n - 1 separators: charge one per example and allow one extra
+    sep = estimate_tokens(PACK_SEPARATOR)
+    bins = first_fit_decreasing([n + sep for n in lengths], max_tokens + sep)
+
+    with open(output_path, 'w') as f:
+        for b in bins:
+            parts, segments, pos = [], [], 0
+            for i in b:
+                if parts:
+                    pos += len(PACK_SEPARATOR)
+                segments.append([pos, pos + len(texts[i])])
+                parts.append(texts[i])
+                pos += len(texts[i])
+            f.write(json.dumps({"text": PACK_SEPARATOR.join(parts), "segments": segments}) + '\n')
+
+    used = sum(lengths)
+    return {
+        "examples": len(texts),
+        "sequences": len(bins),
+        "tokens": used,
+        "efficiency": used / (len(bins) * max_tokens) if bins else 0.0,
+        "oversized": sum(1 for n in lengths if n > max_tokens),
+    }
+
+
+def pack_sft(sft_dir: Path, max_tokens: int = 2048) -> Dict[str, Dict]:
+    """Pack every split in sft_dir into sft_dir/packed/ and report efficiency."""
+    packed_dir = sft_dir / "packed"
+    packed_dir.mkdir(exist_ok=True)
+
+    stats = {}
+    for name in SPLITS:
+        path = sft_dir / f"{name}.jsonl"
+        if not path.exists():
+            continue
+        stats[name] = pack_split(path, packed_dir / f"{name}.jsonl", max_tokens)
+        s = stats[name]
+        print(f"  {name}: {s['examples']} examples -> {s['sequences']} sequences "
+              f"({s['efficiency'] * 100:.1f}% efficiency)")
+
+    with open(packed_dir / "metadata.json", 'w') as f:
+        json.dump({"max_tokens": max_tokens, "splits": stats}, f, indent=2)
+    return stats
+
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
@@ -85,13 +341,25 @@ if __name__ == "__main__":
     parser.add_argument("--train-ratio", type=float, default=0.9)
     parser.add_argument("--valid-ratio", type=float, default=0.05)
     parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="phi")
     args = parser.parse_args()
 
     base = Path(__file__).parent
-    convert_to_sft(
-        base / args.prompts,
-        base / args.output_dir,
-        args.train_ratio,
-        args.valid_ratio,
-        args.seed
-    )
+    if args.streaming:
+        convert_to_sft_streaming(
+            base / args.prompts,
+            base / args.output_dir,
+            args.train_ratio,
+            args.valid_ratio,
+            fmt=args.format
+        )
+    else:
+        convert_to_sft(
+            base / args.prompts,
+            base / args.output_dir,
+            args.train_ratio,
+            args.valid_ratio,
+            args.seed,
+            fmt=args.format
+        )
@@ -0,0 +1,227 @@
+"""
+Near-duplicate response detection with MinHash + LSH.
+
+Template-driven and long-session responses often differ by a few words.
+Each response is shingled into word n-grams and summarised by a MinHash
+signature; locality-sensitive hashing over signature bands finds candidate
+pairs in roughly linear time, and candidates whose estimated Jaccard
+similarity clears the threshold are unioned into clusters.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import re
+from array import array
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from prompt_generator import load_prompts
+
+DUPLICATES_FILE = "duplicates.json"
+
+_WORD_RE = re.compile(r"\w+")
+_MAX_HASH = (1 << 64) - 1
+# Cluster representatives per LSH bucket a new text is matched against, and
+# how many of those candidates are verified
+MAX_CANDIDATES = 64
+MAX_VERIFIED = 16
+
+
+def shingles(text: str, size: int = 5) -> Set[str]:
+    """Lower-cased word n-grams of a response."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text: str, num_perm: int = 128, shingle_size: int = 5) -> array:
+    """
+    MinHash signature using one-permutation hashing.
+
+    Each shingle is hashed once; the hash picks a bin and the per-bin minimum
+    becomes that signature slot. Empty bins borrow from the next non-empty bin
+    (rotation densification), so signatures of short texts stay comparable.
+    """
+    sig = array("Q", [_MAX_HASH]) * num_perm
+    for sh in shingles(text, shingle_size):
+        h = int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=8).digest(), "little")
+        b, v = h % num_perm, h // num_perm
+        if v < sig[b]:
+            sig[b] = v
+
+    filled = [i for i in range(num_perm) if sig[i] != _MAX_HASH]
+    if filled and len(filled) < num_perm:
+        out = array("Q", sig)
+        for i in range(num_perm):
+            if sig[i] == _MAX_HASH:
+                # Nearest filled bin to the right, wrapping around
+                for step in range(1, num_perm):
+                    j = (i + step) % num_perm
+                    if sig[j] != _MAX_HASH:
+                        out[i] = (sig[j] + step) & _MAX_HASH
+                        break
+        sig = out
+    return sig
+
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _signature_worker(args: Tuple[str, int, int]) -> bytes:
+    text, num_perm, shingle_size = args
+    return minhash(text, num_perm, shingle_size).tobytes()
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the earliest index as root so it becomes the kept example
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def find_near_duplicates(
+    texts: List[str],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    bands: int = 16,
+    shingle_size: int = 5,
+    workers: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Cluster near-duplicate texts. Returns clusters (lists of indices, size > 1)
+    whose first element is the earliest text and should be kept.
+    """
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+    workers = workers or os.cpu_count() or 1
+
+    jobs = ((t, num_perm, shingle_size) for t in texts)
+    if workers > 1 and len(texts) > 1000:
+        with Pool(workers) as pool:
+            raw = pool.imap(_signature_worker, jobs, chunksize=256)
+            signatures = [array("Q", r) for r in raw]
+    else:
+        signatures = [array("Q", _signature_worker(j)) for j in jobs]
+
+    # Each bucket keeps one representative per cluster. A text counts how many
+    # bands it shares with the last MAX_CANDIDATES representatives of each of
+    # its buckets and verifies only the MAX_VERIFIED most frequent (more shared
+    # bands means higher similarity), so texts that share bands without
+    # clearing the threshold, as template answers do, cost a bounded amount
+    uf = _UnionFind(len(texts))
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+    for i, sig in enumerate(signatures):
+        keys = [sig[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        shared: Dict[int, int] = {}
+        for band, key in enumerate(keys):
+            for j in buckets[band].get(key, ())[-MAX_CANDIDATES:]:
+                shared[j] = shared.get(j, 0) + 1
+        for j in heapq.nlargest(MAX_VERIFIED, shared, key=shared.__getitem__):
+            if uf.find(j) != uf.find(i) and similarity(signatures[j], sig) >= threshold:
+                uf.union(j, i)
+        root = uf.find(i)
+        for band, key in enumerate(keys):
+            members = buckets[band].setdefault(key, [])
+            if not any(uf.find(j) == root for j in members[-MAX_CANDIDATES:]):
+                members.append(i)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(uf.find(i), []).append(i)
+    return [c for c in clusters.values() if len(c) > 1]
+
+
+def dedup_responses(
+    prompts_path: Path,
+    output_path: Path,
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    bands: int = 16,
+    shingle_size: int = 5,
+    workers: Optional[int] = None
+) -> Dict:
+    """Find near-duplicate completed responses and write the duplicates file."""
+    prompts = load_prompts(prompts_path)
+    completed = [p for p in prompts if p.status == "completed" and p.response]
+    del prompts
+
+    print(f"Hashing {len(completed)} responses ({num_perm} perms, {bands} bands)...")
+    clusters = find_near_duplicates(
+        [p.response for p in completed], threshold, num_perm, bands, shingle_size, workers
+    )
+
+    duplicates = {}
+    id_clusters = []
+    for cluster in clusters:
+        ids = [completed[i].id for i in cluster]
+        id_clusters.append(ids)
+        for dup in ids[1:]:
+            duplicates[dup] = ids[0]
+
+    result = {
+        "params": {
+            "threshold": threshold,
+            "num_perm": num_perm,
+            "bands": bands,
+            "shingle_size": shingle_size,
+        },
+        "total_responses": len(completed),
+        "clusters": id_clusters,
+        "duplicates": duplicates,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print(f"Found {len(duplicates)} near-duplicates in {len(clusters)} clusters")
+    return result
+
+
+def load_duplicate_ids(path: Path) -> Set[str]:
+    """IDs marked as near-duplicates (the first example of each cluster is kept)."""
+    if not path.exists():
+        return set()
+    with open(path) as f:
+        return set(json.load(f)["duplicates"])
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", default="../data/prompts.json")
+    parser.add_argument("--output", default=f"../data/{DUPLICATES_FILE}")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=16)
+    parser.add_argument("--shingle-size", type=int, default=5)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    base = Path(__file__).parent
+    dedup_responses(
+        base / args.prompts,
+        base / args.output,
+        args.threshold,
+        args.num_perm,
+        args.bands,
+        args.shingle_size,
+        args.workers
+    )
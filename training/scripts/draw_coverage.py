@@ -0,0 +1,225 @@
+"""
+Coverage of the draw space among (completed) prompts.
+
+Draws from draws.tsv are parsed into integer arrays once, straight from the
+file's bytes with numpy rather than building a Draw per line, and the
+matrices are numpy.bincount calls over combined integer codes, so a million
+records take a couple of seconds and nothing is rendered:
+
+    cells      card x position id x orientation
+    pairs      card x card co-occurrence within a draw
+    combos     count per entry of combinations.json (all its cards drawn)
+    questions  question x spread
+
+Requires numpy.
+"""
+
+import csv
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from draws import QUESTION_LIST, SPREAD_IDS, draws_path
+from prompt_generator import CARDS, COMBINATIONS, SPREADS
+
+POSITION_IDS = sorted({p["id"] for s in SPREADS.values() for p in s["positions"]})
+MAX_POSITIONS = max(len(s["positions"]) for s in SPREADS.values())
+MATRICES = ("cells", "pairs", "combos", "questions")
+HEATMAP_RAMP = " .:-=+*#%@"
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("coverage needs numpy: pip install numpy")
+    return np
+
+
+def load_arrays(data_dir: Path, status: Optional[str] = "completed") -> Dict:
+    """
+    Integer-coded draws: spread and question index per draw, and card codes
+    (card * 2 + reversed) padded to MAX_POSITIONS with -1.
+    """
+    return parse_arrays(draws_path(data_dir), status)
+
+
+def _small_ints(np, buf, lo, hi, max_digits: int = 4):
+    """Parse the decimal integers buf[lo:hi] (optionally negative) in bulk."""
+    negative = buf[np.minimum(lo, len(buf) - 1)] == ord("-")
+    lo = lo + negative
+    width = hi - lo
+    value = np.zeros(len(lo), dtype=np.int32)
+    for k in range(max_digits):
+        digit = buf[np.minimum(lo + k, len(buf) - 1)].astype(np.int32) - ord("0")
+        value = np.where(k < width, value * 10 + digit, value)
+    return np.where(negative, -value, value)
+
+
+def _field_is(np, buf, lo, hi, word: str):
+    """Whether each field buf[lo:hi] equals word."""
+    match = (hi - lo) == len(word)
+    for k, byte in enumerate(word.encode()):
+        match &= buf[np.minimum(lo + k, len(buf) - 1)] == byte
+    return match
+
+
+def parse_arrays(path: Path, status: Optional[str] = "completed") -> Dict:
+    """
+    load_arrays for a draws.tsv file (columns in draws.py), parsed as bytes
+    with numpy: field boundaries come from the tab and newline positions,
+    and every space is a separator between card codes.
+    """
+    np = _numpy()
+    raw = np.fromfile(path, dtype=np.uint8)
+    buf = raw[int(np.argmax(raw == ord("\n"))) + 1:]     # skip the stamp line
+    ends = np.flatnonzero(buf == ord("\n"))
+    tabs = np.flatnonzero(buf == ord("\t")).reshape(len(ends), 5)
+
+    spreads = np.zeros(len(ends), dtype=np.int16)
+    for i, sid in enumerate(SPREAD_IDS):
+        spreads[_field_is(np, buf, tabs[:, 0] + 1, tabs[:, 1], sid)] = i
+    questions = _small_ints(np, buf, tabs[:, 2] + 1, tabs[:, 3]).astype(np.int16)
+
+    spaces = np.flatnonzero(buf == ord(" "))
+    starts = np.sort(np.concatenate([tabs[:, 4] + 1, spaces + 1]))
+    stops = np.sort(np.concatenate([spaces, ends]))
+    codes = _small_ints(np, buf, starts, stops).astype(np.int16)
+    lengths = np.array([len(SPREADS[sid]["positions"]) for sid in SPREAD_IDS])[spreads]
+    if len(codes) != lengths.sum():
+        raise ValueError(f"{path}: card codes do not match the spreads' positions")
+    # Each row's codes fill its first len(positions) columns, row by row
+    padded = np.full((len(ends), MAX_POSITIONS), -1, dtype=np.int16)
+    padded[np.arange(MAX_POSITIONS) < lengths[:, None]] = codes
+
+    keep = _field_is(np, buf, tabs[:, 3] + 1, tabs[:, 4], status) if status else slice(None)
+    return {"spread": spreads[keep], "question": questions[keep], "codes": padded[keep]}
+
+
+def coverage_matrices(arrays: Dict) -> Dict:
+    np = _numpy()
+    n_cards, n_pos = len(CARDS), len(POSITION_IDS)
+    spread = arrays["spread"]
+
+    # Group draws by spread so each group is a dense (draws, positions) block
+    order = np.argsort(spread, kind="stable")
+    codes = arrays["codes"][order].astype(np.int64)
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(spread, minlength=len(SPREAD_IDS)))])
+
+    cells = np.zeros(n_cards * n_pos * 2, dtype=np.int64)
+    pairs = np.zeros(n_cards * n_cards, dtype=np.int64)
+    for i, sid in enumerate(SPREAD_IDS):
+        positions = SPREADS[sid]["positions"]
+        block = codes[bounds[i]:bounds[i + 1], :len(positions)]
+        pos = np.array([POSITION_IDS.index(p["id"]) for p in positions], dtype=np.int64)
+        card = block >> 1
+        cells += np.bincount(((card * n_pos + pos) * 2 + (block & 1)).ravel(), minlength=cells.size)
+        for j in range(len(positions)):
+            for k in range(j + 1, len(positions)):
+                a, b = card[:, j], card[:, k]
+                pairs += np.bincount(np.minimum(a, b) * n_cards + np.maximum(a, b), minlength=pairs.size)
+    cells = cells.reshape(n_cards, n_pos, 2)
+    pairs = pairs.reshape(n_cards, n_cards)
+    pairs = pairs + np.triu(pairs, 1).T
+
+    # Cards are drawn without replacement, so a two-card combination's count
+    # is its pair count; longer ones check a card-presence matrix
+    index = {c["name"]: i for i, c in enumerate(CARDS)}
+    present = None
+    combos = []
+    for c in COMBINATIONS:
+        cards = [index[name] for name in c["cards"]]
+        if len(cards) == 2:
+            combos.append(pairs[cards[0], cards[1]])
+            continue
+        if present is None:
+            present = np.zeros((n_cards, len(codes)), dtype=bool)
+            rows, cols = np.nonzero(codes >= 0)
+            present[codes[rows, cols] >> 1, rows] = True
+        combos.append(present[cards].all(axis=0).sum())
+    combos = np.array(combos, dtype=np.int64)
+
+    # Prompts without a known question go in an extra last row
+    q = np.where(arrays["question"] < 0, len(QUESTION_LIST), arrays["question"]).astype(np.int64)
+    questions = np.bincount(q * len(SPREAD_IDS) + spread,
+                            minlength=(len(QUESTION_LIST) + 1) * len(SPREAD_IDS))
+    questions = questions.reshape(len(QUESTION_LIST) + 1, len(SPREAD_IDS))
+
+    return {"draws": len(codes), "cells": cells, "pairs": pairs, "combos": combos, "questions": questions}
+
+
+def reachable_questions(m: Dict):
+    """questions matrix without the (none) row, which only precache prompts use."""
+    return m["questions"][:-1]
+
+
+def summarize(m: Dict, top: int = 10) -> str:
+    """Per-matrix spread of counts and the least covered entries."""
+    np = _numpy()
+    lines = [f"Draws: {m['draws']:,}"]
+
+    def stats(name: str, values, labels: List[str]):
+        values = np.asarray(values).ravel()
+        order = np.argsort(values, kind="stable")[:top]
+        lines.append(f"\n{name}: {values.size:,} entries, {int((values == 0).sum()):,} empty, "
+                     f"min {values.min()}, median {int(np.median(values))}, max {values.max()}")
+        lines.extend(f"  {int(values[i]):>6}  {labels[i]}" for i in order)
+
+    stats("Card x position x orientation", m["cells"],
+          [f"{c['name']} / {p} / {o}" for c in CARDS for p in POSITION_IDS for o in ("upright", "reversed")])
+    iu = np.triu_indices(len(CARDS), 1)
+    stats("Card pairs", m["pairs"][iu], [f"{CARDS[a]['name']} + {CARDS[b]['name']}" for a, b in zip(*iu)])
+    stats("Combinations", m["combos"], [" + ".join(c["cards"]) for c in COMBINATIONS])
+    stats("Question x spread", reachable_questions(m),
+          [f"{q} / {s}" for _, q in QUESTION_LIST for s in SPREAD_IDS])
+    return "\n".join(lines)
+
+
+def heatmap(matrix, row_labels: List[str], col_labels: List[str]) -> str:
+    """One character per cell, darker = more, scaled to the matrix maximum."""
+    np = _numpy()
+    matrix = np.asarray(matrix)
+    peak = max(int(matrix.max()), 1)
+    width = max(len(label) for label in row_labels)
+    shade = (matrix * (len(HEATMAP_RAMP) - 1) + peak - 1) // peak
+    lines = [f"{'':<{width}}  " + "".join(label[0] for label in col_labels)]
+    for label, row in zip(row_labels, shade):
+        lines.append(f"{label:<{width}}  " + "".join(HEATMAP_RAMP[v] for v in row))
+    lines.append(f"scale: '{HEATMAP_RAMP}' from 0 to {peak}; columns: {', '.join(col_labels)}")
+    return "\n".join(lines)
+
+
+def heatmaps(m: Dict) -> Dict[str, str]:
+    names = [c["name"] for c in CARDS]
+    cols = [f"{p}:{o[0]}" for p in POSITION_IDS for o in ("upright", "reversed")]
+    return {
+        "cells": heatmap(m["cells"].reshape(len(CARDS), -1), names, cols),
+        "pairs": heatmap(m["pairs"], names, names),
+        "questions": heatmap(reachable_questions(m), [q for _, q in QUESTION_LIST], SPREAD_IDS),
+    }
+
+
+def write_csv(m: Dict, output_dir: Path) -> List[Path]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tables = {
+        "cells": (["card", "position", "orientation", "count"],
+                  ([c["name"], p, o, int(m["cells"][i, j, k])]
+                   for i, c in enumerate(CARDS) for j, p in enumerate(POSITION_IDS)
+                   for k, o in enumerate(("upright", "reversed")))),
+        "pairs": (["card_a", "card_b", "count"],
+                  ([CARDS[a]["name"], CARDS[b]["name"], int(m["pairs"][a, b])]
+                   for a in range(len(CARDS)) for b in range(a + 1, len(CARDS)))),
+        "combos": (["cards", "count"],
+                   ([" + ".join(c["cards"]), int(n)] for c, n in zip(COMBINATIONS, m["combos"]))),
+        "questions": (["category", "question", "spread", "count"],
+                      ([cat, q, s, int(m["questions"][i, j])]
+                       for i, (cat, q) in enumerate(QUESTION_LIST) for j, s in enumerate(SPREAD_IDS))),
+    }
+    paths = []
+    for name, (header, rows) in tables.items():
+        path = output_dir / f"{name}.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        paths.append(path)
+    return paths
@@ -0,0 +1,102 @@
+"""
+Integer-coded draws recovered from rendered prompts.
+
+prompts.json stores only rendered text, so the cards behind each prompt are
+parsed back out of its numbered card lines ("3. Past: The World (reversed)")
+and cached in data/draws.tsv:
+
+    # v2 <prompts.json size> <prompts.json mtime_ns>
+    id <TAB> spread id <TAB> question category <TAB> question <TAB> status <TAB> codes
+
+where question indexes QUESTION_LIST (-1 for none) and codes are
+space-separated card_index * 2 + is_reversed in position order. The cache is
+rebuilt whenever prompts.json changes, in one streaming pass, and serves the
+resource impact index and coverage analytics.
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from fsutil import atomic_open
+from prompt_generator import CARDS, QUESTIONS, SPREADS, iter_prompts
+
+DRAWS_FILE = "draws.tsv"
+VERSION = 2
+
+CARD_INDEX = {c["name"]: i for i, c in enumerate(CARDS)}
+SPREAD_IDS = list(SPREADS)
+SPREAD_BY_NAME = {s["name"]: sid for sid, s in SPREADS.items()}
+QUESTION_LIST = [(cat, q) for cat, qs in QUESTIONS.items() for q in qs]
+# First occurrence wins for questions listed under several categories
+QUESTION_INDEX = {q: i for i, (_, q) in reversed(list(enumerate(QUESTION_LIST)))}
+
+_CARD_LINE = re.compile(r"^\d+\. [^:\n]+: (.+) \((upright|reversed)\)$", re.M)
+
+
+@dataclass
+class Draw:
+    id: str
+    spread: str
+    category: str
+    question: int
+    status: str
+    codes: List[int]
+
+    @property
+    def cards(self) -> Iterator[Tuple[str, bool, str]]:
+        """(card name, is_reversed, position id) per position."""
+        for code, position in zip(self.codes, SPREADS[self.spread]["positions"]):
+            yield CARDS[code >> 1]["name"], bool(code & 1), position["id"]
+
+
+def parse_draw(prompt) -> Draw:
+    """Recover a TrainingPrompt's draw from its rendered card lines."""
+    spread = SPREAD_BY_NAME[prompt.spread_name]
+    codes = [CARD_INDEX[name] * 2 + (orientation == "reversed")
+             for name, orientation in _CARD_LINE.findall(prompt.input_text)]
+    if len(codes) != len(SPREADS[spread]["positions"]):
+        raise ValueError(f"{prompt.id}: expected {len(SPREADS[spread]['positions'])} cards, "
+                         f"found {len(codes)}")
+    return Draw(prompt.id, spread, prompt.question_category,
+                QUESTION_INDEX.get(prompt.question, -1), prompt.status, codes)
+
+
+def _stamp(prompts_path: Path) -> str:
+    st = prompts_path.stat()
+    return f"# v{VERSION} {st.st_size} {st.st_mtime_ns}\n"
+
+
+def build_draws(prompts_path: Path, path: Path) -> int:
+    count = 0
+    with atomic_open(path) as f:
+        f.write(_stamp(prompts_path))
+        for p in iter_prompts(prompts_path):
+            d = parse_draw(p)
+            f.write(f"{d.id}\t{d.spread}\t{d.category}\t{d.question}\t{d.status}\t"
+                    f"{' '.join(map(str, d.codes))}\n")
+            count += 1
+    return count
+
+
+def draws_path(data_dir: Path) -> Path:
+    """data/draws.tsv, rebuilt first if prompts.json changed since it was written."""
+    prompts_path = data_dir / "prompts.json"
+    path = data_dir / DRAWS_FILE
+    fresh = False
+    if path.exists():
+        with open(path) as f:
+            fresh = f.readline() == _stamp(prompts_path)
+    if not fresh:
+        build_draws(prompts_path, path)
+    return path
+
+
+def iter_draws(data_dir: Path) -> Iterator[Draw]:
+    """Every draw in prompts.json, rebuilding draws.tsv first if it is stale."""
+    with open(draws_path(data_dir)) as f:
+        next(f)
+        for line in f:
+            pid, spread, category, question, status, codes = line.rstrip("\n").split("\t")
+            yield Draw(pid, spread, category, int(question), status, [int(c) for c in codes.split()])
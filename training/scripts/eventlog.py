@@ -0,0 +1,175 @@
+"""
+Structured JSONL event log for pipeline runs.
+
+Every run.py invocation appends events to data/events.jsonl, one object per
+line: {"ts", "run", "pid", "event", ...fields}. Stages emit stage_start and
+stage_end (with duration, status and counts); merge emits per-file ingest
+stats and every warning.
+
+emit() is a single flag check until open_log() is called. Events are buffered
+as complete lines and appended with one write() per flush on an O_APPEND
+descriptor, so concurrent workers sharing the file never interleave within a
+line and hooks are cheap enough for hot loops.
+"""
+
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+EVENTS_FILE = "events.jsonl"
+FLUSH_BYTES = 64 << 10
+
+_fd: Optional[int] = None
+_run: Optional[str] = None
+_buffer: List[str] = []
+_buffered = 0
+
+
+def open_log(path: Path, run_id: Optional[str] = None) -> str:
+    """Start appending events to path; returns the run id."""
+    global _fd, _run
+    close_log()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    _run = run_id or uuid.uuid4().hex[:12]
+    return _run
+
+
+def flush():
+    global _buffered
+    if _fd is not None and _buffer:
+        os.write(_fd, "".join(_buffer).encode())
+        _buffer.clear()
+        _buffered = 0
+
+
+def close_log():
+    global _fd, _run
+    if _fd is not None:
+        flush()
+        os.close(_fd)
+    _fd = _run = None
+
+
+def emit(event: str, **fields):
+    """Record one event; a no-op when no log is open."""
+    global _buffered
+    if _fd is None:
+        return
+    line = json.dumps({
+        "ts": round(time.time(), 3),
+        "run": _run,
+        "pid": os.getpid(),
+        "event": event,
+        **fields,
+    }, default=str) + "\n"
+    _buffer.append(line)
+    _buffered += len(line)
+    if _buffered >= FLUSH_BYTES:
+        flush()
+
+
+@contextmanager
+def suspended() -> Iterator[None]:
+    """Drop events emitted inside the block, e.g. by stages run on synthetic data."""
+    global _fd
+    flush()
+    fd, _fd = _fd, None
+    try:
+        yield
+    finally:
+        _fd = fd
+
+
+@contextmanager
+def stage(name: str, **fields) -> Iterator[Dict]:
+    """
+    Emit stage_start/stage_end around a block.
+
+    The yielded dict collects counts to attach to stage_end.
+    """
+    counts: Dict = {}
+    emit("stage_start", stage=name, **fields)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield counts
+    except BaseException as e:
+        status = "error"
+        counts["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        emit("stage_end", stage=name, status=status,
+             duration_s=round(time.perf_counter() - start, 3), **counts)
+        flush()
+
+
+# MARK: - Query
+
+def read_events(path: Path) -> Iterator[Dict]:
+    """Yield events from a log, skipping torn or malformed lines."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def summarize_runs(events: Iterator[Dict]) -> List[Dict]:
+    """Group events by run, in order of first appearance."""
+    runs: Dict[str, Dict] = {}
+    for e in events:
+        run = runs.get(e["run"])
+        if run is None:
+            run = runs[e["run"]] = {
+                "run": e["run"], "command": None, "started": e["ts"], "ended": None,
+                "status": "running", "stages": {}, "files": 0, "records": 0,
+                "warnings": 0, "errors": 0,
+            }
+        kind = e["event"]
+        if kind == "run_start":
+            run["command"] = e.get("command")
+        elif kind == "run_end":
+            run["ended"] = e["ts"]
+            run["status"] = e.get("status", "ok")
+        elif kind == "stage_end":
+            run["stages"][e["stage"]] = {
+                k: v for k, v in e.items() if k not in ("ts", "run", "pid", "event", "stage")
+            }
+            if e.get("status") == "error":
+                run["errors"] += 1
+        elif kind == "file_ingested":
+            run["files"] += 1
+            run["records"] += e.get("records", 0)
+        elif kind == "warning":
+            run["warnings"] += 1
+        elif kind == "error":
+            run["errors"] += 1
+    return list(runs.values())
+
+
+def format_runs(runs: List[Dict]) -> str:
+    lines = [f"{'run':<12}  {'started':<19}  {'command':<16} {'status':<8} {'secs':>8}  stages"]
+    for r in runs:
+        started = datetime.fromtimestamp(r["started"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        secs = f"{r['ended'] - r['started']:.1f}" if r["ended"] else "-"
+        stages = ", ".join(f"{name} {s.get('duration_s', 0):.1f}s" for name, s in r["stages"].items())
+        extra = []
+        if r["files"]:
+            extra.append(f"{r['files']} files/{r['records']} records")
+        if r["warnings"]:
+            extra.append(f"{r['warnings']} warnings")
+        if r["errors"]:
+            extra.append(f"{r['errors']} errors")
+        suffix = f"  [{'; '.join(extra)}]" if extra else ""
+        lines.append(f"{r['run']:<12}  {started:<19}  {r['command'] or '?':<16} "
+                     f"{r['status']:<8} {secs:>8}  {stages}{suffix}")
+    return "\n".join(lines)
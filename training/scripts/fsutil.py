@@ -0,0 +1,40 @@
+"""
+Small filesystem helpers shared by pipeline stages.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = 'w') -> Iterator[IO]:
+    """Open a temp file that replaces path on success, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def atomic_write_json(path: Path, obj: Any, indent: int = 2):
+    """Write JSON via a temp file and rename."""
+    with atomic_open(path) as f:
+        json.dump(obj, f, indent=indent)
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file's contents, read in 1 MiB blocks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
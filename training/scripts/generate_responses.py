@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 """Generate tarot reading responses for training data batches."""
 
+import argparse
 import json
 import os
 import re
 import random
 from pathlib import Path
 
+from checkpoint import clear_checkpoint, load_checkpoint, restore_rng, rng_state
+from fsutil import atomic_open, atomic_write_json
+
 INPUT_DIR = Path("/home/user/taro/training/data/batches_new")
 OUTPUT_DIR = INPUT_DIR / "responses"
+CHECKPOINT_FILE = "generate_responses_checkpoint.json"
 
 # Opening phrases for readings
 OPENINGS = [
@@ -459,11 +464,11 @@ def generate_response(info):
         return generate_celtic_cross_reading(info)
 
 
-def process_batch(batch_num):
+def process_batch(batch_num, input_dir=INPUT_DIR, output_dir=OUTPUT_DIR):
     """Process a single batch file."""
     batch_id = f"{batch_num:04d}"
-    input_file = INPUT_DIR / f"batch_{batch_id}.json"
-    output_file = OUTPUT_DIR / f"batch_{batch_id}_responses.jsonl"
+    input_file = input_dir / f"batch_{batch_id}.json"
+    output_file = output_dir / f"batch_{batch_id}_responses.jsonl"
 
     if not input_file.exists():
         return 0, f"Input file not found: {input_file}"
@@ -486,7 +491,8 @@ def process_batch(batch_num):
             "response": response_text
         })
 
-    with open(output_file, "w") as f:
+    # Atomic so a batch is either complete or absent when a run is interrupted
+    with atomic_open(output_file) as f:
         for resp in responses:
             f.write(json.dumps(resp) + "\n")
 
@@ -494,15 +500,49 @@ def process_batch(batch_num):
 
 
 def main():
-    """Process all batches from 0000 to 0099."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    """
+    Process batches 0000 up to --batches in --input-dir into its responses/.
+
+    --seed makes the responses reproducible. A checkpoint after each batch
+    lets --resume continue an interrupted run from the next batch with the
+    same random state.
+    """
+    parser = argparse.ArgumentParser(description="Generate template responses for batch files")
+    parser.add_argument("--input-dir", type=Path, default=INPUT_DIR)
+    parser.add_argument("--batches", type=int, default=100, help="Number of batches to process")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible responses")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue after the last completed batch of an interrupted run")
+    args = parser.parse_args()
+
+    input_dir = args.input_dir
+    output_dir = input_dir / "responses"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_dir / CHECKPOINT_FILE
+
+    if args.seed is not None:
+        random.seed(args.seed)
 
     total_processed = 0
     successful_batches = 0
     failed_batches = []
-
-    for batch_num in range(100):
-        count, error = process_batch(batch_num)
+    start = 0
+
+    # The checkpoint is written after every batch with the module RNG state,
+    # so a resumed run writes exactly the files an uninterrupted one would
+    state = load_checkpoint(checkpoint_path) if args.resume else None
+    if state is not None:
+        restore_rng(random, state["rng"])
+        start = state["next_batch"]
+        total_processed = state["total_processed"]
+        successful_batches = state["successful_batches"]
+        failed_batches = [tuple(f) for f in state["failed_batches"]]
+        print(f"Resuming at batch {start:04d}")
+    elif args.resume:
+        print("No checkpoint found, starting from batch 0000")
+
+    for batch_num in range(start, args.batches):
+        count, error = process_batch(batch_num, input_dir, output_dir)
         if error:
             failed_batches.append((batch_num, error))
         else:
@@ -510,9 +550,18 @@ def main():
             successful_batches += 1
             if batch_num % 10 == 0:
                 print(f"Processed batch {batch_num:04d}: {count} responses")
+        atomic_write_json(checkpoint_path, {
+            "next_batch": batch_num + 1,
+            "rng": rng_state(random),
+            "total_processed": total_processed,
+            "successful_batches": successful_batches,
+            "failed_batches": failed_batches,
+        }, indent=None)
+
+    clear_checkpoint(checkpoint_path)
 
     print(f"\n=== COMPLETION REPORT ===")
-    print(f"Batches processed: {successful_batches}/100")
+    print(f"Batches processed: {successful_batches}/{args.batches}")
     print(f"Total responses generated: {total_processed}")
 
     if failed_batches:
@@ -0,0 +1,146 @@
+"""
+Persistent Bloom filter of every prompt ID ever generated.
+
+generate_dataset consults it so a new seed only yields prompts that were not
+generated (and possibly answered) in an earlier run. The filter is scalable:
+when a layer reaches its capacity a new layer with twice the capacity and
+half the false-positive rate is added, so the overall false-positive rate
+stays below the configured one however many IDs accumulate. A false positive
+only means a novel draw is skipped and redrawn.
+
+Alongside the bits it counts the IDs added per spread, so generate-prompts
+can tell before drawing whether a spread has enough novel readings left.
+
+File layout (little-endian):
+    magic "TRBF", version, layer count, target fp rate
+    per layer: hash count, bit count, capacity, count, then the bit array
+    u32 length, then UTF-8 JSON {spread name: IDs added} (version 2)
+"""
+
+import json
+
+import hashlib
+import math
+import struct
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fsutil import atomic_open
+
+MAGIC = b"TRBF"
+VERSION = 2
+ID_FILTER_FILE = "id_filter.bin"
+DEFAULT_CAPACITY = 100_000
+DEFAULT_FP_RATE = 0.001
+
+_HEADER = struct.Struct("<4sHHd")
+_LAYER = struct.Struct("<IQQQ")
+_COUNTS = struct.Struct("<I")
+
+
+def _hashes(item: str):
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class _Layer:
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.bits = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def __contains__(self, hashes) -> bool:
+        h1, h2 = hashes
+        array, bits = self.array, self.bits
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % bits
+            if not array[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, hashes):
+        h1, h2 = hashes
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.bits
+            self.array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+
+class IdFilter:
+    """Scalable Bloom filter over prompt IDs."""
+
+    def __init__(self, fp_rate: float = DEFAULT_FP_RATE, capacity: int = DEFAULT_CAPACITY):
+        self.fp_rate = fp_rate
+        # The first layer takes half the budget, each later layer half the previous
+        self.layers: List[_Layer] = [_Layer(capacity, fp_rate / 2)]
+        # None when loaded from a version 1 file, which did not count
+        self.spreads: Optional[Dict[str, int]] = {}
+
+    def __contains__(self, item: str) -> bool:
+        h = _hashes(item)
+        return any(h in layer for layer in self.layers)
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    def add(self, item: str) -> bool:
+        """Add item; returns False if it (probably) was already present."""
+        h = _hashes(item)
+        if any(h in layer for layer in self.layers):
+            return False
+        layer = self.layers[-1]
+        if layer.count >= layer.capacity:
+            layer = _Layer(layer.capacity * 2, self.fp_rate / 2 ** (len(self.layers) + 1))
+            self.layers.append(layer)
+        layer.add(h)
+        return True
+
+    def update(self, items: Iterable[str]) -> int:
+        return sum(self.add(item) for item in items)
+
+    def update_spreads(self, items: Iterable[Tuple[str, str]]) -> int:
+        """Add (id, spread name) pairs, counting new IDs per spread."""
+        added = 0
+        for item, spread in items:
+            if self.add(item):
+                added += 1
+                if self.spreads is not None:
+                    self.spreads[spread] = self.spreads.get(spread, 0) + 1
+        return added
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(len(layer.array) for layer in self.layers)
+
+    def save(self, path: Path):
+        """Write atomically so an interrupted save never corrupts the filter."""
+        with atomic_open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(self.layers), self.fp_rate))
+            for layer in self.layers:
+                f.write(_LAYER.pack(layer.hashes, layer.bits, layer.capacity, layer.count))
+                f.write(layer.array)
+            counts = json.dumps(self.spreads).encode() if self.spreads is not None else b"null"
+            f.write(_COUNTS.pack(len(counts)))
+            f.write(counts)
+
+    @classmethod
+    def load(cls, path: Path) -> "IdFilter":
+        with open(path, "rb") as f:
+            magic, version, n_layers, fp_rate = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version not in (1, VERSION):
+                raise ValueError(f"{path}: not a version 1 or {VERSION} ID filter")
+            filt = cls.__new__(cls)
+            filt.fp_rate = fp_rate
+            filt.layers = []
+            for _ in range(n_layers):
+                layer = _Layer.__new__(_Layer)
+                layer.hashes, layer.bits, layer.capacity, layer.count = _LAYER.unpack(f.read(_LAYER.size))
+                layer.array = bytearray(f.read((layer.bits + 7) // 8))
+                filt.layers.append(layer)
+            filt.spreads = None
+            if version >= 2:
+                length, = _COUNTS.unpack(f.read(_COUNTS.size))
+                filt.spreads = json.loads(f.read(length))
+        return filt
@@ -0,0 +1,193 @@
+"""
+Resource-change impact: which prompts does an edit to the iOS resources touch?
+
+Each prompt's text depends on these resource keys, derived from its draw
+(see draws.py):
+
+    base      (card, orientation)            base-meanings.json
+    modifier  (card, orientation, position)  position-modifiers.json
+    combo     the combinations whose cards are all in the draw, in file order
+
+diff_resources compares two versions of the resource JSONs key by key,
+using the same lookups the prompt builder uses, and affected_keys lists
+the changed keys a draw uses; a prompt is affected exactly when its card
+section would render differently. Resetting re-renders affected prompts
+with the current resources and returns them to pending.
+
+Resets are recorded in data/resets.json as a generation per prompt (id ->
+number of resets). Batch entries for a reset prompt carry the generation
+they were written for ("reset"), and merge-responses only accepts a
+response whose batch entry has the prompt's current generation, so the
+check does not depend on file times or clocks. Unanswered batch and repair
+files holding a reset prompt get its new text and generation, so the
+response they eventually receive is for the current prompt.
+"""
+
+import json
+import re
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from draws import Draw, iter_draws
+from fsutil import atomic_write_json
+from repair import batch_files, is_answered, load_batch
+from prompt_generator import (
+    CARDS, IOS_RESOURCES, MOON_PHASES, READING_INSTRUCTION, SPREADS, STYLE_INSTRUCTIONS,
+    TrainingPrompt, build_prompt, find_combinations, get_base_meaning, get_position_modifier,
+)
+
+RESOURCE_FILES = ("base-meanings", "position-modifiers", "combinations")
+RESETS_FILE = "resets.json"
+
+_TIMING = re.compile(r"^TIMING: (.+?) \S+ — ", re.M)
+
+
+def load_resources(source: str) -> Dict:
+    """Resource JSONs from a directory, or from a git revision of IOS_RESOURCES."""
+    data = {}
+    for name in RESOURCE_FILES:
+        if Path(source).is_dir():
+            with open(Path(source) / f"{name}.json") as f:
+                data[name] = json.load(f)
+        else:
+            out = subprocess.run(["git", "show", f"{source}:./{name}.json"], cwd=IOS_RESOURCES,
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                raise ValueError(f"Cannot read {name}.json at {source}: {out.stderr.strip()}")
+            data[name] = json.loads(out.stdout)
+    return data
+
+
+@dataclass
+class ResourceDiff:
+    base: Set[Tuple[str, bool]] = field(default_factory=set)
+    modifier: Set[Tuple[str, bool, str]] = field(default_factory=set)
+    combo_cards: Set[str] = field(default_factory=set)   # cards of added/removed/edited combinations
+    combo_order: bool = False                            # shared combinations were reordered
+    old_combos: List[Dict] = field(default_factory=list)
+    new_combos: List[Dict] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.base or self.modifier or self.combo_cards or self.combo_order)
+
+
+def diff_resources(old: Dict, new: Dict) -> ResourceDiff:
+    diff = ResourceDiff(old_combos=old["combinations"]["combinations"],
+                        new_combos=new["combinations"]["combinations"])
+    positions = {p["id"] for s in SPREADS.values() for p in s["positions"]}
+    for card in CARDS:
+        name = card["name"]
+        for is_reversed in (False, True):
+            if (get_base_meaning(name, is_reversed, old["base-meanings"])
+                    != get_base_meaning(name, is_reversed, new["base-meanings"])):
+                diff.base.add((name, is_reversed))
+            for pos in positions:
+                if (get_position_modifier(name, pos, is_reversed, old["position-modifiers"])
+                        != get_position_modifier(name, pos, is_reversed, new["position-modifiers"])):
+                    diff.modifier.add((name, is_reversed, pos))
+
+    def key(c):
+        return tuple(c["cards"]), c["meaning"]
+    old_keys = [key(c) for c in diff.old_combos]
+    new_keys = [key(c) for c in diff.new_combos]
+    for cards, _ in set(old_keys) ^ set(new_keys):
+        diff.combo_cards.update(cards)
+    shared = set(old_keys) & set(new_keys)
+    diff.combo_order = [k for k in old_keys if k in shared] != [k for k in new_keys if k in shared]
+    return diff
+
+
+def affected_keys(draw: Draw, diff: ResourceDiff) -> List[str]:
+    """The changed resource keys this draw's prompt uses (empty if unaffected)."""
+    keys = []
+    names = []
+    for name, is_reversed, pos in draw.cards:
+        names.append(name)
+        orientation = "reversed" if is_reversed else "upright"
+        if (name, is_reversed) in diff.base:
+            keys.append(f"base:{name}:{orientation}")
+        if (name, is_reversed, pos) in diff.modifier:
+            keys.append(f"modifier:{name}:{orientation}:{pos}")
+    if diff.combo_order or diff.combo_cards.intersection(names):
+        old = find_combinations(names, diff.old_combos)
+        new = find_combinations(names, diff.new_combos)
+        if old != new:
+            changed = {tuple(c["cards"]) for c in old if c not in new} | {tuple(c["cards"]) for c in new if c not in old}
+            keys.extend(f"combo:{' + '.join(cards)}" for cards in sorted(changed) or [("order",)])
+    return keys
+
+
+def find_affected(data_dir: Path, diff: ResourceDiff) -> Iterator[Tuple[Draw, List[str]]]:
+    for draw in iter_draws(data_dir):
+        keys = affected_keys(draw, diff)
+        if keys:
+            yield draw, keys
+
+
+def rerender(prompt: TrainingPrompt, draw: Draw) -> str:
+    """Rebuild a prompt's text with the current resources, keeping style, phase and layout."""
+    text = prompt.input_text
+    style = next((s for s, instruction in STYLE_INSTRUCTIONS.items() if instruction in text), "balanced")
+    timing = _TIMING.search(text)
+    phase = next((p for p in MOON_PHASES if timing and p["name"] == timing.group(1)), None)
+    layout = "prefix_stable" if f"<|user|>\n{READING_INSTRUCTION}" in text else "standard"
+    positions = SPREADS[draw.spread]["positions"]
+    drawn = [{"card": CARDS[code >> 1], "position": pos, "is_reversed": bool(code & 1)}
+             for code, pos in zip(draw.codes, positions)]
+    return build_prompt(drawn, prompt.question or None, style=style, moon_phase=phase, layout=layout)
+
+
+def load_resets(data_dir: Path) -> Dict[str, int]:
+    path = data_dir / RESETS_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def refresh_batches(batches_dir: Path, texts: Dict[str, str], resets: Dict[str, int]) -> int:
+    """Give reset prompts their new text and generation in batches without a response file yet."""
+    count = 0
+    if not batches_dir.exists():
+        return count
+    for path in batch_files(batches_dir):
+        output, entries = load_batch(path)
+        if is_answered(batches_dir, path, output) or not any(e["id"] in texts for e in entries):
+            continue
+        with open(path) as f:
+            batch = json.load(f)
+        for entry in batch["prompts"]:
+            if entry["id"] in texts:
+                entry["input"] = texts[entry["id"]]
+                entry["reset"] = resets[entry["id"]]
+        atomic_write_json(path, batch)
+        count += 1
+    return count
+
+
+def record_resets(data_dir: Path, ids: Iterable[str]) -> Dict[str, int]:
+    """Start a new generation for these prompts, making earlier batch entries stale; returns all resets."""
+    resets = load_resets(data_dir)
+    for pid in ids:
+        resets[pid] = resets.get(pid, 0) + 1
+    atomic_write_json(data_dir / RESETS_FILE, resets, indent=None)
+    return resets
+
+
+def reset_prompts(prompts: List[TrainingPrompt], draws: Dict[str, Draw], data_dir: Path) -> Dict[str, int]:
+    """
+    Re-render the given prompts, clear their responses and record the reset.
+
+    Returns the number of prompts reset and of unanswered batches rewritten.
+    """
+    texts = {}
+    for p in prompts:
+        if p.id in draws:
+            p.input_text = rerender(p, draws[p.id])
+            p.response = None
+            p.status = "pending"
+            texts[p.id] = p.input_text
+    resets = record_resets(data_dir, texts)
+    return {"reset": len(texts), "batches_rewritten": refresh_batches(data_dir / "batches", texts, resets)}
@@ -0,0 +1,133 @@
+"""
+Streaming JSON object scanner.
+
+Reads a text stream in fixed-size chunks and recovers JSON objects with
+incremental JSONDecoder.raw_decode, so objects may span lines, share a line,
+sit inside code fences or JSON arrays. Memory is bounded by the chunk size
+plus the largest single object.
+"""
+
+import json
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+CHUNK_SIZE = 1 << 20          # 1 MiB of text per read
+MAX_OBJECT_SIZE = 8 << 20     # give up on an object that is still open after 8 MiB
+
+_DECODER = json.JSONDecoder()
+_SEPARATORS = " \t\r\n,[]"
+
+
+def _maybe_truncated(e: json.JSONDecodeError, n: int) -> bool:
+    """Whether a decode error could be caused by the buffer ending mid-object."""
+    # Errors a few chars from the end cover cut literals, numbers and \u escapes;
+    # an unterminated string reports its opening quote instead of the end.
+    return e.pos >= n - 6 or e.msg.startswith("Unterminated string")
+
+
+def scan_objects(buf: str, pos: int, final: bool,
+                 max_object_size: int = MAX_OBJECT_SIZE,
+                 spans: Optional[List[Tuple[int, int]]] = None) -> Tuple[List[Dict], List[str], int]:
+    """
+    Decode as many complete objects as possible from buf[pos:].
+
+    Returns (objects, errors, pos) where pos is the first unconsumed offset.
+    When final is False, a possibly truncated object at the end of the buffer
+    is left unconsumed so the caller can append more text and call again.
+    If spans is given, the (start, end) offset of each object is appended.
+    """
+    objects, errors = [], []
+    n = len(buf)
+
+    while pos < n:
+        # Skip whitespace and array/list separators between objects
+        while pos < n and buf[pos] in _SEPARATORS:
+            pos += 1
+        if pos >= n:
+            break
+
+        # Code fence markers: ``` optionally followed by a language tag
+        if buf.startswith("```", pos):
+            end = pos + 3
+            while end < n and buf[end].isalpha():
+                end += 1
+            if end >= n and not final:
+                break
+            pos = end
+            continue
+        if not final and n - pos < 3 and "```".startswith(buf[pos:]):
+            break
+
+        if buf[pos] != "{":
+            # Prose or other junk: skip the rest of the line
+            nl = buf.find("\n", pos)
+            if nl < 0:
+                if not final:
+                    break
+                pos = n
+            else:
+                pos = nl + 1
+            continue
+
+        try:
+            obj, end = _DECODER.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if not final and n - pos < max_object_size and _maybe_truncated(e, n):
+                break  # object runs past the buffer; wait for more text
+            nl = buf.find("\n", pos)
+            line = buf[pos:nl if nl >= 0 else n]
+            errors.append(f"Parse error: {line[:50]}... ({e})")
+            pos = nl + 1 if nl >= 0 else n
+            continue
+
+        if isinstance(obj, dict):
+            objects.append(obj)
+            if spans is not None:
+                spans.append((pos, end))
+        pos = end
+
+    return objects, errors, pos
+
+
+def iter_json_objects(
+    stream: TextIO,
+    errors: Optional[List[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    max_object_size: int = MAX_OBJECT_SIZE,
+) -> Iterator[Dict]:
+    """Yield every JSON object in a text stream, reading it chunk by chunk."""
+    buf, pos, eof = "", 0, False
+
+    while not eof:
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        objects, errs, pos = scan_objects(buf, 0, eof, max_object_size)
+        if errors is not None:
+            errors.extend(errs)
+        yield from objects
+
+
+def iter_json_spans(
+    stream: TextIO,
+    start: int = 0,
+    chunk_size: int = CHUNK_SIZE,
+    max_object_size: int = MAX_OBJECT_SIZE,
+) -> Iterator[Tuple[Dict, int, int]]:
+    """
+    Yield (object, offset, length) for every JSON object in a text stream.
+
+    Offsets count characters from the start of the stream plus start. Open
+    the file as latin-1 to make them byte offsets: every byte is one
+    character, and ASCII keys such as "id" decode unchanged.
+    """
+    buf, pos, base, eof = "", 0, start, False
+
+    while not eof:
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        base += pos
+        buf = buf[pos:] + chunk
+        spans: List[Tuple[int, int]] = []
+        objects, _, pos = scan_objects(buf, 0, eof, max_object_size, spans)
+        for obj, (s, e) in zip(objects, spans):
+            yield obj, base + s, e - s
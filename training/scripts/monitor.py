@@ -0,0 +1,206 @@
+"""
+Live generation monitor for `run.py status --watch`.
+
+Tails the responses directory incrementally: each tick reads only the bytes
+appended since the previous tick, so cost is proportional to new output.
+"""
+
+import codecs
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+
+from jsonstream import scan_objects
+from prompt_generator import load_prompts, estimate_tokens
+
+RESPONSE_SUFFIXES = (".jsonl", ".txt")
+
+
+class ResponseTailer:
+    """Incrementally parse response files as sessions append to them."""
+
+    def __init__(self, responses_dir: Path):
+        self.responses_dir = responses_dir
+        self.offsets: Dict[str, int] = {}
+        self.tails: Dict[str, str] = {}
+        self.decoders: Dict[str, codecs.IncrementalDecoder] = {}
+
+    def poll(self) -> Tuple[List[Tuple[str, str]], int]:
+        """Return (new (id, response) records, new parse error count)."""
+        records, errors = [], 0
+        if not self.responses_dir.exists():
+            return records, errors
+
+        for entry in os.scandir(self.responses_dir):
+            if not entry.name.endswith(RESPONSE_SUFFIXES):
+                continue
+            size = entry.stat().st_size
+            offset = self.offsets.get(entry.path, 0)
+            if size < offset:
+                # File was rewritten; start over
+                offset = 0
+                self.tails.pop(entry.path, None)
+                self.decoders.pop(entry.path, None)
+            if size == offset:
+                continue
+
+            with open(entry.path, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            self.offsets[entry.path] = offset + len(data)
+
+            decoder = self.decoders.setdefault(
+                entry.path, codecs.getincrementaldecoder("utf-8")(errors="replace"))
+            buf = self.tails.get(entry.path, "") + decoder.decode(data)
+            objects, errs, pos = scan_objects(buf, 0, final=False)
+            self.tails[entry.path] = buf[pos:]
+
+            errors += len(errs)
+            records.extend((o["id"], o["response"]) for o in objects
+                           if "id" in o and "response" in o)
+
+        return records, errors
+
+
+class ThroughputMonitor:
+    """Track completion, throughput and ETA against the prompts file."""
+
+    def __init__(self, prompts_path: Path, responses_dir: Path, window_seconds: float = 600):
+        prompts = load_prompts(prompts_path)
+        self.spread_of: Dict[str, str] = {p.id: p.spread_name for p in prompts}
+        self.completed: Set[str] = {p.id for p in prompts if p.status == "completed"}
+        self.spread_totals: Dict[str, int] = {}
+        self.spread_done: Dict[str, int] = {}
+        for p in prompts:
+            self.spread_totals[p.spread_name] = self.spread_totals.get(p.spread_name, 0) + 1
+            if p.id in self.completed:
+                self.spread_done[p.spread_name] = self.spread_done.get(p.spread_name, 0) + 1
+        del prompts
+
+        self.tailer = ResponseTailer(responses_dir)
+        self.window_seconds = window_seconds
+        self.samples: deque = deque()
+        self.tokens = 0
+        self.records = 0
+        self.errors = 0
+        self.unknown = 0
+
+        # Responses already on disk form the baseline, not throughput
+        self._ingest(*self.tailer.poll())
+        self.tokens = 0
+        self._sample()
+
+    def _ingest(self, records: List[Tuple[str, str]], errors: int):
+        self.records += len(records)
+        self.errors += errors
+        for rid, response in records:
+            spread = self.spread_of.get(rid)
+            if spread is None:
+                self.unknown += 1
+                continue
+            if rid not in self.completed:
+                self.completed.add(rid)
+                self.spread_done[spread] = self.spread_done.get(spread, 0) + 1
+                self.tokens += estimate_tokens(response)
+
+    def _sample(self):
+        now = time.monotonic()
+        self.samples.append((now, len(self.completed), self.tokens))
+        while len(self.samples) > 2 and now - self.samples[1][0] >= self.window_seconds:
+            self.samples.popleft()
+
+    def tick(self) -> Dict:
+        """Poll for new responses and return the current metrics."""
+        self._ingest(*self.tailer.poll())
+        self._sample()
+
+        (t0, done0, tok0), (t1, done1, tok1) = self.samples[0], self.samples[-1]
+        minutes = (t1 - t0) / 60
+        prompts_per_min = (done1 - done0) / minutes if minutes > 0 else 0.0
+        tokens_per_min = (tok1 - tok0) / minutes if minutes > 0 else 0.0
+
+        total = len(self.spread_of)
+        remaining = total - len(self.completed)
+        eta = remaining / prompts_per_min * 60 if prompts_per_min > 0 else None
+        parsed = self.records + self.errors
+
+        return {
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "total": total,
+            "completed": len(self.completed),
+            "remaining": remaining,
+            "prompts_per_min": round(prompts_per_min, 2),
+            "tokens_per_min": round(tokens_per_min, 1),
+            "error_rate": round(self.errors / parsed, 4) if parsed else 0.0,
+            "parse_errors": self.errors,
+            "unknown_ids": self.unknown,
+            "eta_seconds": round(eta) if eta is not None else None,
+            "by_spread": {
+                name: {"completed": self.spread_done.get(name, 0), "total": n}
+                for name, n in self.spread_totals.items()
+            },
+        }
+
+
+def format_metrics(m: Dict) -> str:
+    pct = m["completed"] / m["total"] * 100 if m["total"] else 0
+    if m["eta_seconds"] is None:
+        eta = "--"
+    else:
+        hours, rem = divmod(m["eta_seconds"], 3600)
+        eta = f"{hours}h {rem // 60:02d}m"
+
+    lines = [
+        "=" * 50,
+        f"LIVE PROGRESS  {m['time']}",
+        "=" * 50,
+        f"Completed: {m['completed']}/{m['total']} ({pct:.1f}%)",
+        f"Throughput: {m['prompts_per_min']:.1f} prompts/min, {m['tokens_per_min']:.0f} tokens/min",
+        f"Parse error rate: {m['error_rate'] * 100:.2f}% ({m['parse_errors']} errors)",
+        f"ETA to 100%: {eta}",
+        "",
+        "By spread:",
+    ]
+    for name, s in m["by_spread"].items():
+        spct = s["completed"] / s["total"] * 100 if s["total"] else 0
+        lines.append(f"  {name}: {s['completed']}/{s['total']} ({spct:.1f}%)")
+    lines.append("=" * 50)
+    return "\n".join(lines)
+
+
+def watch(prompts_path: Path, responses_dir: Path, interval: float = 10.0,
+          jsonl: Optional[str] = None, ticks: Optional[int] = None):
+    """Print live metrics every interval seconds; optionally append NDJSON."""
+    monitor = ThroughputMonitor(prompts_path, responses_dir)
+    out: Optional[TextIO] = None
+    if jsonl == "-":
+        out = sys.stdout
+    elif jsonl:
+        out = open(jsonl, "a")
+
+    n = 0
+    try:
+        while ticks is None or n < ticks:
+            if n:
+                time.sleep(interval)
+            metrics = monitor.tick()
+            if out is sys.stdout:
+                print(json.dumps(metrics), flush=True)
+            else:
+                if sys.stdout.isatty():
+                    print("\033[2J\033[H", end="")
+                print(format_metrics(metrics), flush=True)
+                if out:
+                    out.write(json.dumps(metrics) + "\n")
+                    out.flush()
+            n += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out and out is not sys.stdout:
+            out.close()
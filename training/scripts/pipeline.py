@@ -0,0 +1,84 @@
+"""
+Make-style incremental state for `run.py all`.
+
+Each stage records a fingerprint of its inputs and parameters in
+data/pipeline_state.json. A stage is skipped when its fingerprint is
+unchanged; stages that can work incrementally also record per-file digests
+so only new or changed inputs are processed.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from fsutil import atomic_write_json, file_sha256
+
+STATE_FILE = "pipeline_state.json"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serialisable stage inputs."""
+    blob = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+class PipelineState:
+    """Per-stage fingerprints and file digests persisted between runs."""
+
+    def __init__(self, data_dir: Path):
+        self.path = data_dir / STATE_FILE
+        self.stages: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.stages = json.load(f).get("stages", {})
+
+    def get(self, stage: str) -> Dict:
+        return self.stages.get(stage, {})
+
+    def is_fresh(self, stage: str, fp: str) -> bool:
+        return self.get(stage).get("fingerprint") == fp
+
+    def record(self, stage: str, fp: str, **extra: Any):
+        self.stages[stage] = {
+            "fingerprint": fp,
+            "completed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **extra,
+        }
+        atomic_write_json(self.path, {"stages": self.stages})
+
+    def file_digests(self, paths: Iterable[Path], stage: str) -> Dict[str, Dict]:
+        """
+        Content digests of files, keyed by name.
+
+        A file whose size and mtime match the stage's previous record reuses
+        the stored digest instead of being re-read.
+        """
+        previous = self.get(stage).get("files", {})
+        digests = {}
+        for path in paths:
+            st = os.stat(path)
+            old = previous.get(path.name)
+            if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                digests[path.name] = old
+            else:
+                digests[path.name] = {
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "sha256": file_sha256(path),
+                }
+        return digests
+
+
+def changed_files(current: Dict[str, Dict], previous: Optional[Dict[str, Dict]]) -> list:
+    """Names whose content digest is new or differs from the previous run."""
+    previous = previous or {}
+    return sorted(name for name, d in current.items()
+                  if previous.get(name, {}).get("sha256") != d["sha256"])
+
+
+def content_only(digests: Dict[str, Dict]) -> Dict[str, str]:
+    """Strip size/mtime so fingerprints depend on content alone."""
+    return {name: d["sha256"] for name, d in digests.items()}
@@ -0,0 +1,205 @@
+"""
+Exhaustive precomputed readings for small draw spaces.
+
+A single-card spread with no question has only cards × orientations × moon
+phases distinct prompts (78 × 2 × 8 = 1,248 for the Daily Draw). This module
+enumerates such a space into data/precache/<space>/prompts.json, which then
+goes through the normal batch and merge flow, and packages the merged
+responses into a bundle the app can serve without inference. The style and
+layout the prompts were rendered with are kept beside them in space.json, so
+the bundle is labelled with what was actually generated:
+
+    header    magic "TRPC", version, slot count, metadata length
+    metadata  UTF-8 JSON: spread, style, layout, card names, moon phase names
+    offsets   u32[slots + 1] into the data blob (equal offsets = no response)
+    data      raw-deflate compressed UTF-8 responses
+
+Slots are dense: slot = (card * 2 + reversed) * phases + phase, with card and
+phase indices into the metadata lists, so a lookup is one offset read.
+"""
+
+import hashlib
+import json
+import mmap
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fsutil import atomic_write_json
+from prompt_generator import (
+    CARDS, MOON_PHASES, SPREADS, TrainingPrompt, build_prompt, load_prompts,
+)
+
+PRECACHE_DIR = "precache"
+BUNDLE_FILE = "readings.bin"
+SPACE_FILE = "space.json"
+MAGIC = b"TRPC"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHxxII")
+
+# Draw spaces small enough to enumerate: name -> spread id
+SPACES = {"daily": "single"}
+
+
+def space_size(spread_id: str) -> int:
+    if len(SPREADS[spread_id]["positions"]) != 1:
+        raise ValueError(f"{spread_id}: only single-position spreads are enumerable")
+    return len(CARDS) * 2 * len(MOON_PHASES)
+
+
+def reading_id(spread_id: str, style: str, layout: str, card_name: str, is_reversed: bool,
+               phase_name: str) -> str:
+    # Style and layout change the prompt, so a reading for one is never merged into another
+    key = f"precache|{spread_id}|{style}|{layout}|{card_name}:{is_reversed}|{phase_name}"
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
+
+def enumerate_space(spread_id: str) -> Iterator[Tuple[Dict, bool, Dict]]:
+    """Every (card, is_reversed, moon phase) in slot order."""
+    space_size(spread_id)
+    for card in CARDS:
+        for is_reversed in (False, True):
+            for phase in MOON_PHASES:
+                yield card, is_reversed, phase
+
+
+def generate_space_prompts(spread_id: str, style: str = "balanced",
+                           layout: str = "standard") -> List[TrainingPrompt]:
+    """One question-less prompt per slot, built exactly as the app would."""
+    spread = SPREADS[spread_id]
+    position = spread["positions"][0]
+    prompts = []
+    for card, is_reversed, phase in enumerate_space(spread_id):
+        drawn = [{"card": card, "position": position, "is_reversed": is_reversed}]
+        prompts.append(TrainingPrompt(
+            id=reading_id(spread_id, style, layout, card["name"], is_reversed, phase["name"]),
+            spread_name=spread["name"],
+            question="",
+            question_category="none",
+            input_text=build_prompt(drawn, None, style=style, moon_phase=phase, layout=layout),
+        ))
+    return prompts
+
+
+def write_space(cache_dir: Path, spread_id: str, style: str, layout: str):
+    atomic_write_json(cache_dir / SPACE_FILE, {"spread": spread_id, "style": style, "layout": layout})
+
+
+def load_space(cache_dir: Path) -> Dict[str, str]:
+    """The spread, style and layout a generated space's prompts were rendered with."""
+    path = cache_dir / SPACE_FILE
+    if not path.exists():
+        raise ValueError(f"{path} not found; run 'precache generate' again to record the "
+                         f"style and layout")
+    with open(path) as f:
+        return json.load(f)
+
+
+# MARK: - Bundle
+
+def write_bundle(prompts_path: Path, output_path: Path, spread_id: str) -> Dict[str, int]:
+    """
+    Package merged responses in slot order; slots without a response stay empty.
+
+    The style and layout in the metadata come from the space.json written
+    with prompts_path.
+    """
+    space = load_space(prompts_path.parent)
+    if space["spread"] != spread_id:
+        raise ValueError(f"{prompts_path} holds {space['spread']} prompts, not {spread_id}")
+    responses = {p.id: p.response for p in load_prompts(prompts_path)
+                 if p.status == "completed" and p.response}
+
+    meta = json.dumps({
+        "spread": spread_id,
+        "style": space["style"],
+        "layout": space["layout"],
+        "cards": [c["name"] for c in CARDS],
+        "phases": [p["name"] for p in MOON_PHASES],
+    }).encode()
+
+    blob = bytearray()
+    offsets = [0]
+    filled = raw = 0
+    for card, is_reversed, phase in enumerate_space(spread_id):
+        text = responses.get(reading_id(spread_id, space["style"], space["layout"],
+                                        card["name"], is_reversed, phase["name"]))
+        if text:
+            data = text.encode("utf-8")
+            raw += len(data)
+            compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+            blob += compressor.compress(data) + compressor.flush()
+            filled += 1
+        offsets.append(len(blob))
+
+    slots = len(offsets) - 1
+    with open(output_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, slots, len(meta)))
+        f.write(meta)
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(blob)
+
+    return {"slots": slots, "filled": filled, "response_bytes": raw,
+            "bundle_bytes": output_path.stat().st_size}
+
+
+class ReadingBundle:
+    """mmap-backed lookup of precomputed readings."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, meta_len = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} reading bundle")
+        meta_start = _HEADER.size
+        self.meta = json.loads(self._buf[meta_start:meta_start + meta_len])
+        self._offsets = meta_start + meta_len
+        self._data = self._offsets + (self.slots + 1) * 4
+        self._card_index = {name: i for i, name in enumerate(self.meta["cards"])}
+        self._phase_index = {name: i for i, name in enumerate(self.meta["phases"])}
+
+    def close(self):
+        self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def slot(self, card_name: str, is_reversed: bool, phase_name: str) -> Optional[int]:
+        card = self._card_index.get(card_name)
+        phase = self._phase_index.get(phase_name)
+        if card is None or phase is None:
+            return None
+        return (card * 2 + is_reversed) * len(self._phase_index) + phase
+
+    def get(self, card_name: str, is_reversed: bool, phase_name: str) -> Optional[str]:
+        """The precomputed reading, or None when the app must run inference."""
+        slot = self.slot(card_name, is_reversed, phase_name)
+        if slot is None:
+            return None
+        start, end = struct.unpack_from("<2I", self._buf, self._offsets + slot * 4)
+        if start == end:
+            return None
+        return zlib.decompress(self._buf[self._data + start:self._data + end], -15).decode("utf-8")
+
+
+def verify_bundle(bundle_path: Path, prompts_path: Path) -> List[str]:
+    """Check every slot against the merged responses it was built from."""
+    with ReadingBundle(bundle_path) as bundle:
+        spread_id, style, layout = bundle.meta["spread"], bundle.meta["style"], bundle.meta["layout"]
+        responses = {p.id: p.response for p in load_prompts(prompts_path)
+                     if p.status == "completed" and p.response}
+        problems = []
+        for card, is_reversed, phase in enumerate_space(spread_id):
+            expected = responses.get(reading_id(spread_id, style, layout,
+                                                card["name"], is_reversed, phase["name"]))
+            if bundle.get(card["name"], is_reversed, phase["name"]) != expected:
+                problems.append(f"{card['name']} {'reversed' if is_reversed else 'upright'} "
+                                f"{phase['name']}: mismatch")
+    return problems
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Shared-prefix measurement for the prompt layouts.
+
+Renders the same sampled readings with every layout in LAYOUTS and reports
+the average prefix each prompt shares with:
+    previous  the prompt before it (a device keeping the last reading's KV cache)
+    best      the most similar other prompt (a prefix cache of every reading),
+              found as the longer adjacent common prefix after sorting
+
+Usage:
+    python prefix_stats.py --count 5000
+    python prefix_stats.py --count 5000 --same-day    # one moon phase, as on device
+    python prefix_stats.py --tokenizer path/to/tokenizer.json
+"""
+
+import os
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from prompt_generator import (
+    CHARS_PER_TOKEN, LAYOUTS, SPREAD_WEIGHTS, build_prompt, draw_cards,
+    get_random_moon_phase, sample_question,
+)
+
+
+def sample_readings(count: int, seed: int = 42, same_day: bool = False) -> List[Tuple]:
+    """(cards, question, moon_phase) tuples drawn with the dataset's spread weights."""
+    rng = random.Random(seed)
+    spread_ids = list(SPREAD_WEIGHTS)
+    weights = [SPREAD_WEIGHTS[s] for s in spread_ids]
+    day_phase = get_random_moon_phase(rng)
+    readings = []
+    for _ in range(count):
+        spread_id = rng.choices(spread_ids, weights=weights)[0]
+        question, _ = sample_question(rng)
+        cards = draw_cards(spread_id, rng)
+        readings.append((cards, question, day_phase if same_day else get_random_moon_phase(rng)))
+    return readings
+
+
+def common_prefix(a: Sequence, b: Sequence) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+def shared_prefix_stats(prompts: List[str], tokenizer=None) -> Dict[str, float]:
+    """Mean prompt length and shared prefix vs previous and best match, in tokens."""
+    if tokenizer:
+        seqs = [tuple(tokenizer.encode(p)) for p in prompts]
+        scale = 1.0
+    else:
+        seqs = prompts
+        scale = 1 / CHARS_PER_TOKEN
+
+    n = len(seqs)
+    previous = [common_prefix(seqs[i - 1], seqs[i]) for i in range(1, n)]
+
+    order = sorted(range(n), key=seqs.__getitem__)
+    best = [0] * n
+    for i in range(n - 1):
+        lcp = common_prefix(seqs[order[i]], seqs[order[i + 1]])
+        best[order[i]] = max(best[order[i]], lcp)
+        best[order[i + 1]] = max(best[order[i + 1]], lcp)
+
+    mean_len = sum(map(len, seqs)) / n
+    mean_previous = sum(previous) / max(len(previous), 1)
+    mean_best = sum(best) / n
+    return {
+        "prompt_tokens": round(mean_len * scale, 1),
+        "previous_tokens": round(mean_previous * scale, 1),
+        "best_tokens": round(mean_best * scale, 1),
+        "previous_pct": round(mean_previous / mean_len * 100, 1),
+        "best_pct": round(mean_best / mean_len * 100, 1),
+    }
+
+
+def compare_layouts(count: int = 5000, seed: int = 42, same_day: bool = False,
+                    style: str = "balanced", tokenizer=None) -> Dict[str, Dict]:
+    readings = sample_readings(count, seed, same_day)
+    results = {}
+    for layout in LAYOUTS:
+        prompts = [build_prompt(cards, question, style=style, moon_phase=phase, layout=layout)
+                   for cards, question, phase in readings]
+        results[layout] = shared_prefix_stats(prompts, tokenizer)
+    return results
+
+
+def format_comparison(results: Dict[str, Dict], unit: str = "tokens") -> str:
+    lines = [f"{'layout':<15} {'prompt':>8} {'vs previous':>18} {'vs best match':>18}"]
+    for layout, r in results.items():
+        lines.append(f"{layout:<15} {r['prompt_tokens']:>8.0f} "
+                     f"{r['previous_tokens']:>9.0f} ({r['previous_pct']:>4.1f}%) "
+                     f"{r['best_tokens']:>9.0f} ({r['best_pct']:>4.1f}%)")
+    lines.append(f"(mean shared prefix in {unit})")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure shared prompt prefixes per layout")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--style", default="balanced", choices=["balanced", "mystical", "practical"])
+    parser.add_argument("--same-day", action="store_true",
+                        help="Use one moon phase for every reading, as on a single day on device")
+    parser.add_argument("--tokenizer", default=None,
+                        help="Count real tokens with 'toy', a tokenizer.json or a vocab file "
+                             "(default: ~4 chars per token estimate)")
+    args = parser.parse_args()
+
+    tokenizer: Optional[object] = None
+    if args.tokenizer:
+        from pretokenize import load_tokenizer
+        tokenizer = load_tokenizer(args.tokenizer)
+
+    results = compare_layouts(args.count, args.seed, args.same_day, args.style, tokenizer)
+    print(format_comparison(results, tokenizer.name + " tokens" if tokenizer else "estimated tokens"))
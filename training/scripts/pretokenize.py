@@ -0,0 +1,227 @@
+"""
+Pre-tokenized, memory-mappable export of the SFT splits.
+
+For each split this writes three flat little-endian arrays:
+    {split}.tokens.bin   uint32 token ids of every example, concatenated
+    {split}.offsets.bin  uint64 start offset of each example (+ final end)
+    {split}.mask.bin     uint8 loss mask, 1 on the assistant response tokens
+plus tokenized.json describing the tokenizer and counts. Writing needs only
+the standard library; TokenizedDataset reads the arrays with numpy.memmap.
+
+Tokenizers are pluggable (see load_tokenizer): a byte-level toy tokenizer for
+tests, a greedy longest-match tokenizer over a local vocab file, or a local
+HuggingFace tokenizer.json when the `tokenizers` package is installed.
+"""
+
+import json
+import re
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+TOKENIZED_MANIFEST = "tokenized.json"
+ASSISTANT_MARKER = "<|assistant|>\n"
+SPECIAL_TOKENS = ["<|system|>", "<|user|>", "<|assistant|>", "<|end|>"]
+
+
+# MARK: - Tokenizers
+
+class ByteTokenizer:
+    """Toy tokenizer: UTF-8 bytes plus the Phi chat special tokens."""
+
+    name = "toy-bytes"
+
+    def __init__(self):
+        self.special = {tok: 256 + i for i, tok in enumerate(SPECIAL_TOKENS)}
+        self.vocab_size = 256 + len(self.special)
+        self._split = re.compile("(" + "|".join(re.escape(t) for t in SPECIAL_TOKENS) + ")")
+
+    def encode(self, text: str) -> List[int]:
+        ids = []
+        for part in self._split.split(text):
+            if part in self.special:
+                ids.append(self.special[part])
+            elif part:
+                ids.extend(part.encode("utf-8"))
+        return ids
+
+
+class VocabTokenizer:
+    """
+    Greedy longest-match tokenizer over a local vocab file.
+
+    Accepts a JSON object mapping token -> id (e.g. vocab.json) or a text file
+    with one token per line (id = line number). SentencePiece-style vocabs
+    whose tokens use "▁" for spaces are detected automatically. Characters
+    with no matching token map to the <unk> id.
+    """
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        if path.suffix == ".json":
+            with open(path) as f:
+                self.vocab: Dict[str, int] = json.load(f)
+        else:
+            with open(path, encoding="utf-8") as f:
+                self.vocab = {line.rstrip("\n"): i for i, line in enumerate(f)}
+        self.name = f"vocab:{path.name}"
+        self.vocab_size = max(self.vocab.values()) + 1
+        self.max_len = max(len(t) for t in self.vocab)
+        self.unk_id = self.vocab.get("<unk>", 0)
+        self.space = "▁" if any(t.startswith("▁") for t in self.vocab) else None
+
+    def encode(self, text: str) -> List[int]:
+        if self.space:
+            text = text.replace(" ", self.space)
+        ids, i, n = [], 0, len(text)
+        while i < n:
+            for j in range(min(n, i + self.max_len), i, -1):
+                tok = self.vocab.get(text[i:j])
+                if tok is not None:
+                    ids.append(tok)
+                    i = j
+                    break
+            else:
+                ids.append(self.unk_id)
+                i += 1
+        return ids
+
+
+class HFTokenizer:
+    """A local HuggingFace tokenizer.json, e.g. the one shipped with Phi-3."""
+
+    def __init__(self, path: Path):
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("tokenizer.json needs the 'tokenizers' package: pip install tokenizers")
+        self._tok = Tokenizer.from_file(str(path))
+        self.name = f"hf:{Path(path).name}"
+        self.vocab_size = self._tok.get_vocab_size()
+
+    def encode(self, text: str) -> List[int]:
+        return self._tok.encode(text, add_special_tokens=False).ids
+
+
+def load_tokenizer(spec: str):
+    """'toy' for ByteTokenizer, a tokenizer.json path, or a vocab file path."""
+    if spec == "toy":
+        return ByteTokenizer()
+    path = Path(spec)
+    if not path.exists():
+        raise FileNotFoundError(f"Tokenizer file not found: {spec}")
+    if path.name == "tokenizer.json":
+        return HFTokenizer(path)
+    return VocabTokenizer(path)
+
+
+# MARK: - Export
+
+def split_completion(text: str) -> Tuple[str, str]:
+    """Split a formatted example into (prompt, assistant completion)."""
+    idx = text.rfind(ASSISTANT_MARKER)
+    if idx < 0:
+        return text, ""
+    cut = idx + len(ASSISTANT_MARKER)
+    return text[:cut], text[cut:]
+
+
+def _write_array(arr: array, path: Path):
+    if sys.byteorder == "big":
+        arr.byteswap()
+    with open(path, "wb") as f:
+        arr.tofile(f)
+
+
+def export_split(input_path: Path, output_dir: Path, name: str, tokenizer) -> Dict:
+    tokens, mask = array("I"), array("B")
+    offsets = array("Q", [0])
+
+    with open(input_path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            prompt, completion = split_completion(json.loads(line)["text"])
+            prompt_ids = tokenizer.encode(prompt)
+            completion_ids = tokenizer.encode(completion)
+            tokens.extend(prompt_ids)
+            tokens.extend(completion_ids)
+            mask.extend(bytes(len(prompt_ids)))
+            mask.extend(b"\x01" * len(completion_ids))
+            offsets.append(len(tokens))
+
+    _write_array(tokens, output_dir / f"{name}.tokens.bin")
+    _write_array(offsets, output_dir / f"{name}.offsets.bin")
+    _write_array(mask, output_dir / f"{name}.mask.bin")
+    return {"examples": len(offsets) - 1, "tokens": len(tokens), "loss_tokens": sum(mask)}
+
+
+def export_tokenized(sft_dir: Path, output_dir: Path, tokenizer,
+                     splits=("train", "valid", "test")) -> Dict:
+    """Tokenize every split JSONL in sft_dir into memory-mappable arrays."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "tokenizer": tokenizer.name,
+        "vocab_size": tokenizer.vocab_size,
+        "dtypes": {"tokens": "<u4", "offsets": "<u8", "mask": "u1"},
+        "splits": {},
+    }
+    for name in splits:
+        path = sft_dir / f"{name}.jsonl"
+        if not path.exists():
+            continue
+        stats = export_split(path, output_dir, name, tokenizer)
+        manifest["splits"][name] = stats
+        print(f"  {name}: {stats['examples']} examples, {stats['tokens']} tokens")
+
+    with open(output_dir / TOKENIZED_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# MARK: - Reader
+
+class TokenizedDataset:
+    """Memory-mapped view of one exported split (requires numpy)."""
+
+    def __init__(self, directory: Path, split: str = "train"):
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("TokenizedDataset needs numpy: pip install numpy")
+        directory = Path(directory)
+        with open(directory / TOKENIZED_MANIFEST) as f:
+            self.manifest = json.load(f)
+        dtypes = self.manifest["dtypes"]
+
+        def mmap(kind: str):
+            path = directory / f"{split}.{kind}.bin"
+            if path.stat().st_size == 0:
+                return np.zeros(0, dtype=dtypes[kind])
+            return np.memmap(path, dtype=dtypes[kind], mode="r")
+
+        self.tokens = mmap("tokens")
+        self.offsets = mmap("offsets")
+        self.mask = mmap("mask")
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, i: int):
+        """(token ids, loss mask) arrays for example i."""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.tokens[start:end], self.mask[start:end]
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sft-dir", default="../data/sft")
+    parser.add_argument("--output-dir", default="../data/sft/tokenized")
+    parser.add_argument("--tokenizer", default="toy",
+                        help="'toy', a tokenizer.json path, or a vocab file path")
+    args = parser.parse_args()
+
+    base = Path(__file__).parent
+    export_tokenized(base / args.sft_dir, base / args.output_dir, load_tokenizer(args.tokenizer))
@@ -0,0 +1,156 @@
+"""
+Opt-in profiling for `run.py --profile`.
+
+Stages record wall time, CPU time and peak tracemalloc memory. Hot functions
+are decorated with @timed(name) to accumulate call counts and time as named
+spans; when profiling is off the wrapper costs a single flag check.
+"""
+
+import functools
+import inspect
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_enabled = False
+_spans: Dict[str, List[float]] = {}   # name -> [calls, total seconds]
+_stages: List[Dict] = []
+_stack: List[Dict] = []
+
+
+def enable():
+    global _enabled
+    _enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _record(name: str, elapsed: float):
+    entry = _spans.get(name)
+    if entry is None:
+        _spans[name] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def timed(name: str):
+    """Decorator accumulating calls and time under a span name (generator-aware)."""
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            def timed_gen(gen):
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    _record(name, elapsed)
+
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                # Disabled: hand back fn's own generator, no extra frame per item
+                if not _enabled:
+                    return fn(*args, **kwargs)
+                return timed_gen(fn(*args, **kwargs))
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as a named span."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+@contextmanager
+def stage(name: str):
+    """Record wall time, CPU time and peak traced memory for a pipeline stage."""
+    if not _enabled:
+        yield
+        return
+    frame = {"name": name, "inner_peak": 0}
+    _stack.append(frame)
+    tracemalloc.reset_peak()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        peak = max(tracemalloc.get_traced_memory()[1], frame["inner_peak"])
+        _stack.pop()
+        if _stack:
+            _stack[-1]["inner_peak"] = max(_stack[-1]["inner_peak"], peak)
+        _stages.append({
+            "stage": name,
+            "wall_s": round(time.perf_counter() - wall, 4),
+            "cpu_s": round(time.process_time() - cpu, 4),
+            "peak_mem_mb": round(peak / (1 << 20), 2),
+        })
+
+
+def report() -> Dict:
+    return {
+        "stages": list(_stages),
+        "spans": {
+            name: {
+                "calls": int(calls),
+                "total_s": round(total, 4),
+                "mean_ms": round(total / calls * 1000, 4) if calls else 0.0,
+            }
+            for name, (calls, total) in sorted(_spans.items(), key=lambda kv: -kv[1][1])
+        },
+    }
+
+
+def report_path(output_dir: Path, command: str) -> Path:
+    """Timestamped report path; a cProfile dump shares its stem."""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    return output_dir / f"{command}-{stamp}.json"
+
+
+def write_report(path: Path, command: str, argv: List[str],
+                 cprofile_path: Optional[Path] = None):
+    """Write the JSON profile report."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "command": command,
+        "argv": argv,
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **report(),
+    }
+    if cprofile_path:
+        data["cprofile"] = str(cprofile_path)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
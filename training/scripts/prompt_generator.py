@@ -4,13 +4,21 @@ Uses the same JSON data from TaroApp/Resources/.
 """
 
 import json
+import math
 import random
 import hashlib
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import Callable, Container, Iterator, List, Dict, Optional, Sequence, Tuple
 from pathlib import Path
 from datetime import datetime, timezone
 
+import eventlog
+from checkpoint import (
+    clear_checkpoint, load_checkpoint, reopen_output, restore_rng, rng_state, save_checkpoint,
+)
+from jsonstream import iter_json_objects
+from profiling import timed
+
 
 # MARK: - Moon Phase (mirrors MoonPhase.swift)
 
@@ -73,29 +81,33 @@ POSITION_MODIFIERS = load_json("position-modifiers")
 COMBINATIONS = load_json("combinations")["combinations"]
 
 
-def get_base_meaning(card_name: str, is_reversed: bool) -> str:
+def get_base_meaning(card_name: str, is_reversed: bool, meanings: Optional[Dict] = None) -> str:
     """Get base meaning for a card (mirrors DataService.baseMeaning)."""
-    meaning = BASE_MEANINGS.get("major", {}).get(card_name)
+    meanings = BASE_MEANINGS if meanings is None else meanings
+    meaning = meanings.get("major", {}).get(card_name)
     if not meaning:
-        meaning = BASE_MEANINGS.get("minor", {}).get(card_name)
+        meaning = meanings.get("minor", {}).get(card_name)
     if not meaning:
         return "Meaning not available"
     return meaning["reversed"] if is_reversed else meaning["upright"]
 
 
-def get_position_modifier(card_name: str, position_id: str, is_reversed: bool) -> Optional[str]:
+def get_position_modifier(card_name: str, position_id: str, is_reversed: bool,
+                          position_modifiers: Optional[Dict] = None) -> Optional[str]:
     """Get position modifier (mirrors DataService.positionModifier)."""
-    modifiers = POSITION_MODIFIERS.get("modifiers", {}).get(card_name)
+    position_modifiers = POSITION_MODIFIERS if position_modifiers is None else position_modifiers
+    modifiers = position_modifiers.get("modifiers", {}).get(card_name)
     if not modifiers:
         return None
     orientation = "reversed" if is_reversed else "upright"
     return modifiers.get(orientation, {}).get(position_id)
 
 
-def find_combinations(card_names: List[str]) -> List[Dict]:
+def find_combinations(card_names: List[str], combinations: Optional[List[Dict]] = None) -> List[Dict]:
     """Find matching combinations (mirrors ReadingInterpretation.findCombinations)."""
     card_set = set(card_names)
-    return [c for c in COMBINATIONS if all(card in card_set for card in c["cards"])]
+    return [c for c in (COMBINATIONS if combinations is None else combinations)
+            if all(card in card_set for card in c["cards"])]
 
 
 # MARK: - Card Data (mirrors CardDeck.swift)
@@ -220,19 +232,34 @@ SPREAD_WEIGHTS = {"single": 0.15, "threeCard": 0.30, "situation": 0.20, "horsesh
 
 # MARK: - Prompt Building (mirrors PromptAssembler.assemblePrompt exactly)
 
-def build_prompt(drawn_cards: List[Dict], question: Optional[str], style: str = "balanced", moon_phase: Dict = None) -> str:
-    """
-    Build prompt exactly as iOS PromptAssembler.assemblePrompt() does.
+READING_INSTRUCTION = ("Weave these elements into a flowing interpretation (3-4 paragraphs). "
+                       "Address the seeker directly. End with actionable insight.")
 
-    Args:
-        drawn_cards: List of {"card": card_dict, "position": position_dict, "is_reversed": bool}
-        question: Optional querent question
-        style: "balanced", "mystical", or "practical"
-        moon_phase: Optional moon phase dict, uses random if None for training variety
+# "standard" puts the per-reading TIMING and QUESTION lines first;
+# "prefix_stable" (mirrors PromptLayout.prefixStable) orders sections from most
+# to least shared across readings so on-device KV-cache prefixes can be reused:
+# instruction, today's timing, cards, combinations, elements, question.
+LAYOUTS = ("standard", "prefix_stable")
 
-    Returns:
-        Complete prompt in Phi-3 chat format
-    """
+
+@dataclass
+class PromptSections:
+    """Card-dependent parts of a prompt, reusable across styles, phases and layouts."""
+    card_context: str
+    combinations_context: str
+    elemental_context: str
+    first_card: str
+
+
+STYLE_INSTRUCTIONS = {
+    "balanced": "Provide a balanced interpretation that combines intuitive insight with practical guidance.",
+    "mystical": "Provide a deeply symbolic and poetic interpretation, rich with mystical imagery and spiritual insight.",
+    "practical": "Provide direct, actionable guidance focused on practical steps and clear advice.",
+}
+
+
+def prompt_sections(drawn_cards: List[Dict]) -> PromptSections:
+    """Compute the card, combination and elemental sections of a prompt."""
     # Build card context
     card_context = ""
     card_names = []
@@ -283,39 +310,75 @@ def build_prompt(drawn_cards: List[Dict], question: Optional[str], style: str =
     if dominant:
         elemental_context += f"\nDominant: {dominant} energy"
 
+    return PromptSections(card_context, combinations_context, elemental_context, card_names[0])
+
+
+def render_prompt(sections: PromptSections, question: Optional[str], style: str = "balanced",
+                  moon_phase: Dict = None, layout: str = "standard") -> str:
+    """Assemble a full prompt from precomputed sections (see build_prompt)."""
     # Style instruction (mirrors PromptAssembler)
-    style_instructions = {
-        "balanced": "Provide a balanced interpretation that combines intuitive insight with practical guidance.",
-        "mystical": "Provide a deeply symbolic and poetic interpretation, rich with mystical imagery and spiritual insight.",
-        "practical": "Provide direct, actionable guidance focused on practical steps and clear advice.",
-    }
-    style_instruction = style_instructions.get(style, style_instructions["balanced"])
+    style_instruction = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["balanced"])
 
     # Moon phase timing context (new feature)
     if moon_phase is None:
         # For training, we use a fixed phase based on card hash for reproducibility
-        moon_phase = MOON_PHASES[hash(card_names[0]) % len(MOON_PHASES)]
+        moon_phase = MOON_PHASES[hash(sections.first_card) % len(MOON_PHASES)]
     timing_context = f"TIMING: {moon_phase_context(moon_phase)}\n\n"
 
-    # Question context
-    question_context = f'QUESTION: "{question}"\n\n' if question else ""
+    card_context = sections.card_context
+    combinations_context = sections.combinations_context
+    elemental_context = sections.elemental_context
+    if layout == "prefix_stable":
+        question_context = f'\n\nQUESTION: "{question}"' if question else ""
+        user_prompt = (f"{READING_INSTRUCTION}\n\n{timing_context}The following cards were drawn:\n\n"
+                       f"{card_context}{combinations_context}{elemental_context}{question_context}")
+    elif layout == "standard":
+        question_context = f'QUESTION: "{question}"\n\n' if question else ""
+        user_prompt = (f"{timing_context}{question_context}The following cards were drawn:\n\n"
+                       f"{card_context}{combinations_context}{elemental_context}\n\n{READING_INSTRUCTION}")
+    else:
+        raise ValueError(f"Unknown layout: {layout}")
 
     # Build full prompt in Phi-3 format (mirrors iOS PromptAssembler.assemblePrompt)
     prompt = f"""<|system|>
 You are crafting a tarot reading. Weave the provided card interpretations into a cohesive narrative. {style_instruction}<|end|>
 <|user|>
-{timing_context}{question_context}The following cards were drawn:
-
-{card_context}{combinations_context}{elemental_context}
-
-Weave these elements into a flowing interpretation (3-4 paragraphs). Address the seeker directly. End with actionable insight.<|end|>
+{user_prompt}<|end|>
 <|assistant|>
 """
     return prompt
 
 
+@timed("build_prompt")
+def build_prompt(drawn_cards: List[Dict], question: Optional[str], style: str = "balanced",
+                 moon_phase: Dict = None, layout: str = "standard") -> str:
+    """
+    Build prompt exactly as iOS PromptAssembler.assemblePrompt() does.
+
+    Args:
+        drawn_cards: List of {"card": card_dict, "position": position_dict, "is_reversed": bool}
+        question: Optional querent question
+        style: "balanced", "mystical", or "practical"
+        moon_phase: Optional moon phase dict, uses random if None for training variety
+        layout: "standard" or "prefix_stable" (see LAYOUTS)
+
+    Returns:
+        Complete prompt in Phi-3 chat format
+    """
+    return render_prompt(prompt_sections(drawn_cards), question, style, moon_phase, layout)
+
+
 # MARK: - Training Data Generation
 
+# Rough chars-per-token ratio for English text under the Phi-3 tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count without a tokenizer."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
 @dataclass
 class TrainingPrompt:
     id: str
@@ -632,64 +695,262 @@ def generate_id(spread_id: str, question: str, cards: List[Dict]) -> str:
     return hashlib.md5(f"{spread_id}|{question}|{card_str}".encode()).hexdigest()[:12]
 
 
-def generate_dataset(count: int = 25000, seed: int = 42) -> List[TrainingPrompt]:
-    """Generate training prompts using iOS prompt format."""
+def distinct_readings(spread_id: str) -> int:
+    """Number of distinct (question, cards, orientations) combinations for a spread."""
+    positions = len(SPREADS[spread_id]["positions"])
+    questions = sum(len(qs) for qs in QUESTIONS.values())
+    return questions * math.perm(len(CARDS), positions) * 2 ** positions
+
+
+def phase_slug(phase: Dict) -> str:
+    return phase["name"].lower().replace(" ", "-")
+
+
+def expand_variants(styles: Sequence[str], phases: Optional[Sequence[str]] = None) -> List[Tuple[str, Optional[Dict]]]:
+    """
+    Cross-product of styles and moon phases (slugs like "full-moon", or "all").
+
+    Without phases each variant gets a random phase per draw (phase None).
+    """
+    if not phases:
+        resolved: List[Optional[Dict]] = [None]
+    elif "all" in phases:
+        resolved = list(MOON_PHASES)
+    else:
+        by_slug = {phase_slug(p): p for p in MOON_PHASES}
+        unknown = [name for name in phases if name not in by_slug]
+        if unknown:
+            raise ValueError(f"Unknown moon phases: {unknown}; expected {sorted(by_slug)} or 'all'")
+        resolved = [by_slug[name] for name in phases]
+    for style in styles:
+        if style not in STYLE_INSTRUCTIONS:
+            raise ValueError(f"Unknown style: {style}")
+    return [(style, phase) for style in styles for phase in resolved]
+
+
+def variant_id(pid: str, style: str, phase: Optional[Dict]) -> str:
+    key = f"{pid}|{style}|{phase['name'] if phase else 'random'}"
+    return hashlib.md5(key.encode()).hexdigest()[:12]
+
+
+def generate_dataset(count: int = 25000, seed: int = 42, layout: str = "standard",
+                     exclude: Optional[Container[str]] = None,
+                     variants: Optional[List[Tuple[str, Optional[Dict]]]] = None,
+                     checkpoint: Optional[Path] = None, resume: bool = False,
+                     checkpoint_every: int = 10000,
+                     keep: Optional[Callable[[str], bool]] = None,
+                     positions: Optional[List[int]] = None,
+                     known: Optional[Dict[str, int]] = None) -> List[TrainingPrompt]:
+    """
+    Generate training prompts using iOS prompt format.
+
+    IDs in exclude (e.g. an IdFilter of earlier runs) are redrawn like
+    in-run duplicates, so only novel prompts are returned. known (spread
+    name -> IDs in exclude) lets a spread whose novel readings would run out
+    fail before drawing; without it that is only found when redraws give up.
+    Both raise ValueError.
+
+    With variants (see expand_variants) each of the count draws is rendered
+    once per (style, moon phase) from card sections computed once per draw.
+
+    With checkpoint, prompts are streamed to a partial file next to it and
+    the RNG state and loop position are saved every checkpoint_every draws.
+    resume=True continues from the last checkpoint (the dedup set is rebuilt
+    from the flushed output) and returns exactly what an uninterrupted run
+    would. Call clear_generation_checkpoint once the result is saved.
+
+    With keep (e.g. a shard's ID hash test), only prompts whose ID it accepts
+    are rendered and returned, but every draw is still made, so they are
+    exactly the accepted prompts of the unfiltered run. They are returned in
+    that run's shuffled order and their positions in it are appended to
+    positions.
+    """
     rng = random.Random(seed)
 
     # Distribute across spreads
     spread_counts = {sid: int(count * w) for sid, w in SPREAD_WEIGHTS.items()}
     spread_counts["threeCard"] += count - sum(spread_counts.values())
-
-    print(f"Generating {count} prompts:")
+    for sid, n in spread_counts.items():
+        if n > distinct_readings(sid):
+            raise ValueError(f"{SPREADS[sid]['name']}: {n} prompts requested but only "
+                             f"{distinct_readings(sid)} distinct readings exist")
+    if known:
+        left = {sid: max(0, distinct_readings(sid) - known.get(SPREADS[sid]["name"], 0))
+                for sid in spread_counts}
+        short = [sid for sid, n in spread_counts.items() if n > left[sid]]
+        if short:
+            raise ValueError("Not enough novel readings left: " + ", ".join(
+                f"{SPREADS[sid]['name']} needs {spread_counts[sid]}, has {left[sid]}" for sid in short))
+
+    if variants is None:
+        print(f"Generating {count} prompts:")
+    else:
+        print(f"Generating {count} draws x {len(variants)} variants:")
     for sid, c in spread_counts.items():
         print(f"  {sid}: {c}")
 
     prompts = []
+    indices = []    # generation index of each kept prompt
     seen = set()
-
-    for spread_id, n in spread_counts.items():
+    generated = 0
+    start = (0, 0)
+    output = None
+    if checkpoint:
+        params = json.loads(json.dumps({
+            "count": count, "seed": seed, "layout": layout, "exclude": exclude is not None,
+            "variants": variants and [(style, phase and phase["name"]) for style, phase in variants],
+        }))
+        if keep is not None:
+            params["keep"] = True
+        partial = partial_output_path(checkpoint)
+        state = load_checkpoint(checkpoint) if resume else None
+        if state is not None:
+            if state["params"] != params:
+                raise ValueError(f"{checkpoint} was written by a run with different parameters")
+            restore_rng(rng, state["rng"])
+            start = (state["spread"], state["draw"])
+        output = reopen_output(partial, state)
+        if state is not None:
+            with open(partial, "rb") as f:
+                for line in f:
+                    base_id, _ = json.loads(line)
+                    seen.add(base_id)
+                    generated += 1
+            print(f"  Resuming after {len(seen)} draws ({generated} prompts)")
+
+    def is_known(pid: str) -> bool:
+        if pid in seen:
+            return True
+        if exclude is None:
+            return False
+        if variants is None:
+            return pid in exclude
+        return any(variant_id(pid, style, phase) in exclude for style, phase in variants)
+
+    for spread_index, (spread_id, n) in enumerate(spread_counts.items()):
+        if spread_index < start[0]:
+            continue
         spread = SPREADS[spread_id]
-        for _ in range(n):
+        for draw in range(start[1] if spread_index == start[0] else 0, n):
+            if output and seen and len(seen) % checkpoint_every == 0:
+                save_checkpoint(checkpoint, output, params=params, spread=spread_index,
+                                draw=draw, rng=rng_state(rng))
+
             question, cat = sample_question(rng)
             cards = draw_cards(spread_id, rng)
             pid = generate_id(spread_id, question, cards)
 
-            while pid in seen:
+            attempts = 0
+            while is_known(pid):
+                attempts += 1
+                if attempts >= 100_000:
+                    raise ValueError(f"{spread['name']}: no novel prompts left to draw after "
+                                     f"{draw} of {n}; earlier runs cover the rest of its "
+                                     f"{distinct_readings(spread_id)} distinct readings")
+                if attempts % 100 == 0:
+                    # This question's card space is nearly exhausted
+                    question, cat = sample_question(rng)
                 cards = draw_cards(spread_id, rng)
                 pid = generate_id(spread_id, question, cards)
 
             seen.add(pid)
-            # Use random moon phase for training data variety
-            moon_phase = get_random_moon_phase(rng)
-            input_text = build_prompt(cards, question, style="balanced", moon_phase=moon_phase)
-
-            prompts.append(TrainingPrompt(
-                id=pid,
-                spread_name=spread["name"],
-                question=question,
-                question_category=cat,
-                input_text=input_text,
-            ))
-
-            if len(prompts) % 5000 == 0:
-                print(f"  Generated {len(prompts)}...")
-
-    rng.shuffle(prompts)
-    print(f"Generated {len(prompts)} prompts")
-    return prompts
-
-
+            # Moon phases are drawn for skipped prompts too, keeping the RNG in step
+            if variants is None:
+                # Use random moon phase for training data variety
+                moon_phase = get_random_moon_phase(rng)
+                input_text = None
+                if keep is None or keep(pid):
+                    input_text = build_prompt(cards, question, style="balanced", moon_phase=moon_phase, layout=layout)
+                rendered = [(pid, input_text)]
+            else:
+                phases = [(variant_id(pid, style, phase), style, phase or get_random_moon_phase(rng))
+                          for style, phase in variants]
+                kept = [keep is None or keep(vid) for vid, _, _ in phases]
+                sections = prompt_sections(cards) if any(kept) else None
+                rendered = [
+                    (vid, render_prompt(sections, question, style, phase, layout) if k else None)
+                    for (vid, style, phase), k in zip(phases, kept)
+                ]
+
+            for prompt_id, input_text in rendered:
+                if input_text is None:
+                    if output:
+                        output.write(json.dumps([pid, None]).encode() + b"\n")
+                    generated += 1
+                    continue
+                prompt = TrainingPrompt(
+                    id=prompt_id,
+                    spread_name=spread["name"],
+                    question=question,
+                    question_category=cat,
+                    input_text=input_text,
+                )
+                if output:
+                    output.write(json.dumps([pid, prompt.to_dict()]).encode() + b"\n")
+                else:
+                    prompts.append(prompt)
+                    indices.append(generated)
+                generated += 1
+
+            if len(seen) % 5000 == 0:
+                print(f"  Generated {generated}...")
+                eventlog.emit("progress", stage="prompts", generated=generated, total=count)
+
+    if output:
+        output.close()
+        with open(partial, "rb") as f:
+            for index, line in enumerate(f):
+                d = json.loads(line)[1]
+                if d is not None:
+                    prompts.append(TrainingPrompt.from_dict(d))
+                    indices.append(index)
+
+    if keep is None:
+        rng.shuffle(prompts)
+        print(f"Generated {len(prompts)} prompts")
+        return prompts
+
+    # shuffle draws the same swaps for any list of this length
+    order = list(range(generated))
+    rng.shuffle(order)
+    rank = [0] * generated
+    for position, index in enumerate(order):
+        rank[index] = position
+    ranked = sorted(zip((rank[i] for i in indices), prompts), key=lambda x: x[0])
+    if positions is not None:
+        positions.extend(position for position, _ in ranked)
+    print(f"Generated {len(ranked)} of {generated} prompts")
+    return [p for _, p in ranked]
+
+
+def partial_output_path(checkpoint: Path) -> Path:
+    return checkpoint.with_suffix(".partial.jsonl")
+
+
+def clear_generation_checkpoint(checkpoint: Path):
+    clear_checkpoint(checkpoint, partial_output_path(checkpoint))
+
+
+@timed("save_prompts")
 def save_prompts(prompts: List[TrainingPrompt], path: Path):
     with open(path, 'w') as f:
         json.dump([p.to_dict() for p in prompts], f, indent=2)
     print(f"Saved to {path}")
 
 
+@timed("load_prompts")
 def load_prompts(path: Path) -> List[TrainingPrompt]:
     with open(path) as f:
         return [TrainingPrompt.from_dict(d) for d in json.load(f)]
 
 
+def iter_prompts(path: Path) -> Iterator[TrainingPrompt]:
+    """Stream prompts from prompts.json one at a time."""
+    with open(path) as f:
+        for d in iter_json_objects(f):
+            yield TrainingPrompt.from_dict(d)
+
+
 def get_dataset_stats(prompts: List[TrainingPrompt]) -> Dict:
     stats = {"total": len(prompts), "with_question": 0, "by_spread": {}, "by_category": {}, "by_status": {}}
     for p in prompts:
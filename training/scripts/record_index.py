@@ -0,0 +1,242 @@
+"""
+Persistent prompt ID -> (file, byte offset, length) index.
+
+Covers prompts.json, batch files, response files and the SFT split files,
+so `run.py show <id>` can read one record with an mmap slice instead of
+grepping every file. The index is a SQLite database next to the data:
+
+    files    path, size, mtime_ns of every indexed file
+    records  id, kind, path, offset, length
+
+RecordIndex.update only rescans files whose size or mtime changed (and drops
+files that disappeared), so new response files are picked up in time
+proportional to their own size. Files are scanned as latin-1 so character
+offsets are byte offsets; records are decoded as UTF-8 on read.
+"""
+
+import json
+import mmap
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from jsonstream import iter_json_spans, scan_objects
+
+INDEX_FILE = "record_index.sqlite"
+KINDS = ("prompt", "batch", "response", "sft")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, kind TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT NOT NULL, kind TEXT NOT NULL, path TEXT NOT NULL,
+    offset INTEGER NOT NULL, length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_id ON records (id);
+CREATE INDEX IF NOT EXISTS records_path ON records (path);
+"""
+
+Span = Tuple[str, int, int]
+
+
+def _scan_array(path: Path) -> Iterator[Span]:
+    """Objects in prompts.json or a response JSONL file."""
+    with open(path, encoding="latin-1") as f:
+        for obj, offset, length in iter_json_spans(f):
+            if "id" in obj:
+                yield obj["id"], offset, length
+
+
+def _scan_batch(path: Path) -> Iterator[Span]:
+    """Prompt objects inside a batch file's "prompts" array."""
+    text = path.read_text(encoding="latin-1")
+    key = text.find('"prompts"')
+    if key < 0:
+        return
+    spans: List[Tuple[int, int]] = []
+    objects, _, _ = scan_objects(text, text.index("[", key) + 1, True, spans=spans)
+    for obj, (start, end) in zip(objects, spans):
+        if "id" in obj:
+            yield obj["id"], start, end - start
+
+
+def _scan_sft(sft_dir: Path) -> Iterator[Tuple[str, Span]]:
+    """
+    SFT examples carry no ID; the n-th ID of a split in ids.tsv is the n-th
+    line of that split's file.
+    """
+    from convert_to_sft import IDS_FILE, SPLITS
+    ids: Dict[str, List[str]] = {name: [] for name in SPLITS}
+    with open(sft_dir / IDS_FILE) as f:
+        for line in f:
+            if line.strip():
+                pid, split = line.rstrip("\n").split("\t")
+                ids[split].append(pid)
+    for split in SPLITS:
+        path = sft_dir / f"{split}.jsonl"
+        if not path.exists():
+            continue
+        with open(path, "rb") as f:
+            offset = 0
+            for pid, line in zip(ids[split], f):
+                yield str(path), (pid, offset, len(line.rstrip(b"\n")))
+                offset += len(line)
+
+
+def _sft_split_mode(sft_dir: Path) -> Optional[str]:
+    """
+    split_mode from metadata.json. Only conversions that record one write
+    ids.tsv alongside their splits; an older shuffled conversion may have
+    left a streaming run's ids.tsv behind.
+    """
+    path = sft_dir / "metadata.json"
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f).get("split_mode")
+
+
+def indexed_files(data_dir: Path) -> Dict[Path, str]:
+    """Every file the index covers, mapped to its kind."""
+    files = {}
+    if (data_dir / "prompts.json").exists():
+        files[data_dir / "prompts.json"] = "prompt"
+    batches_dir = data_dir / "batches"
+    for pattern in ("batch_[0-9]*.json", "repair_[0-9]*.json"):
+        for path in sorted(batches_dir.glob(pattern)):
+            files[path] = "batch"
+    for pattern in ("*.jsonl", "*.txt"):
+        for path in sorted((batches_dir / "responses").glob(pattern)):
+            files[path] = "response"
+    sft_dir = data_dir / "sft"
+    from convert_to_sft import IDS_FILE, SPLITS
+    if (sft_dir / IDS_FILE).exists() and _sft_split_mode(sft_dir) in ("hash", "shuffled"):
+        files[sft_dir / IDS_FILE] = "sft"
+        for split in SPLITS:
+            if (sft_dir / f"{split}.jsonl").exists():
+                files[sft_dir / f"{split}.jsonl"] = "sft"
+    return files
+
+
+class RecordIndex:
+    """SQLite-backed ID index with mmap record reads."""
+
+    def __init__(self, data_dir: Path, path: Optional[Path] = None):
+        self.data_dir = data_dir
+        self.path = path or data_dir / INDEX_FILE
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _rel(self, path: Path) -> str:
+        return str(Path(path).relative_to(self.data_dir))
+
+    def update(self, rebuild: bool = False) -> Dict[str, int]:
+        """Rescan new and changed files; returns counts of what was done."""
+        stats = {"scanned_files": 0, "removed_files": 0, "records": 0}
+        with self.db:
+            if rebuild:
+                self.db.execute("DELETE FROM files")
+                self.db.execute("DELETE FROM records")
+            known = {row[0]: (row[1], row[2]) for row in
+                     self.db.execute("SELECT path, size, mtime_ns FROM files")}
+            current = {}
+            for path, kind in indexed_files(self.data_dir).items():
+                st = path.stat()
+                current[self._rel(path)] = (path, kind, st.st_size, st.st_mtime_ns)
+
+            for rel in set(known) - set(current):
+                self._forget(rel)
+                stats["removed_files"] += 1
+
+            changed = {rel: v for rel, v in current.items() if known.get(rel) != (v[2], v[3])}
+            sft_changed = any(kind == "sft" for _, kind, _, _ in changed.values())
+            for rel, (path, kind, size, mtime_ns) in current.items():
+                if kind == "sft" and sft_changed:
+                    self._forget(rel)
+                    self._record_file(rel, kind, size, mtime_ns)
+                elif rel in changed:
+                    self._forget(rel)
+                    self._record_file(rel, kind, size, mtime_ns)
+                    scan = _scan_batch if kind == "batch" else _scan_array
+                    stats["records"] += self._insert(kind, rel, scan(path))
+                    stats["scanned_files"] += 1
+
+            if sft_changed:
+                sft_dir = self.data_dir / "sft"
+                for path, spans in groupby(_scan_sft(sft_dir), key=itemgetter(0)):
+                    stats["records"] += self._insert("sft", self._rel(Path(path)),
+                                                     (span for _, span in spans))
+                stats["scanned_files"] += 1
+        return stats
+
+    def _forget(self, rel: str):
+        self.db.execute("DELETE FROM records WHERE path = ?", (rel,))
+        self.db.execute("DELETE FROM files WHERE path = ?", (rel,))
+
+    def _record_file(self, rel: str, kind: str, size: int, mtime_ns: int):
+        self.db.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (rel, kind, size, mtime_ns))
+
+    def _insert(self, kind: str, rel: str, spans) -> int:
+        cur = self.db.executemany(
+            "INSERT INTO records VALUES (?, ?, ?, ?, ?)",
+            ((pid, kind, rel, offset, length) for pid, offset, length in spans))
+        return cur.rowcount
+
+    def locate(self, prompt_id: str) -> List[Tuple[str, str, int, int]]:
+        """(kind, path, offset, length) of every record for prompt_id."""
+        return self.db.execute(
+            "SELECT kind, path, offset, length FROM records WHERE id = ? ORDER BY kind, path",
+            (prompt_id,)).fetchall()
+
+    def read(self, rel: str, offset: int, length: int) -> Dict:
+        with open(self.data_dir / rel, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return json.loads(buf[offset:offset + length].decode("utf-8"))
+
+    def lookup(self, prompt_id: str) -> Dict[str, List[Dict]]:
+        """Records for prompt_id grouped by kind, each with its path."""
+        found: Dict[str, List[Dict]] = {kind: [] for kind in KINDS}
+        for kind, rel, offset, length in self.locate(prompt_id):
+            found[kind].append({"path": rel, "offset": offset, "record": self.read(rel, offset, length)})
+        return found
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(DISTINCT id) FROM records").fetchone()[0]
+
+
+def format_record(prompt_id: str, found: Dict[str, List[Dict]]) -> str:
+    lines = [f"ID: {prompt_id}"]
+    prompt = found["prompt"][0]["record"] if found["prompt"] else None
+    if prompt:
+        lines.append(f"Spread: {prompt['spread_name']}")
+        lines.append(f"Question: {prompt['question'] or '(none)'} [{prompt['question_category']}]")
+        lines.append(f"Status: {prompt['status']}")
+    for entry in found["batch"]:
+        lines.append(f"Batch: {entry['path']}")
+    split = [Path(entry["path"]).stem for entry in found["sft"]]
+    lines.append(f"SFT split: {', '.join(split) if split else '(not converted)'}")
+
+    text = prompt["input_text"] if prompt else (found["batch"][0]["record"]["input"] if found["batch"] else None)
+    if text:
+        lines += ["", "--- Prompt ---", text.rstrip()]
+    if prompt and prompt.get("response"):
+        lines += ["", "--- Response (prompts.json) ---", prompt["response"].rstrip()]
+    for entry in found["response"]:
+        response = str(entry["record"].get("response", "")).rstrip()
+        if prompt and response == (prompt.get("response") or "").rstrip():
+            lines += ["", f"--- Response ({entry['path']}): same as merged ---"]
+        else:
+            lines += ["", f"--- Response ({entry['path']}) ---", response]
+    return "\n".join(lines)
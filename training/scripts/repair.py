@@ -0,0 +1,161 @@
+"""
+Repair batches for prompts a session skipped or answered unparseably.
+
+After a merge, every batch whose response file exists is checked for
+prompts that are still pending. Those are written to compact
+repair_XXXX.json batches (same format as batch files, plus a retry count
+and cap per prompt) whose responses land in
+responses/repair_XXXX_responses.jsonl and merge like any other file.
+
+repair_state.json in the batches dir tracks each outstanding prompt:
+
+    retries  repair batches issued for it so far
+    batch    the repair batch it is waiting on
+    reason   "missing" (no line returned) or "rejected" (line failed to parse)
+
+A batch counts as answered when its response file exists and answers its
+prompts: a response file whose IDs are all foreign to the batch belongs to
+an earlier batch under the same name (e.g. from before create-batches
+refused to overwrite answered batches) and does not count. File times are
+never used, so response files copied in from other machines behave the same.
+
+Entries for reset prompts whose generation is not the current one (see
+impact.py) hold superseded text and are not reissued.
+
+A prompt is reissued only once its current repair batch has been answered,
+and never more than max_retries times. Completed prompts are dropped.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from fsutil import atomic_write_json
+from jsonstream import iter_json_objects
+
+REPAIR_STATE_FILE = "repair_state.json"
+DEFAULT_MAX_RETRIES = 3
+
+
+def batch_files(batches_dir: Path) -> List[Path]:
+    """Regular then repair batch files."""
+    return sorted(batches_dir.glob("batch_[0-9]*.json")) + sorted(batches_dir.glob("repair_[0-9]*.json"))
+
+
+def load_batch(path: Path) -> Tuple[str, List[Dict]]:
+    """(output file relative to the batches dir, prompt entries)."""
+    with open(path) as f:
+        batch = json.load(f)
+    output = batch.get("output_file") or f"responses/{path.stem}_responses.jsonl"
+    return output, batch.get("prompts", [])
+
+
+def load_repair_state(batches_dir: Path) -> Dict:
+    path = batches_dir / REPAIR_STATE_FILE
+    if not path.exists():
+        return {"next_batch": 0, "prompts": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def is_answered(batches_dir: Path, path: Path, output: str) -> bool:
+    """Whether the batch at path has a response file that answers its prompts."""
+    response = batches_dir / output
+    if not response.exists():
+        return False
+    ids = {e["id"] for e in load_batch(path)[1]}
+    seen = False
+    with open(response, encoding="utf-8", errors="replace") as f:
+        # Small chunks: the first line nearly always decides
+        for obj in iter_json_objects(f, [], chunk_size=1 << 16):
+            if "id" in obj:
+                if obj["id"] in ids:
+                    return True
+                seen = True
+    # A file with no parseable IDs still answers the batch (its prompts are rejected)
+    return not seen
+
+
+def queued_ids(batches_dir: Path) -> Set[str]:
+    """IDs in batch and repair files that have not been answered yet."""
+    ids = set()
+    for path in batch_files(batches_dir):
+        output, entries = load_batch(path)
+        if not is_answered(batches_dir, path, output):
+            ids.update(e["id"] for e in entries)
+    return ids
+
+
+def plan_repairs(
+    batches_dir: Path,
+    pending: Set[str],
+    rejected: Dict[str, str],
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    resets: Optional[Dict[str, int]] = None,
+) -> Tuple[Dict, List[Dict], Dict[str, int]]:
+    """
+    Work out which prompts need another attempt.
+
+    Returns (updated state, prompt entries to reissue, counts). Only answered
+    batches (see is_answered) are inspected, so unprocessed or overwritten
+    batches are never treated as failures, and only entries with the
+    prompt's current reset generation (resets: id -> generation) count.
+    """
+    resets = resets or {}
+    state = load_repair_state(batches_dir)
+    tracked = state["prompts"]
+    answered = {}   # batch name -> whether it has been answered
+    inputs = {}     # id -> the batch entry to reissue
+
+    for path in batch_files(batches_dir):
+        output, entries = load_batch(path)
+        answered[path.name] = is_answered(batches_dir, path, output)
+        if answered[path.name]:
+            for entry in entries:
+                if entry["id"] in pending and entry.get("reset", 0) == resets.get(entry["id"], 0):
+                    inputs[entry["id"]] = entry
+
+    counts = {"missing": 0, "rejected": 0, "waiting": 0, "exhausted": 0, "resolved": 0}
+    for pid in [pid for pid in tracked if pid not in pending]:
+        del tracked[pid]
+        counts["resolved"] += 1
+
+    reissue = []
+    for pid, batch_entry in inputs.items():
+        entry = tracked.get(pid)
+        if entry is not None and not answered.get(entry["batch"], True):
+            counts["waiting"] += 1
+            continue
+        retries = entry["retries"] if entry else 0
+        if retries >= max_retries:
+            counts["exhausted"] += 1
+            continue
+        reason = "rejected" if pid in rejected else "missing"
+        counts[reason] += 1
+        reissue.append({"id": pid, "input": batch_entry["input"], "retry": retries + 1,
+                        "max_retries": max_retries, "reason": reason,
+                        **({"reset": batch_entry["reset"]} if "reset" in batch_entry else {})})
+    return state, reissue, counts
+
+
+def write_repair_batches(batches_dir: Path, state: Dict, reissue: List[Dict],
+                         batch_size: int = 25) -> List[Path]:
+    """Write reissued prompts as repair batches and save the state."""
+    paths = []
+    for start in range(0, len(reissue), batch_size):
+        num = state["next_batch"]
+        state["next_batch"] += 1
+        name = f"repair_{num:04d}"
+        path = batches_dir / f"{name}.json"
+        chunk = reissue[start:start + batch_size]
+        atomic_write_json(path, {
+            "batch_id": name,
+            "output_file": f"responses/{name}_responses.jsonl",
+            "prompts": [{k: e[k] for k in ("id", "input", "retry", "max_retries", "reset") if k in e}
+                        for e in chunk],
+        })
+        for e in chunk:
+            state["prompts"][e["id"]] = {"retries": e["retry"], "batch": path.name, "reason": e["reason"]}
+        paths.append(path)
+    atomic_write_json(batches_dir / REPAIR_STATE_FILE, state)
+    return paths
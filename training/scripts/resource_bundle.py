@@ -0,0 +1,331 @@
+"""
+Compiled binary bundle of the iOS interpretation resources.
+
+compile_bundle reads base-meanings.json, position-modifiers.json and
+combinations.json and writes one little-endian file:
+
+    header      magic "TRBN", version, section counts and offsets
+    strings     u32 offsets[n + 1] into a UTF-8 blob; every distinct string once
+    groups      u32 string id per card group ("major", "wands", ...)
+    cards       (u32 name, u8 group, 3 pad) per card, in resource order
+    positions   (u32 key, u32 name, u32 description) per position
+    base        u32 string id [card][orientation]
+    modifiers   u32 string id [card][orientation][position]
+    combos      (u32 card-list offset, u16 card count, u16 pad, u32 meaning)
+    combo_cards u16 card indices referenced by combos
+    card_combos u32 offsets[n_cards + 1] into u16 combo ids per card
+
+Missing entries are NO_STRING. Every table is fixed-width, so ResourceBundle
+answers a lookup with a couple of struct.unpack_from calls on an mmap and
+never parses the whole file; verify_bundle checks that the bundle decodes
+back to the source JSON.
+"""
+
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MAGIC = b"TRBN"
+VERSION = 1
+NO_STRING = 0xFFFFFFFF
+ORIENTATIONS = ("upright", "reversed")
+RESOURCE_FILES = ("base-meanings", "position-modifiers", "combinations")
+BUNDLE_FILE = "resources.bin"
+
+# magic, version, pad, n_strings, n_groups, n_cards, n_positions, n_combos,
+# then offsets: strings, string data, groups, cards, positions, base,
+# modifiers, combos, combo cards, card combos
+_HEADER = struct.Struct("<4sHH5I10I")
+_CARD = struct.Struct("<IB3x")
+_POSITION = struct.Struct("<3I")
+_COMBO = struct.Struct("<IHxxI")
+
+
+def load_resources(resources_dir: Path) -> Dict[str, Dict]:
+    resources = {}
+    for name in RESOURCE_FILES:
+        with open(resources_dir / f"{name}.json", encoding="utf-8") as f:
+            resources[name] = json.load(f)
+    return resources
+
+
+# MARK: - Compiler
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, s: Optional[str]) -> int:
+        if s is None:
+            return NO_STRING
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return sid
+
+    def encode(self) -> bytes:
+        blob = bytearray()
+        offsets = [0]
+        for s in self.strings:
+            blob += s.encode("utf-8")
+            offsets.append(len(blob))
+        return struct.pack(f"<{len(offsets)}I", *offsets), bytes(blob)
+
+
+def compile_bundle(resources_dir: Path, output_path: Path) -> Dict[str, int]:
+    """Compile the three resource JSONs into a bundle; returns section sizes."""
+    res = load_resources(resources_dir)
+    base = res["base-meanings"]
+    positions = res["position-modifiers"]["positions"]
+    modifiers = res["position-modifiers"]["modifiers"]
+    combinations = res["combinations"]["combinations"]
+
+    strings = _StringTable()
+    groups = list(base)
+    cards = [(name, gi) for gi, group in enumerate(groups) for name in base[group]]
+    cards += [(name, 0xFF) for name in modifiers if name not in {c for c, _ in cards}]
+    card_index = {name: i for i, (name, _) in enumerate(cards)}
+
+    position_keys = list(positions)
+    for mods in modifiers.values():
+        for orientation in ORIENTATIONS:
+            position_keys += [k for k in mods.get(orientation, {}) if k not in position_keys]
+    position_index = {k: i for i, k in enumerate(position_keys)}
+
+    for name, mods in modifiers.items():
+        extra = set(mods) - set(ORIENTATIONS)
+        if extra:
+            raise ValueError(f"{name}: unexpected modifier keys {sorted(extra)}")
+    for group in groups:
+        for name, meaning in base[group].items():
+            if set(meaning) != set(ORIENTATIONS):
+                raise ValueError(f"{name}: base meaning keys {sorted(meaning)}")
+
+    out = {}
+    out["groups"] = struct.pack(f"<{len(groups)}I", *(strings.intern(g) for g in groups))
+    out["cards"] = b"".join(_CARD.pack(strings.intern(name), gi) for name, gi in cards)
+    out["positions"] = b"".join(
+        _POSITION.pack(strings.intern(k),
+                       strings.intern(positions.get(k, {}).get("name")),
+                       strings.intern(positions.get(k, {}).get("description")))
+        for k in position_keys
+    )
+
+    base_ids = [NO_STRING] * (len(cards) * 2)
+    for group in groups:
+        for name, meaning in base[group].items():
+            for o, orientation in enumerate(ORIENTATIONS):
+                base_ids[card_index[name] * 2 + o] = strings.intern(meaning[orientation])
+    out["base"] = struct.pack(f"<{len(base_ids)}I", *base_ids)
+
+    n_pos = len(position_keys)
+    mod_ids = [NO_STRING] * (len(cards) * 2 * n_pos)
+    for name, mods in modifiers.items():
+        for o, orientation in enumerate(ORIENTATIONS):
+            for key, text in mods.get(orientation, {}).items():
+                mod_ids[(card_index[name] * 2 + o) * n_pos + position_index[key]] = strings.intern(text)
+    out["modifiers"] = struct.pack(f"<{len(mod_ids)}I", *mod_ids)
+
+    combo_cards: List[int] = []
+    combo_entries = []
+    per_card: List[List[int]] = [[] for _ in cards]
+    for ci, combo in enumerate(combinations):
+        members = [card_index[c] for c in combo["cards"]]
+        combo_entries.append(_COMBO.pack(len(combo_cards), len(members), strings.intern(combo["meaning"])))
+        combo_cards += members
+        for m in dict.fromkeys(members):
+            per_card[m].append(ci)
+    out["combos"] = b"".join(combo_entries)
+    out["combo_cards"] = struct.pack(f"<{len(combo_cards)}H", *combo_cards)
+
+    offsets, ids = [0], []
+    for lst in per_card:
+        ids += lst
+        offsets.append(len(ids))
+    out["card_combos"] = (struct.pack(f"<{len(offsets)}I", *offsets)
+                          + struct.pack(f"<{len(ids)}H", *ids))
+
+    out["strings"], out["string_data"] = strings.encode()
+
+    order = ["strings", "string_data", "groups", "cards", "positions", "base",
+             "modifiers", "combos", "combo_cards", "card_combos"]
+    section_offsets = {}
+    pos = _HEADER.size
+    for name in order:
+        pos += -pos % 4
+        section_offsets[name] = pos
+        pos += len(out[name])
+
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(strings.strings), len(groups), len(cards),
+                          n_pos, len(combinations), *(section_offsets[n] for n in order))
+    with open(output_path, "wb") as f:
+        f.write(header)
+        for name in order:
+            f.write(b"\0" * (section_offsets[name] - f.tell()))
+            f.write(out[name])
+
+    sizes = {name: len(out[name]) for name in order}
+    sizes["total"] = output_path.stat().st_size
+    return sizes
+
+
+# MARK: - Reader
+
+class ResourceBundle:
+    """Memory-mapped lookups into a compiled bundle (mirrors DataService)."""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "rb")
+        self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.n_strings, self.n_groups, self.n_cards, self.n_positions,
+         self.n_combos, *offsets) = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a resource bundle")
+        if version != VERSION:
+            raise ValueError(f"{path}: bundle version {version}, expected {VERSION}")
+        (self._strings, self._string_data, self._groups, self._cards, self._positions,
+         self._base, self._modifiers, self._combos, self._combo_cards, self._card_combos) = offsets
+
+        # Name -> index maps for the small tables (78 cards, 16 positions)
+        self.card_index = {self.card_name(i): i for i in range(self.n_cards)}
+        self.position_index = {self.position(i)["key"]: i for i in range(self.n_positions)}
+
+    def close(self):
+        self._buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _u32(self, offset: int) -> int:
+        return struct.unpack_from("<I", self._buf, offset)[0]
+
+    def string(self, sid: int) -> Optional[str]:
+        if sid == NO_STRING:
+            return None
+        start, end = struct.unpack_from("<2I", self._buf, self._strings + sid * 4)
+        return self._buf[self._string_data + start:self._string_data + end].decode("utf-8")
+
+    def card_name(self, i: int) -> str:
+        return self.string(_CARD.unpack_from(self._buf, self._cards + i * _CARD.size)[0])
+
+    def card_group(self, i: int) -> Optional[str]:
+        gi = _CARD.unpack_from(self._buf, self._cards + i * _CARD.size)[1]
+        return None if gi == 0xFF else self.string(self._u32(self._groups + gi * 4))
+
+    def position(self, i: int) -> Dict[str, Optional[str]]:
+        key, name, desc = _POSITION.unpack_from(self._buf, self._positions + i * _POSITION.size)
+        return {"key": self.string(key), "name": self.string(name), "description": self.string(desc)}
+
+    def base_meaning(self, card_name: str, is_reversed: bool) -> Optional[str]:
+        i = self.card_index.get(card_name)
+        if i is None:
+            return None
+        return self.string(self._u32(self._base + (i * 2 + is_reversed) * 4))
+
+    def position_modifier(self, card_name: str, position_id: str, is_reversed: bool) -> Optional[str]:
+        i = self.card_index.get(card_name)
+        p = self.position_index.get(position_id)
+        if i is None or p is None:
+            return None
+        return self.string(self._u32(self._modifiers + ((i * 2 + is_reversed) * self.n_positions + p) * 4))
+
+    def combination(self, ci: int) -> Dict:
+        start, count, meaning = _COMBO.unpack_from(self._buf, self._combos + ci * _COMBO.size)
+        members = struct.unpack_from(f"<{count}H", self._buf, self._combo_cards + start * 2)
+        return {"cards": [self.card_name(m) for m in members], "meaning": self.string(meaning)}
+
+    def combination_ids(self, card: int) -> List[int]:
+        start, end = struct.unpack_from("<2I", self._buf, self._card_combos + card * 4)
+        ids_at = self._card_combos + (self.n_cards + 1) * 4
+        return list(struct.unpack_from(f"<{end - start}H", self._buf, ids_at + start * 2))
+
+    def find_combinations(self, card_names: List[str]) -> List[Dict]:
+        """Combinations whose cards are all drawn, in resource order."""
+        drawn = {self.card_index[n] for n in card_names if n in self.card_index}
+        candidates = sorted({ci for card in drawn for ci in self.combination_ids(card)})
+        found = []
+        for ci in candidates:
+            combo = self.combination(ci)
+            if all(self.card_index[c] in drawn for c in combo["cards"]):
+                found.append(combo)
+        return found
+
+    def to_json(self) -> Dict[str, Dict]:
+        """Decode the whole bundle back into the three resource documents."""
+        base: Dict[str, Dict] = {self.string(self._u32(self._groups + g * 4)): {}
+                                 for g in range(self.n_groups)}
+        modifiers: Dict[str, Dict] = {}
+        positions = {}
+        keys = [self.position(p) for p in range(self.n_positions)]
+        for p in keys:
+            if p["name"] is not None:
+                positions[p["key"]] = {"name": p["name"], "description": p["description"]}
+
+        for i in range(self.n_cards):
+            name, group = self.card_name(i), self.card_group(i)
+            if group is not None:
+                base[group][name] = {o: self.base_meaning(name, r) for r, o in enumerate(ORIENTATIONS)}
+            mods = {}
+            for r, orientation in enumerate(ORIENTATIONS):
+                entries = {p["key"]: self.position_modifier(name, p["key"], bool(r)) for p in keys}
+                entries = {k: v for k, v in entries.items() if v is not None}
+                if entries:
+                    mods[orientation] = entries
+            if mods:
+                modifiers[name] = mods
+
+        return {
+            "base-meanings": base,
+            "position-modifiers": {"positions": positions, "modifiers": modifiers},
+            "combinations": {"combinations": [self.combination(c) for c in range(self.n_combos)]},
+        }
+
+
+def verify_bundle(bundle_path: Path, resources_dir: Path) -> List[str]:
+    """Round-trip check: the decoded bundle must equal the source JSON."""
+    expected = load_resources(resources_dir)
+    problems = []
+    with ResourceBundle(bundle_path) as bundle:
+        decoded = bundle.to_json()
+        for name in RESOURCE_FILES:
+            if decoded[name] != expected[name]:
+                problems.append(f"{name}.json: decoded content differs")
+
+        combos = expected["combinations"]["combinations"]
+        for card in bundle.card_index:
+            pair = [card, "The Fool"]
+            want = [c for c in combos if all(x in pair for x in c["cards"])]
+            if bundle.find_combinations(pair) != want:
+                problems.append(f"find_combinations({pair}) differs")
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile iOS resources into a binary bundle")
+    parser.add_argument("--resources", default="../../ios-precalc", help="Directory with the resource JSONs")
+    parser.add_argument("--output", default=None, help=f"Bundle path (default: RESOURCES/{BUNDLE_FILE})")
+    parser.add_argument("--verify", action="store_true", help="Only verify an existing bundle")
+    args = parser.parse_args()
+
+    resources_dir = Path(__file__).parent / args.resources
+    output = Path(args.output) if args.output else resources_dir / BUNDLE_FILE
+
+    if not args.verify:
+        source = sum((resources_dir / f"{n}.json").stat().st_size for n in RESOURCE_FILES)
+        sizes = compile_bundle(resources_dir, output)
+        print(f"Wrote {output}: {sizes['total']:,} bytes (JSON: {source:,} bytes)")
+        for name, size in sizes.items():
+            if name != "total":
+                print(f"  {name}: {size:,}")
+
+    problems = verify_bundle(output, resources_dir)
+    print("\n".join(problems) if problems else "Bundle round-trips to the source JSON")
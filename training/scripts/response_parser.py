@@ -3,84 +3,129 @@ Response parser for Claude outputs.
 Parses JSONL responses and merges into prompts dataset.
 """
 
-import json
+import io
 import re
+import time
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 
+import eventlog
+from jsonstream import iter_json_objects, CHUNK_SIZE
+from profiling import timed
 from prompt_generator import TrainingPrompt, load_prompts, save_prompts
+from repair import load_batch
+from summary import prompt_summary, format_progress
 
+# Parse errors quote the start of the rejected line, which is where the ID sits
+_ERROR_ID = re.compile(r'"id"\s*:\s*"([^"]+)"')
 
+
+@timed("parse_jsonl")
 def parse_jsonl(text: str) -> Tuple[List[Dict], List[str]]:
-    """Parse JSONL response text, handling code blocks and malformed lines."""
-    # Strip code block markers
-    text = re.sub(r'```(?:json|jsonl)?\n?', '', text)
-    text = re.sub(r'```', '', text)
-
-    responses, errors = [], []
-
-    for line in text.strip().split('\n'):
-        line = line.strip()
-        if not line or not line.startswith('{'):
-            continue
-        try:
-            obj = json.loads(line)
-            if 'id' in obj and 'response' in obj:
-                responses.append(obj)
-        except json.JSONDecodeError as e:
-            errors.append(f"Parse error: {line[:50]}... ({e})")
+    """Parse JSONL response text, handling code blocks and malformed lines.
 
+    Objects that span lines or share a line with another object are recovered.
+    """
+    errors = []
+    responses = [obj for obj in iter_json_objects(io.StringIO(text), errors)
+                 if 'id' in obj and 'response' in obj]
     return responses, errors
 
 
-def merge_responses(prompts_path: Path, response_dir: Path) -> Tuple[int, List[str]]:
-    """Merge response files into prompts dataset."""
+@timed("iter_jsonl")
+def iter_jsonl(
+    path: Path,
+    errors: Optional[List[str]] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[str, str]]:
+    """Stream (id, response) records from a response file in constant memory."""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for obj in iter_json_objects(f, errors, chunk_size):
+            if 'id' in obj and 'response' in obj:
+                yield obj['id'], obj['response']
+
+
+def response_files(response_dir: Path) -> List[Path]:
+    """Response files in a directory, in merge order."""
+    return sorted(response_dir.glob("*.jsonl")) + sorted(response_dir.glob("*.txt"))
+
+
+def _batch_generations(response_file: Path) -> Dict[str, int]:
+    """Reset generation of each entry in the batch a response file answers (0 if never reset)."""
+    batch = response_file.parent.parent / response_file.name.replace("_responses.jsonl", ".json")
+    if not batch.exists():
+        return {}
+    return {e["id"]: e.get("reset", 0) for e in load_batch(batch)[1]}
+
+
+def merge_responses(
+    prompts_path: Path,
+    response_dir: Path,
+    files: Optional[List[Path]] = None,
+    pending: Optional[Set[str]] = None,
+    rejected: Optional[Dict[str, str]] = None,
+    resets: Optional[Dict[str, int]] = None,
+    summary: Optional[Dict] = None
+) -> Tuple[int, List[str]]:
+    """
+    Merge response files (default: all in response_dir) into prompts dataset.
+
+    If given, pending receives the IDs still not completed after the merge and
+    rejected maps IDs recognisable in unparseable lines to their file name.
+    Responses for IDs in resets (id -> reset generation) are skipped unless
+    the entry in the file's batch carries the current generation; without
+    a batch file they are skipped. summary receives the prompt_summary of
+    the merged dataset.
+    """
     prompts = load_prompts(prompts_path)
     by_id = {p.id: p for p in prompts}
 
     all_errors = []
     merged = 0
 
-    for f in list(response_dir.glob("*.jsonl")) + list(response_dir.glob("*.txt")):
-        responses, errors = parse_jsonl(f.read_text())
-        all_errors.extend([f"{f.name}: {e}" for e in errors])
-
-        for r in responses:
-            if r['id'] in by_id:
-                by_id[r['id']].response = r['response']
-                by_id[r['id']].status = "completed"
-                merged += 1
+    for f in response_files(response_dir) if files is None else files:
+        errors = []
+        count = file_merged = unknown = stale = 0
+        start = time.perf_counter()
+        generations = None
+        for rid, response in iter_jsonl(f, errors):
+            count += 1
+            if resets and rid in resets and generations is None:
+                generations = _batch_generations(f)
+            if resets and rid in resets and generations.get(rid) != resets[rid]:
+                stale += 1
+            elif rid in by_id:
+                by_id[rid].response = response
+                by_id[rid].status = "completed"
+                file_merged += 1
             else:
-                all_errors.append(f"Unknown ID: {r['id']}")
+                unknown += 1
+                all_errors.append(f"Unknown ID: {rid}")
+                eventlog.emit("warning", stage="merge", file=f.name, message=f"Unknown ID: {rid}")
+        merged += file_merged
+        all_errors.extend([f"{f.name}: {e}" for e in errors])
+        for e in errors:
+            eventlog.emit("warning", stage="merge", file=f.name, message=e)
+            match = _ERROR_ID.search(e)
+            if rejected is not None and match:
+                rejected[match.group(1)] = f.name
+        eventlog.emit("file_ingested", file=f.name, bytes=f.stat().st_size, records=count,
+                      merged=file_merged, unknown_ids=unknown, stale=stale, parse_errors=len(errors),
+                      duration_s=round(time.perf_counter() - start, 3))
 
-        print(f"  {f.name}: {len(responses)} responses")
+        print(f"  {f.name}: {count} responses")
 
     save_prompts(prompts, prompts_path)
+    if pending is not None:
+        pending.update(p.id for p in prompts if p.status != "completed")
+    if summary is not None:
+        summary.update(prompt_summary(prompts))
     return merged, all_errors
 
 
 def get_progress_report(prompts_path: Path) -> str:
-    """Generate progress report."""
-    prompts = load_prompts(prompts_path)
-
-    completed = [p for p in prompts if p.status == "completed"]
-    pending = [p for p in prompts if p.status == "pending"]
-
-    lengths = [len(p.response) for p in completed if p.response]
-    avg_len = sum(lengths) / len(lengths) if lengths else 0
-
-    return f"""{'='*50}
-TRAINING DATA PROGRESS
-{'='*50}
-Total: {len(prompts)}
-Completed: {len(completed)} ({len(completed)/len(prompts)*100:.1f}%)
-Pending: {len(pending)}
-
-Response lengths:
-  Avg: {avg_len:.0f} chars
-  Min: {min(lengths) if lengths else 0}
-  Max: {max(lengths) if lengths else 0}
-{'='*50}"""
+    """Generate progress report by scanning the full prompts file."""
+    return format_progress(prompt_summary(load_prompts(prompts_path)))
 
 
 if __name__ == "__main__":
@@ -4,10 +4,22 @@ Main orchestration script for the Taro training data pipeline.
 
 Usage:
     python run.py generate-prompts      # Generate ~25k prompts
+    python run.py generate-prompts --resume  # Continue an interrupted run
     python run.py create-batches        # Create batch files for Claude Max
     python run.py merge-responses       # Merge responses from Claude
+    python run.py dedup                 # Mark near-duplicate responses
     python run.py convert-sft           # Convert to SFT format
     python run.py status                # Show progress
+    python run.py status --watch        # Live throughput and ETA
+    python run.py all                   # Run every stage whose inputs changed
+    python run.py bench                 # Benchmark hot paths against the baseline
+    python run.py events                # Summarize recent runs from the event log
+    python run.py show <id>             # Look up one prompt across all data files
+    python run.py impact                # Prompts affected by uncommitted resource edits
+    python run.py coverage              # Under-represented cards, pairs and questions
+    python run.py precache generate     # Enumerate Daily Draw readings for the cache
+    python run.py <stage> --shard 0/4   # Run a stage on one of 4 ID-hash shards
+    python run.py gather                # Merge shard outputs into data/
     python run.py test                  # Run quick test
 
 FIXME: Minor arcana meanings in TaroApp/Resources/base-meanings.json show
@@ -18,34 +30,155 @@ TODO: Consider adding RLAIF stage 2 pipeline (Constitutional AI style) once
 
 import argparse
 import sys
+import time
 from pathlib import Path
 
+import eventlog
+
 # Add scripts dir to path
 SCRIPT_DIR = Path(__file__).parent
 DATA_DIR = SCRIPT_DIR.parent / "data"
+CHECKPOINT_FILE = "generate_checkpoint.json"
+# Copy of the resources the current prompts were rendered from, for `all`
+RESOURCE_SNAPSHOT_DIR = "pipeline_resources"
+# Stages that split an existing prompts.json when their shard has none yet
+PARTITIONED_COMMANDS = ("create-batches", "merge-responses", "convert-sft")
+
+
+def batch_counts():
+    """Count batch and response files for the summary index."""
+    batches_dir = DATA_DIR / "batches"
+    responses_dir = batches_dir / "responses"
+    return {
+        "batch_files": len(list(batches_dir.glob("batch_[0-9]*.json"))) if batches_dir.exists() else 0,
+        "response_files": len(list(responses_dir.glob("*.jsonl"))) if responses_dir.exists() else 0,
+    }
+
+
+def parse_shard(value):
+    """argparse type for --shard i/N."""
+    try:
+        index, num_shards = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 0/4, got {value!r}")
+    if not 0 <= index < num_shards:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {value!r}")
+    return index, num_shards
+
+
+def enter_shard(args):
+    """Point DATA_DIR at the shard's directory, splitting prompts.json into it if needed."""
+    global DATA_DIR
+    from sharding import partition_prompts, shard_dir
+    from summary import prompt_summary, update_summary
+
+    directory = shard_dir(DATA_DIR, args.shard)
+    source = DATA_DIR / "prompts.json"
+    if (args.command in PARTITIONED_COMMANDS and not (directory / "prompts.json").exists()
+            and source.exists()):
+        prompts = partition_prompts(source, directory, args.shard)
+        update_summary(directory, prompts=prompt_summary(prompts))
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: split {len(prompts)} prompts from {source}")
+    directory.mkdir(parents=True, exist_ok=True)
+    print(f"Working in shard {args.shard[0]}/{args.shard[1]}: {directory}\n")
+    DATA_DIR = directory
 
 
 def cmd_generate_prompts(args):
     """Generate training prompts using iOS prompt format."""
-    from prompt_generator import generate_dataset, save_prompts, get_dataset_stats
+    from collections import Counter
+    from prompt_generator import (
+        clear_generation_checkpoint, expand_variants, generate_dataset, get_dataset_stats,
+        load_prompts, save_prompts,
+    )
+    from summary import prompt_summary, update_summary
+
+    if args.shard and (args.append or args.id_filter):
+        print("Error: --append and --id-filter cannot be combined with --shard")
+        sys.exit(1)
 
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     output_path = DATA_DIR / "prompts.json"
+    existing = load_prompts(output_path) if args.append and output_path.exists() else []
+
+    # Skip IDs generated by earlier runs: exactly via prompts.json when
+    # appending, and across every run via the persistent filter
+    exclude = {p.id for p in existing}
+    known = Counter(p.spread_name for p in existing)
+    id_filter = None
+    if args.id_filter:
+        from idfilter import IdFilter
+        filter_path = Path(args.id_filter)
+        if filter_path.exists():
+            id_filter = IdFilter.load(filter_path)
+        else:
+            id_filter = IdFilter(args.fp_rate)
+        if output_path.exists():
+            from prompt_generator import iter_prompts
+            id_filter.update_spreads((p.id, p.spread_name) for p in iter_prompts(output_path))
+        print(f"ID filter: {len(id_filter)} known IDs ({id_filter.size_bytes:,} bytes)")
+        exclude = id_filter
+        known = id_filter.spreads
+
+    variants = None
+    if args.styles or args.moon_phases:
+        try:
+            variants = expand_variants(args.styles or ["balanced"], args.moon_phases)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    keep, positions = None, None
+    if args.shard:
+        from sharding import shard_of, write_manifest
+        index, num_shards = args.shard
+        keep = lambda pid: shard_of(pid, num_shards) == index
+        positions = []
+
+    checkpoint = DATA_DIR / CHECKPOINT_FILE
+    if args.resume and not checkpoint.exists():
+        print("No checkpoint found, starting from the beginning")
 
-    print(f"Generating {args.count} prompts (seed={args.seed})...")
-    prompts = generate_dataset(args.count, args.seed)
-    save_prompts(prompts, output_path)
+    print(f"Generating {args.count} prompts (seed={args.seed}, layout={args.layout})...")
+    with eventlog.stage("prompts", count=args.count, seed=args.seed, layout=args.layout,
+                        variants=len(variants) if variants else None, resume=args.resume,
+                        shard=args.shard) as ev:
+        try:
+            prompts = generate_dataset(args.count, args.seed, layout=args.layout, exclude=exclude,
+                                       variants=variants, checkpoint=checkpoint, resume=args.resume,
+                                       checkpoint_every=args.checkpoint_every, keep=keep,
+                                       positions=positions,
+                                       # Filter counts are of prompts, not draws, with variants
+                                       known=known if variants is None else None)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        save_prompts(existing + prompts, output_path)
+        update_summary(DATA_DIR, prompts=prompt_summary(existing + prompts))
+        if args.shard:
+            origin = {"count": args.count, "seed": args.seed, "layout": args.layout,
+                      "styles": args.styles, "moon_phases": args.moon_phases}
+            write_manifest(DATA_DIR, args.shard, origin,
+                           args.count * (len(variants) if variants else 1), positions)
+        clear_generation_checkpoint(checkpoint)
+        if id_filter is not None:
+            id_filter.update_spreads((p.id, p.spread_name) for p in prompts)
+            id_filter.save(filter_path)
+        ev.update(prompts=len(prompts), appended_to=len(existing))
 
     stats = get_dataset_stats(prompts)
     print(f"\n✓ Generated {stats['total']} prompts (iOS format)")
     print(f"  With questions: {stats['with_question']}")
     print(f"  Spreads: {', '.join(f'{k}: {v}' for k, v in stats['by_spread'].items())}")
+    if existing:
+        print(f"  Appended to {len(existing)} existing prompts ({len(existing) + len(prompts)} total)")
     print(f"  Saved to: {output_path}")
 
 
 def cmd_create_batches(args):
     """Create batch files for Claude Max."""
     from batch_generator import generate_all_batches
+    from summary import update_summary
 
     prompts_path = DATA_DIR / "prompts.json"
     batches_dir = DATA_DIR / "batches"
@@ -54,13 +187,22 @@ def cmd_create_batches(args):
         print("Error: prompts.json not found. Run 'generate-prompts' first.")
         sys.exit(1)
 
-    generate_all_batches(
-        prompts_path,
-        batches_dir,
-        batch_size=args.batch_size,
-        start_batch=args.start,
-        max_batches=args.max_batches
-    )
+    try:
+        with eventlog.stage("batches", batch_size=args.batch_size, order=args.order) as ev:
+            batch_files = generate_all_batches(
+                prompts_path,
+                batches_dir,
+                batch_size=args.batch_size,
+                start_batch=args.start,
+                max_batches=args.max_batches,
+                order=args.order,
+                skip=getattr(args, "skip", None)
+            )
+            ev["batch_files"] = len(batch_files)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    update_summary(DATA_DIR, batches=batch_counts())
 
     print(f"\n✓ Batch files created in: {batches_dir}")
     print("\nNext steps:")
@@ -72,7 +214,9 @@ def cmd_create_batches(args):
 
 def cmd_merge_responses(args):
     """Merge Claude responses into prompts."""
-    from response_parser import merge_responses, get_progress_report
+    from impact import load_resets
+    from response_parser import merge_responses
+    from summary import update_summary, format_progress
 
     prompts_path = DATA_DIR / "prompts.json"
     responses_dir = DATA_DIR / "batches" / "responses"
@@ -86,18 +230,70 @@ def cmd_merge_responses(args):
         print("Process some batches first to generate response files.")
         sys.exit(1)
 
-    merged, errors = merge_responses(prompts_path, responses_dir)
+    files = [responses_dir / name for name in args.files] if args.files is not None else None
+    pending, rejected, summary = set(), {}, {}
+    resets = load_resets(DATA_DIR)
+    with eventlog.stage("merge") as ev:
+        merged, errors = merge_responses(prompts_path, responses_dir, files, pending, rejected, resets,
+                                         summary)
+        ev.update(merged=merged, warnings=len(errors))
+    update_summary(DATA_DIR, prompts=summary, batches=batch_counts())
+
+    if args.repair:
+        from repair import plan_repairs, write_repair_batches
+        state, reissue, counts = plan_repairs(DATA_DIR / "batches", pending, rejected, args.max_retries,
+                                              resets)
+        repair_files = write_repair_batches(DATA_DIR / "batches", state, reissue, args.repair_batch_size)
+        eventlog.emit("repair_batches", files=len(repair_files), **counts)
 
     print(f"\n✓ Merged {merged} responses")
     if errors:
         print(f"  Warnings: {len(errors)}")
+        for e in errors[:5]:
+            print(f"    {e}")
+        if len(errors) > 5:
+            print("    ... (all warnings: python run.py events --warnings)")
+    if args.repair:
+        print(f"  Repair: {counts['missing']} missing and {counts['rejected']} rejected prompts "
+              f"in {len(repair_files)} repair batches; {counts['waiting']} awaiting an earlier repair, "
+              f"{counts['exhausted']} over the retry cap, {counts['resolved']} resolved")
+
+    print("\n" + format_progress(summary))
+
+
+def cmd_dedup(args):
+    """Find near-duplicate responses with MinHash/LSH."""
+    from dedup import dedup_responses, DUPLICATES_FILE
+
+    prompts_path = DATA_DIR / "prompts.json"
+    output_path = DATA_DIR / DUPLICATES_FILE
+
+    if not prompts_path.exists():
+        print("Error: prompts.json not found.")
+        sys.exit(1)
 
-    print("\n" + get_progress_report(prompts_path))
+    with eventlog.stage("dedup", threshold=args.threshold) as ev:
+        result = dedup_responses(
+            prompts_path,
+            output_path,
+            threshold=args.threshold,
+            num_perm=args.num_perm,
+            bands=args.bands,
+            shingle_size=args.shingle_size,
+            workers=args.workers
+        )
+        ev.update(responses=result["total_responses"], duplicates=len(result["duplicates"]))
+
+    print(f"\n✓ {len(result['duplicates'])} of {result['total_responses']} responses marked as duplicates")
+    print(f"  Saved to: {output_path}")
+    print("  Exclude them with: python run.py convert-sft --exclude-duplicates")
 
 
 def cmd_convert_sft(args):
     """Convert to SFT training format."""
-    from convert_to_sft import convert_to_sft
+    from convert_to_sft import convert_to_sft, convert_to_sft_streaming, pack_sft, format_savings
+    from dedup import load_duplicate_ids, DUPLICATES_FILE
+    from summary import update_summary
 
     prompts_path = DATA_DIR / "prompts.json"
     sft_dir = DATA_DIR / "sft"
@@ -106,13 +302,63 @@ def cmd_convert_sft(args):
         print("Error: prompts.json not found.")
         sys.exit(1)
 
-    counts = convert_to_sft(
-        prompts_path,
-        sft_dir,
-        train_ratio=args.train_ratio,
-        valid_ratio=args.valid_ratio,
-        seed=args.seed
-    )
+    exclude_ids = None
+    if args.exclude_duplicates:
+        duplicates_path = DATA_DIR / DUPLICATES_FILE
+        if not duplicates_path.exists():
+            print(f"Error: {DUPLICATES_FILE} not found. Run 'dedup' first.")
+            sys.exit(1)
+        exclude_ids = load_duplicate_ids(duplicates_path)
+
+    with eventlog.stage("sft", format=args.format, streaming=args.streaming) as ev:
+        if args.streaming:
+            counts = convert_to_sft_streaming(
+                prompts_path,
+                sft_dir,
+                train_ratio=args.train_ratio,
+                valid_ratio=args.valid_ratio,
+                exclude_ids=exclude_ids,
+                fmt=args.format
+            )
+        else:
+            counts = convert_to_sft(
+                prompts_path,
+                sft_dir,
+                train_ratio=args.train_ratio,
+                valid_ratio=args.valid_ratio,
+                seed=args.seed,
+                exclude_ids=exclude_ids,
+                fmt=args.format
+            )
+        ev.update(counts)
+    update_summary(DATA_DIR, sft={"total_examples": sum(counts.values()), "splits": counts})
+
+    if args.format == "canonical":
+        count_tokens = None
+        if args.tokenize:
+            from pretokenize import load_tokenizer
+            tokenizer = load_tokenizer(args.tokenize)
+            count_tokens = lambda text: len(tokenizer.encode(text))
+        report = format_savings(prompts_path, count_tokens)
+        print("\nToken savings vs phi format (avg per example):")
+        for spread, r in report.items():
+            print(f"  {spread}: {r['phi_tokens']:.0f} -> {r['canonical_tokens']:.0f} "
+                  f"(-{r['saved_per_example']:.0f}, {r['saved_pct']:.1f}%)")
+
+    if args.pack:
+        print(f"\nPacking into sequences of up to {args.pack} tokens...")
+        pack_sft(sft_dir, max_tokens=args.pack)
+
+    if args.shards:
+        from shards import write_shards
+        print(f"\nWriting {args.shards} shards per split...")
+        write_shards(sft_dir, args.shards)
+
+    if args.tokenize:
+        from pretokenize import export_tokenized, load_tokenizer
+        tokenizer = load_tokenizer(args.tokenize)
+        print(f"\nExporting pre-tokenized arrays ({tokenizer.name})...")
+        export_tokenized(sft_dir, sft_dir / "tokenized", tokenizer)
 
     print(f"\n✓ SFT data created in: {sft_dir}")
     print(f"  Train: {counts['train']}, Valid: {counts['valid']}, Test: {counts['test']}")
@@ -123,40 +369,493 @@ def cmd_convert_sft(args):
 
 
 def cmd_status(args):
-    """Show pipeline status."""
-    from response_parser import get_progress_report
-    from prompt_generator import load_prompts, get_dataset_stats
+    """Show pipeline status from the summary index."""
+    from summary import load_summary, update_summary, prompt_summary, format_progress
 
     prompts_path = DATA_DIR / "prompts.json"
 
-    if not prompts_path.exists():
-        print("No prompts.json found. Run 'generate-prompts' first.")
+    if args.watch:
+        from monitor import watch
+        if not prompts_path.exists():
+            print("No prompts.json found. Run 'generate-prompts' first.")
+            return
+        watch(prompts_path, DATA_DIR / "batches" / "responses",
+              interval=args.interval, jsonl=args.jsonl, ticks=args.ticks)
         return
 
-    print(get_progress_report(prompts_path))
+    summary = load_summary(DATA_DIR)
+
+    if args.full or "prompts" not in summary:
+        # Rebuild the index from the data files themselves
+        if not prompts_path.exists():
+            print("No prompts.json found. Run 'generate-prompts' first.")
+            return
+        import json
+        from prompt_generator import load_prompts
+
+        sections = {
+            "prompts": prompt_summary(load_prompts(prompts_path)),
+            "batches": batch_counts(),
+        }
+        metadata_path = DATA_DIR / "sft" / "metadata.json"
+        if metadata_path.exists() and (DATA_DIR / "sft" / "train.jsonl").exists():
+            with open(metadata_path) as f:
+                meta = json.load(f)
+            sections["sft"] = {"total_examples": meta["total_examples"], "splits": meta["splits"]}
+        summary = update_summary(DATA_DIR, **sections)
+
+    print(format_progress(summary["prompts"]))
+
+    batches = summary.get("batches")
+    if batches and batches["batch_files"]:
+        print(f"\nBatch files: {batches['batch_files']}")
+        print(f"Response files: {batches['response_files']} (as of {batches['updated_at']})")
+        pct = batches["response_files"] / batches["batch_files"] * 100
+        print(f"Progress: {pct:.1f}%")
+
+    sft = summary.get("sft")
+    if sft:
+        print(f"\nSFT data ready: {sft['total_examples']} examples")
 
-    # Check for batches
+
+def cmd_all(args):
+    """Run every stage whose inputs changed since the last run."""
+    import hashlib
+    import shutil
+    import prompt_generator
+    from batch_generator import next_batch_number
+    from impact import record_resets, refresh_batches
+    from profiling import stage
+    from pipeline import PipelineState, fingerprint, changed_files, content_only
+    from repair import queued_ids
+    from response_parser import response_files
+
+    state = PipelineState(DATA_DIR)
+    prompts_path = DATA_DIR / "prompts.json"
+    responses_dir = DATA_DIR / "batches" / "responses"
+    forced = set(args.force or [])
+
+    def should_run(stage, fp, output=None):
+        if stage in forced:
+            reason = "forced"
+        elif output is not None and not output.exists():
+            reason = "output missing"
+        elif not state.is_fresh(stage, fp):
+            reason = "inputs changed"
+        else:
+            print(f"✓ {stage}: up to date")
+            eventlog.emit("stage_skipped", stage=stage)
+            return False
+        print(f"→ {stage}: {reason}{' (dry run)' if args.dry_run else ''}")
+        return not args.dry_run
+
+    # 1. Prompts depend on the iOS resources, the generator code and params
+    resources = [prompt_generator.IOS_RESOURCES / f"{name}.json"
+                 for name in ("base-meanings", "position-modifiers", "combinations")]
+    sources = resources + [SCRIPT_DIR / "prompt_generator.py"]
+    source_digests = state.file_digests(sources, "prompts")
+    prompt_params = {"count": args.count, "seed": args.seed}
+    if args.layout != "standard":
+        # Only non-default layouts enter the fingerprint so existing state stays fresh
+        prompt_params["layout"] = args.layout
+    prompts_fp = fingerprint(content_only(source_digests), prompt_params)
+    snapshot_dir = DATA_DIR / RESOURCE_SNAPSHOT_DIR
+    if should_run("prompts", prompts_fp, prompts_path):
+        previous = state.get("prompts")
+        generator = source_digests["prompt_generator.py"]["sha256"]
+        if (prompts_path.exists() and snapshot_dir.exists() and "prompts" not in forced
+                and previous.get("params") == prompt_params
+                and previous.get("files", {}).get("prompt_generator.py", {}).get("sha256") == generator):
+            # Only resource files changed: re-render just the prompts that use an edited key
+            print("  Resetting prompts affected by the resource edits")
+            with stage("prompts"):
+                cmd_impact(argparse.Namespace(old=str(snapshot_dir), new=None, list=False, reset=True))
+        else:
+            old_texts = {}
+            if prompts_path.exists():
+                old_texts = {p.id: hashlib.md5(p.input_text.encode()).digest()
+                             for p in prompt_generator.iter_prompts(prompts_path)}
+            with stage("prompts"):
+                cmd_generate_prompts(argparse.Namespace(count=args.count, seed=args.seed, layout=args.layout,
+                                                        append=False, id_filter=None, fp_rate=None,
+                                                        styles=None, moon_phases=None, resume=False,
+                                                        checkpoint_every=10000, shard=None))
+            # Regenerated IDs are seed-deterministic; keep old responses off changed text
+            changed = {p.id: p.input_text for p in prompt_generator.iter_prompts(prompts_path)
+                       if p.id in old_texts and old_texts[p.id] != hashlib.md5(p.input_text.encode()).digest()}
+            if changed:
+                refresh_batches(DATA_DIR / "batches", changed, record_resets(DATA_DIR, changed))
+                print(f"  {len(changed)} regenerated prompts changed text; their earlier responses are stale")
+        state.record("prompts", prompts_fp, files=source_digests, params=prompt_params)
+    if state.is_fresh("prompts", prompts_fp) and not args.dry_run:
+        snapshot_dir.mkdir(exist_ok=True)
+        for path in resources:
+            shutil.copy2(path, snapshot_dir / path.name)
+
+    # 2. Batches depend on the generated prompts and batch size
+    batches_fp = fingerprint(prompts_fp, {"batch_size": args.batch_size})
     batches_dir = DATA_DIR / "batches"
-    if batches_dir.exists():
-        batch_files = list(batches_dir.glob("batch_*.json"))
-        print(f"\nBatch files: {len(batch_files)}")
+    if should_run("batches", batches_fp, batches_dir / "batch_index.json"):
+        # Number after the existing batches so answered ones are kept, and leave
+        # out prompts still waiting in an unanswered batch
+        with stage("batches"):
+            cmd_create_batches(argparse.Namespace(batch_size=args.batch_size, start=next_batch_number(batches_dir),
+                                                  max_batches=None, order="shuffled",
+                                                  skip=queued_ids(batches_dir) if batches_dir.exists() else None))
+        state.record("batches", batches_fp)
+
+    # 3. Merge depends on the prompts and every response file; when the prompts
+    #    are unchanged only new or modified response files are merged
+    if responses_dir.exists():
+        digests = state.file_digests(response_files(responses_dir), "merge")
+        merge_fp = fingerprint(prompts_fp, content_only(digests))
+        if should_run("merge", merge_fp):
+            previous = state.get("merge")
+            files = None
+            if previous.get("prompts_fingerprint") == prompts_fp and "merge" not in forced:
+                files = changed_files(digests, previous.get("files"))
+                print(f"  Merging {len(files)} new or changed response files")
+            with stage("merge"):
+                cmd_merge_responses(argparse.Namespace(files=files, repair=False))
+            state.record("merge", merge_fp, prompts_fingerprint=prompts_fp, files=digests)
+    else:
+        print("- merge: no responses yet")
+
+    # 4. Duplicates and SFT depend on the merged prompts and their params
+    from summary import load_summary
+    completed = load_summary(DATA_DIR).get("prompts", {}).get("by_status", {}).get("completed", 0)
+    if not completed:
+        print("- sft: no completed responses yet")
+    else:
+        from dedup import DUPLICATES_FILE
+        sft_inputs = [prompts_path]
+        if args.exclude_duplicates:
+            dedup_params = {"threshold": 0.8, "num_perm": 128, "bands": 16, "shingle_size": 5}
+            dedup_digest = state.file_digests([prompts_path], "dedup")
+            dedup_fp = fingerprint(content_only(dedup_digest), dedup_params)
+            if should_run("dedup", dedup_fp, DATA_DIR / DUPLICATES_FILE):
+                with stage("dedup"):
+                    cmd_dedup(argparse.Namespace(**dedup_params, workers=None))
+                state.record("dedup", dedup_fp, files=dedup_digest)
+            sft_inputs.append(DATA_DIR / DUPLICATES_FILE)
+
+        sft_params = {
+            "train_ratio": args.train_ratio, "valid_ratio": args.valid_ratio, "seed": args.seed,
+            "format": args.format, "streaming": args.streaming,
+            "exclude_duplicates": args.exclude_duplicates,
+        }
+        # duplicates.json is an input too when it decides which examples are kept
+        prompts_digest = state.file_digests([p for p in sft_inputs if p.exists()], "sft")
+        sft_fp = fingerprint(content_only(prompts_digest), sft_params)
+        if should_run("sft", sft_fp, DATA_DIR / "sft" / "train.jsonl"):
+            with stage("sft"):
+                cmd_convert_sft(argparse.Namespace(
+                    **sft_params, pack=None, shards=None, tokenize=None
+                ))
+            state.record("sft", sft_fp, files=prompts_digest)
+
+
+def cmd_gather(args):
+    """Merge --shard outputs into the files a single-node run would produce."""
+    from sharding import find_num_shards, gather
+    from summary import prompt_summary, update_summary
+
+    try:
+        num_shards = args.shards or find_num_shards(DATA_DIR)
+        with eventlog.stage("gather", shards=num_shards) as ev:
+            result = gather(DATA_DIR, num_shards, force=args.force)
+            ev.update(prompts=len(result["prompts"]), sft=result["sft"])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    update_summary(DATA_DIR, prompts=prompt_summary(result["prompts"]))
+
+    print(f"\n✓ Gathered {len(result['prompts'])} prompts from {num_shards} shards into {DATA_DIR / 'prompts.json'}")
+    if result["sft"] is not None:
+        counts = result["sft"]
+        update_summary(DATA_DIR, sft={"total_examples": sum(counts.values()), "splits": counts})
+        print(f"  SFT: Train: {counts['train']}, Valid: {counts['valid']}, Test: {counts['test']}")
+    else:
+        print("  No shard SFT output; run convert-sft to build it from the gathered prompts")
+
+
+def cmd_precache(args):
+    """Enumerate a small draw space, merge its responses and bundle them for the app."""
+    import precache
+    from batch_generator import generate_all_batches
+    from prompt_generator import save_prompts
+    from response_parser import merge_responses
+    from summary import format_progress
+
+    spread_id = precache.SPACES[args.space]
+    cache_dir = DATA_DIR / precache.PRECACHE_DIR / args.space
+    prompts_path = cache_dir / "prompts.json"
+    batches_dir = cache_dir / "batches"
+    bundle_path = cache_dir / precache.BUNDLE_FILE
+
+    if args.action == "generate":
+        style, layout = args.style or "balanced", args.layout or "standard"
+        previous = precache.load_space(cache_dir) if (cache_dir / precache.SPACE_FILE).exists() else None
+        if previous and (previous["style"], previous["layout"]) == (style, layout) and prompts_path.exists():
+            print(f"{args.space} prompts for --style {style} --layout {layout} already exist in {cache_dir}; "
+                  f"process their batches, then run 'precache merge'")
+            return
+        if previous and batches_dir.exists():
+            # Another style's batches and responses are kept, out of the way of the new ones
+            kept = cache_dir / f"batches-{previous['style']}-{previous['layout']}"
+            if kept.exists():
+                print(f"Error: {kept} already exists; move it away before switching style or layout")
+                sys.exit(1)
+            batches_dir.rename(kept)
+            print(f"Moved the {previous['style']}/{previous['layout']} batches and responses to {kept}")
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with eventlog.stage("precache", space=args.space, style=style, layout=layout) as ev:
+            prompts = precache.generate_space_prompts(spread_id, style, layout)
+            save_prompts(prompts, prompts_path)
+            precache.write_space(cache_dir, spread_id, style, layout)
+            batch_files = generate_all_batches(prompts_path, batches_dir, batch_size=args.batch_size)
+            ev.update(prompts=len(prompts), batch_files=len(batch_files))
+        print(f"\n✓ {len(prompts)} {args.space} prompts in {len(batch_files)} batches: {batches_dir}")
+        print("Process them like the main batches, then run 'precache merge'")
+        return
+
+    if not prompts_path.exists():
+        print(f"Error: {prompts_path} not found. Run 'precache generate' first.")
+        sys.exit(1)
+
+    if args.action == "merge":
+        with eventlog.stage("precache_merge", space=args.space) as ev:
+            summary = {}
+            merged, errors = merge_responses(prompts_path, batches_dir / "responses", summary=summary)
+            ev.update(merged=merged, warnings=len(errors))
+        print(f"\n✓ Merged {merged} responses" + (f" ({len(errors)} warnings)" if errors else ""))
+        print("\n" + format_progress(summary))
+    elif args.action == "bundle":
+        try:
+            space = precache.load_space(cache_dir)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        for key in ("style", "layout"):
+            if getattr(args, key) not in (None, space[key]):
+                print(f"Error: {args.space} prompts were generated with --{key} {space[key]}, "
+                      f"not {getattr(args, key)}; run 'precache generate' again to change it")
+                sys.exit(1)
+        stats = precache.write_bundle(prompts_path, bundle_path, spread_id)
+        problems = precache.verify_bundle(bundle_path, prompts_path)
+        print(f"✓ {bundle_path}: {stats['filled']}/{stats['slots']} readings, "
+              f"{stats['bundle_bytes']:,} bytes ({stats['response_bytes']:,} bytes uncompressed)")
+        if problems:
+            print("\n".join(problems))
+            sys.exit(1)
+
+
+def cmd_impact(args):
+    """List or reset the prompts affected by a change to the iOS resources."""
+    from collections import Counter
+    from impact import diff_resources, find_affected, load_resources, reset_prompts
+    from prompt_generator import IOS_RESOURCES, load_prompts, save_prompts
+    from summary import prompt_summary, update_summary
 
-        # Check for responses in batches/responses/
+    prompts_path = DATA_DIR / "prompts.json"
+    if not prompts_path.exists():
+        print("Error: prompts.json not found.")
+        sys.exit(1)
+    if args.reset and args.new:
+        print("Error: --reset re-renders prompts with the current resources; omit --new")
+        sys.exit(1)
+
+    try:
+        old = load_resources(args.old)
+        new = load_resources(args.new or str(IOS_RESOURCES))
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    diff = diff_resources(old, new)
+    print(f"Changed keys: {len(diff.base)} base meanings, {len(diff.modifier)} position modifiers, "
+          f"{len(diff.combo_cards)} cards in changed combinations"
+          f"{', combinations reordered' if diff.combo_order else ''}")
+    if not diff:
+        print("No changes that affect prompt text")
+        return
+
+    affected = list(find_affected(DATA_DIR, diff))
+    by_status = Counter(draw.status for draw, _ in affected)
+    by_kind = Counter(key.split(":", 1)[0] for _, keys in affected for key in keys)
+    print(f"Affected prompts: {len(affected)} "
+          f"({', '.join(f'{n} {status}' for status, n in sorted(by_status.items())) or 'none'})")
+    for kind, n in sorted(by_kind.items()):
+        print(f"  {kind}: {n} prompt keys")
+
+    if args.list:
+        for draw, keys in affected:
+            print(f"{draw.id}\t{draw.status}\t{', '.join(keys)}")
+
+    if args.reset and affected:
+        with eventlog.stage("impact_reset", affected=len(affected)) as ev:
+            prompts = load_prompts(prompts_path)
+            draws = {draw.id: draw for draw, _ in affected}
+            ev.update(reset_prompts([p for p in prompts if p.id in draws], draws, DATA_DIR))
+            save_prompts(prompts, prompts_path)
+            update_summary(DATA_DIR, prompts=prompt_summary(prompts))
+        print(f"\n✓ Re-rendered {ev['reset']} prompts and returned them to pending")
+        if ev["batches_rewritten"]:
+            print(f"  Updated their text in {ev['batches_rewritten']} unanswered batch files")
+        print("  Next: create-batches, process them, merge-responses, then convert-sft "
+              "(without --streaming, so old examples are dropped)")
+
+
+def cmd_coverage(args):
+    """Count draws per card/position/orientation cell, card pair, combination and question."""
+    import draw_coverage as coverage
+    import profiling
+
+    if not (DATA_DIR / "prompts.json").exists():
+        print("Error: prompts.json not found.")
+        sys.exit(1)
+    try:
+        with profiling.span("coverage_load"):
+            arrays = coverage.load_arrays(DATA_DIR, None if args.status == "all" else args.status)
+    except ImportError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    with profiling.span("coverage_bincount"):
+        matrices = coverage.coverage_matrices(arrays)
+
+    if args.format == "csv":
+        output_dir = Path(args.output) if args.output else DATA_DIR / "coverage"
+        for path in coverage.write_csv(matrices, output_dir):
+            print(f"Wrote {path}")
+    elif args.heatmap:
+        print(coverage.heatmaps(matrices)[args.heatmap])
+    else:
+        print(coverage.summarize(matrices, args.top))
+
+
+def cmd_bench(args):
+    """Run the hot-path benchmark suite and compare against the saved baseline."""
+    import bench
+
+    baseline_path = Path(args.baseline) if args.baseline else DATA_DIR.parent / bench.BASELINE_FILE
+    sizes = (1000,) if args.quick else bench.GENERATE_SIZES
+    print("Running benchmarks...")
+    results = bench.run_suite(sizes, args.only or bench.SUITE_GROUPS)
+
+    baseline = bench.load_baseline(baseline_path)
+    rows = bench.compare(results, baseline["results"] if baseline else {}, args.threshold)
+    print()
+    print(bench.format_comparison(rows, args.threshold))
+    if "variants/sections_render" in results:
+        print(f"Variant rendering speedup over build_prompt per variant: "
+              f"{results['variants/sections_render']['speedup']}x")
+
+    if args.save_baseline:
+        bench.save_baseline(baseline_path, results)
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline is None:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+    elif any(r["regressed"] for r in rows):
+        sys.exit(1)
+
+
+def cmd_events(args):
+    """Summarize runs recorded in the event log."""
+    import json
+
+    path = DATA_DIR / eventlog.EVENTS_FILE
+    if not path.exists():
+        print(f"No event log at {path}")
+        return
+
+    if args.warnings:
+        for e in eventlog.read_events(path):
+            if e["event"] in ("warning", "error") and (args.run is None or e["run"] == args.run):
+                print(json.dumps(e) if args.json else f"{e['run']}  {e.get('file', '-')}: {e.get('message')}")
+        return
+
+    runs = eventlog.summarize_runs(eventlog.read_events(path))
+    if args.run:
+        runs = [r for r in runs if r["run"] == args.run]
+    if args.command_filter:
+        runs = [r for r in runs if r["command"] == args.command_filter]
+    runs = runs[-args.last:]
+
+    if args.json:
+        for r in runs:
+            print(json.dumps(r))
+    else:
+        print(eventlog.format_runs(runs))
+
+
+def cmd_show(args):
+    """Show one prompt's draw, prompt, responses and SFT split via the record index."""
+    import json
+    from record_index import RecordIndex, format_record
+
+    with RecordIndex(DATA_DIR) as index:
+        start = time.perf_counter()
+        stats = index.update(rebuild=args.rebuild)
+        if stats["scanned_files"] or stats["removed_files"]:
+            print(f"Index updated: {stats['records']} records from {stats['scanned_files']} changed "
+                  f"files, {stats['removed_files']} removed ({time.perf_counter() - start:.1f}s)",
+                  file=sys.stderr)
+        found = index.lookup(args.id)
+
+    if not any(found.values()):
+        print(f"Error: {args.id} not found")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(found, indent=2))
+    else:
+        print(format_record(args.id, found))
+
+
+def test_reset_merge():
+    """A reset prompt's answer to its old batch text is never merged, whatever the file times."""
+    import json
+    import os
+    import tempfile
+    from batch_generator import create_batch
+    from draws import parse_draw
+    from impact import load_resets, reset_prompts
+    from prompt_generator import generate_dataset, load_prompts, save_prompts
+    from repair import load_batch
+    from response_parser import merge_responses
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        batches_dir = data_dir / "batches"
         responses_dir = batches_dir / "responses"
-        if responses_dir.exists():
-            response_files = list(responses_dir.glob("*.jsonl"))
-            print(f"Response files: {len(response_files)}")
-            if batch_files:
-                pct = len(response_files) / len(batch_files) * 100
-                print(f"Progress: {pct:.1f}%")
-
-    # Check for SFT data
-    sft_dir = DATA_DIR / "sft"
-    if sft_dir.exists() and (sft_dir / "train.jsonl").exists():
-        import json
-        with open(sft_dir / "metadata.json") as f:
-            meta = json.load(f)
-        print(f"\nSFT data ready: {meta['total_examples']} examples")
+        responses_dir.mkdir(parents=True)
+        prompts_path = data_dir / "prompts.json"
+
+        # a was answered before the reset, b's batch was still unanswered
+        a, b = generate_dataset(2, seed=42)
+        draws = {p.id: parse_draw(p) for p in (a, b)}
+        for p in (a, b):
+            p.input_text += "\n(old resources)"
+        save_prompts([a, b], prompts_path)
+        answered = responses_dir / "batch_0000_responses.jsonl"
+        paths = [create_batch([a], 0, batches_dir), create_batch([b], 1, batches_dir)]
+        answered.write_text(json.dumps({"id": a.id, "response": "Reading of the old text."}) + "\n")
+
+        result = reset_prompts([a, b], draws, data_dir)
+        save_prompts([a, b], prompts_path)
+        assert result == {"reset": 2, "batches_rewritten": 1}, result
+        assert load_batch(paths[1])[1][0] == {"id": b.id, "input": b.input_text, "reset": 1}
+        assert load_batch(paths[0])[1][0]["input"] != a.input_text
+
+        # A late answer to the old batch_0000, and an answer to the rewritten
+        # batch_0001 copied in with an old mtime
+        answered.write_text(json.dumps({"id": a.id, "response": "Late reading of the old text."}) + "\n")
+        copied = responses_dir / "batch_0001_responses.jsonl"
+        copied.write_text(json.dumps({"id": b.id, "response": "Reading of the new text."}) + "\n")
+        past = time.time() - 86400
+        os.utime(copied, (past, past))
+        merge_responses(prompts_path, responses_dir, resets=load_resets(data_dir))
+        status = {p.id: p.status for p in load_prompts(prompts_path)}
+        assert status == {a.id: "pending", b.id: "completed"}, status
 
 
 def cmd_test(args):
@@ -194,6 +893,11 @@ def cmd_test(args):
     print(prompts[0].input_text[:600] + "...")
     print("-" * 50)
 
+    print("\n4. Testing reset -> stale batch -> merge...")
+    test_reset_merge()
+    print("   ✓ Unanswered batches were rewritten with the re-rendered text")
+    print("   ✓ Responses to batch entries from before the reset were skipped")
+
     print("\n✓ All tests passed!")
 
 
@@ -204,37 +908,201 @@ def main():
         epilog="""
 Examples:
   python run.py generate-prompts --count 25000
+  python run.py generate-prompts --count 500000 --resume
   python run.py create-batches --batch-size 25
+  python run.py create-batches --order coverage --max-batches 200
   python run.py merge-responses
-  python run.py convert-sft
+  python run.py merge-responses --repair --max-retries 3
+  python run.py dedup --threshold 0.8
+  python run.py convert-sft --exclude-duplicates
   python run.py status
+  python run.py status --watch --interval 30 --jsonl metrics.jsonl
+  python run.py --profile generate-prompts --count 25000
+  python run.py bench --quick --save-baseline
+  python run.py events --last 5
+  python run.py show 3f2a9c1b7e04
+  python run.py impact --old HEAD~1 --list
+  python run.py coverage --heatmap cells
+  python run.py precache bundle
+  python run.py generate-prompts --count 500000 --shard 2/4
+  python run.py merge-responses --shard 2/4
+  python run.py gather --shards 4
         """
     )
 
+    parser.add_argument("--profile", action="store_true",
+                        help="Record wall/CPU time, peak memory and hot-path spans to profiles/")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="With --profile, also dump cProfile stats next to the report")
+
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
     # generate-prompts
     p = subparsers.add_parser("generate-prompts", help="Generate training prompts")
     p.add_argument("--count", type=int, default=25000, help="Number of prompts")
     p.add_argument("--seed", type=int, default=42, help="Random seed")
+    p.add_argument("--layout", choices=["standard", "prefix_stable"], default="standard",
+                   help="Prompt section order; prefix_stable mirrors PromptLayout.prefixStable on iOS")
+    p.add_argument("--append", action="store_true",
+                   help="Add novel prompts to prompts.json instead of replacing it")
+    p.add_argument("--id-filter", nargs="?", const=str(DATA_DIR / "id_filter.bin"), default=None,
+                   metavar="PATH", help="Skip IDs recorded in this persistent Bloom filter and add "
+                                        "the new ones (default path: data/id_filter.bin)")
+    p.add_argument("--fp-rate", type=float, default=0.001,
+                   help="False-positive rate when creating a new ID filter")
+    p.add_argument("--styles", nargs="+", choices=["balanced", "mystical", "practical"], default=None,
+                   help="Render every draw in each of these styles (variant mode)")
+    p.add_argument("--moon-phases", nargs="+", default=None, metavar="PHASE",
+                   help="Render every draw under each of these moon phases, e.g. new-moon full-moon, "
+                        "or 'all' (variant mode)")
+    p.add_argument("--resume", action="store_true",
+                   help="Continue an interrupted run from its last checkpoint")
+    p.add_argument("--checkpoint-every", type=int, default=10000, metavar="DRAWS",
+                   help="Draws between checkpoints (data/generate_checkpoint.json)")
+    p.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                   help="Make every draw but keep only prompts in ID-hash shard i of N (0-based), written to data/shards/i-of-N/")
 
     # create-batches
     p = subparsers.add_parser("create-batches", help="Create batch files for Claude Max")
     p.add_argument("--batch-size", type=int, default=25, help="Prompts per batch")
     p.add_argument("--start", type=int, default=0, help="Starting batch number")
     p.add_argument("--max-batches", type=int, default=None, help="Max batches to create")
+    p.add_argument("--order", choices=["shuffled", "coverage"], default="shuffled",
+                   help="coverage: schedule prompts adding the most uncovered card/position/"
+                        "orientation cells and combinations first")
+    p.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                   help="Batch only shard i of N (0-based) in data/shards/i-of-N/")
 
     # merge-responses
     p = subparsers.add_parser("merge-responses", help="Merge Claude responses")
+    p.add_argument("--files", nargs="+", default=None, metavar="NAME",
+                   help="Merge only these files from batches/responses/")
+    p.add_argument("--repair", action="store_true",
+                   help="Write repair_XXXX.json batches for prompts missing or rejected in answered batches")
+    p.add_argument("--max-retries", type=int, default=3, help="Repair attempts per prompt before giving up")
+    p.add_argument("--repair-batch-size", type=int, default=25, help="Prompts per repair batch")
+    p.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                   help="Merge into shard i of N (0-based) in data/shards/i-of-N/")
+
+    # dedup
+    p = subparsers.add_parser("dedup", help="Mark near-duplicate responses")
+    p.add_argument("--threshold", type=float, default=0.8, help="Jaccard similarity threshold")
+    p.add_argument("--num-perm", type=int, default=128, help="MinHash signature size")
+    p.add_argument("--bands", type=int, default=16, help="LSH bands (must divide --num-perm)")
+    p.add_argument("--shingle-size", type=int, default=5, help="Words per shingle")
+    p.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
 
     # convert-sft
     p = subparsers.add_parser("convert-sft", help="Convert to SFT format")
     p.add_argument("--train-ratio", type=float, default=0.9)
     p.add_argument("--valid-ratio", type=float, default=0.05)
     p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--exclude-duplicates", action="store_true",
+                   help="Skip responses marked by 'dedup'")
+    p.add_argument("--streaming", action="store_true",
+                   help="Append new examples to hash-assigned splits instead of reshuffling")
+    p.add_argument("--format", choices=["phi", "canonical"], default="phi",
+                   help="'canonical' emits the iOS prompt + response without the extra chat wrapper")
+    p.add_argument("--pack", type=int, default=None, metavar="TOKENS",
+                   help="Also write sft/packed/ with examples packed into TOKENS-long sequences")
+    p.add_argument("--shards", type=int, default=None, metavar="N",
+                   help="Also write N shards per split with a checksum manifest to sft/shards/")
+    p.add_argument("--tokenize", default=None, metavar="TOKENIZER",
+                   help="Also write memory-mappable token arrays to sft/tokenized/ "
+                        "('toy', a tokenizer.json path, or a vocab file)")
+    p.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                   help="Convert only shard i of N (0-based) in data/shards/i-of-N/; use --streaming so 'gather' can merge the splits")
 
     # status
     p = subparsers.add_parser("status", help="Show pipeline status")
+    p.add_argument("--full", action="store_true",
+                   help="Rescan prompts and batch files instead of reading the summary index")
+    p.add_argument("--watch", action="store_true", help="Live throughput, ETA and error rate")
+    p.add_argument("--interval", type=float, default=10.0, help="Seconds between --watch ticks")
+    p.add_argument("--jsonl", default=None,
+                   help="Also append --watch metrics as NDJSON to this file ('-' for stdout only)")
+    p.add_argument("--ticks", type=int, default=None, help="Stop --watch after N ticks")
+    p.add_argument("--shard", type=parse_shard, default=None, metavar="i/N",
+                   help="Show shard i of N (0-based) in data/shards/i-of-N/")
+
+    # all
+    p = subparsers.add_parser("all", help="Run stages whose inputs changed")
+    p.add_argument("--count", type=int, default=25000, help="Number of prompts")
+    p.add_argument("--seed", type=int, default=42, help="Random seed")
+    p.add_argument("--layout", choices=["standard", "prefix_stable"], default="standard")
+    p.add_argument("--batch-size", type=int, default=25, help="Prompts per batch")
+    p.add_argument("--train-ratio", type=float, default=0.9)
+    p.add_argument("--valid-ratio", type=float, default=0.05)
+    p.add_argument("--format", choices=["phi", "canonical"], default="phi")
+    p.add_argument("--streaming", action="store_true", help="Append-only SFT conversion")
+    p.add_argument("--exclude-duplicates", action="store_true")
+    p.add_argument("--force", nargs="+", choices=["prompts", "batches", "merge", "dedup", "sft"],
+                   help="Re-run these stages even if up to date")
+    p.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+
+    # gather
+    p = subparsers.add_parser("gather", help="Merge --shard outputs into data/")
+    p.add_argument("--shards", type=int, default=None, metavar="N",
+                   help="Number of shards (default: the only N under data/shards/)")
+    p.add_argument("--force", action="store_true",
+                   help="Replace data/prompts.json even if it changed since the shards were split or last gathered")
+
+    # precache
+    p = subparsers.add_parser("precache", help="Precompute every reading of a small draw space")
+    p.add_argument("action", choices=["generate", "merge", "bundle"])
+    p.add_argument("--space", choices=["daily"], default="daily",
+                   help="Draw space to enumerate (daily: Daily Draw, no question)")
+    p.add_argument("--style", choices=["balanced", "mystical", "practical"], default=None,
+                   help="generate: prompt style (default: balanced); bundle: must match generate's")
+    p.add_argument("--layout", choices=["standard", "prefix_stable"], default=None,
+                   help="generate: prompt layout (default: standard); bundle: must match generate's")
+    p.add_argument("--batch-size", type=int, default=25, help="Prompts per batch")
+
+    # bench
+    p = subparsers.add_parser("bench", help="Benchmark hot paths against a saved baseline")
+    p.add_argument("--only", nargs="+", default=None,
+                   choices=["build_prompt", "variants", "generate_dataset", "parse_jsonl", "merge"],
+                   help="Run only these benchmark groups")
+    p.add_argument("--quick", action="store_true", help="Skip the 25k and 200k generate_dataset runs")
+    p.add_argument("--baseline", default=None, help="Baseline file (default: training/bench_baseline.json)")
+    p.add_argument("--save-baseline", action="store_true", help="Record these results as the baseline")
+    p.add_argument("--threshold", type=float, default=0.2,
+                   help="Flag benchmarks slower than baseline by more than this fraction")
+
+    # impact
+    p = subparsers.add_parser("impact", help="List or reset prompts affected by iOS resource edits")
+    p.add_argument("--old", default="HEAD",
+                   help="Earlier resources: a directory or a git revision (default: HEAD)")
+    p.add_argument("--new", default=None,
+                   help="Later resources: a directory or a git revision (default: working tree)")
+    p.add_argument("--list", action="store_true", help="Print each affected ID, its status and changed keys")
+    p.add_argument("--reset", action="store_true",
+                   help="Re-render affected prompts with the current resources and mark them pending")
+
+    # coverage
+    p = subparsers.add_parser("coverage", help="Draw-space coverage matrices (requires numpy)")
+    p.add_argument("--status", default="completed", choices=["completed", "pending", "all"],
+                   help="Which prompts to count (default: completed)")
+    p.add_argument("--format", default="text", choices=["text", "csv"],
+                   help="text: least covered entries (or --heatmap); csv: one file per matrix")
+    p.add_argument("--heatmap", choices=["cells", "pairs", "questions"], default=None,
+                   help="Print this matrix as a text heatmap")
+    p.add_argument("--top", type=int, default=10, help="Least covered entries to list per matrix")
+    p.add_argument("--output", default=None, help="CSV directory (default: data/coverage)")
+
+    # events
+    p = subparsers.add_parser("events", help="Summarize runs from the structured event log")
+    p.add_argument("--last", type=int, default=10, help="Show the last N runs")
+    p.add_argument("--run", default=None, help="Only this run id")
+    p.add_argument("--command", dest="command_filter", default=None, help="Only runs of this command")
+    p.add_argument("--warnings", action="store_true", help="List merge warnings and errors instead")
+    p.add_argument("--json", action="store_true", help="Emit one JSON object per line")
+
+    # show
+    p = subparsers.add_parser("show", help="Show one prompt, its responses and SFT split by ID")
+    p.add_argument("id", help="Prompt ID")
+    p.add_argument("--rebuild", action="store_true", help="Rebuild the record index from scratch")
+    p.add_argument("--json", action="store_true", help="Print the raw records with their locations")
 
     # test
     p = subparsers.add_parser("test", help="Run quick test")
@@ -250,12 +1118,73 @@ Examples:
         "generate-prompts": cmd_generate_prompts,
         "create-batches": cmd_create_batches,
         "merge-responses": cmd_merge_responses,
+        "dedup": cmd_dedup,
         "convert-sft": cmd_convert_sft,
         "status": cmd_status,
+        "all": cmd_all,
+        "gather": cmd_gather,
+        "precache": cmd_precache,
+        "impact": cmd_impact,
+        "coverage": cmd_coverage,
+        "bench": cmd_bench,
+        "events": cmd_events,
+        "show": cmd_show,
         "test": cmd_test,
     }
 
-    commands[args.command](args)
+    # Read-only and self-contained commands leave data/events.jsonl alone
+    if args.command in ("events", "show", "test"):
+        commands[args.command](args)
+        return
+
+    if getattr(args, "shard", None):
+        enter_shard(args)
+
+    eventlog.open_log(DATA_DIR / eventlog.EVENTS_FILE)
+    eventlog.emit("run_start", command=args.command, argv=sys.argv[1:])
+    start = time.perf_counter()
+    status = "error"
+    try:
+        run_command(commands[args.command], args)
+        status = "ok"
+    except SystemExit as e:
+        status = "ok" if not e.code else "failed"
+        raise
+    except KeyboardInterrupt:
+        status = "interrupted"
+        raise
+    finally:
+        eventlog.emit("run_end", command=args.command, status=status,
+                      duration_s=round(time.perf_counter() - start, 3))
+        eventlog.close_log()
+
+
+def run_command(command, args):
+    """Run a subcommand, under the profiler when --profile is set."""
+    if not args.profile:
+        command(args)
+        return
+
+    import cProfile
+    import profiling
+
+    report_path = profiling.report_path(SCRIPT_DIR.parent / "profiles", args.command)
+    profiling.enable()
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler:
+        profiler.enable()
+    try:
+        with profiling.stage(args.command):
+            command(args)
+    finally:
+        cprofile_path = None
+        if profiler:
+            profiler.disable()
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            cprofile_path = report_path.with_suffix(".prof")
+            profiler.dump_stats(cprofile_path)
+        profiling.write_report(report_path, args.command, sys.argv[1:], cprofile_path)
+        print(f"\nProfile written to {report_path}")
 
 
 if __name__ == "__main__":
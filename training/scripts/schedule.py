@@ -0,0 +1,114 @@
+"""
+Coverage-value ordering of pending prompts for batch creation.
+
+Each prompt covers features: its (card, orientation, position) cells, the
+combinations.json entries its draw matches and its question category x
+spread. A feature already seen c times (among completed prompts and prompts
+scheduled so far) is worth 1 / (1 + c), and a prompt's value is the sum
+over its features.
+
+A plain sum favours large spreads, which cover more features per prompt, so
+spreads take turns by quota: the next prompt comes from the spread furthest
+behind its share of the pending pool, and within a spread prompts are taken
+greedily by value. Every prefix of the schedule (and so every prefix of
+processed batches) has each spread in proportion and is as balanced as the
+pending pool allows.
+
+The value function is submodular (a prompt's gain only shrinks as others are
+scheduled), so the greedy pass is lazy: gains in each spread's heap are
+upper bounds, and only the top entry is recomputed until it stays on top.
+"""
+
+import heapq
+from typing import Dict, List, Sequence
+
+from draws import CARD_INDEX, parse_draw
+from prompt_generator import CARDS, COMBINATIONS, QUESTIONS, SPREADS, TrainingPrompt
+
+POSITION_IDS = sorted({p["id"] for s in SPREADS.values() for p in s["positions"]})
+_POSITION_INDEX = {pos: i for i, pos in enumerate(POSITION_IDS)}
+SPREAD_IDS = list(SPREADS)
+_SPREAD_INDEX = {sid: i for i, sid in enumerate(SPREAD_IDS)}
+# Question-less prompts (e.g. precache) share the last category
+QUESTION_CATEGORIES = list(QUESTIONS) + ["none"]
+_CATEGORY_INDEX = {cat: i for i, cat in enumerate(QUESTION_CATEGORIES)}
+# Features are small ints: cells first, then one per combination, then one
+# per spread x question category
+N_CELLS = len(CARDS) * len(POSITION_IDS) * 2
+N_COMBO_FEATURES = len(COMBINATIONS)
+N_FEATURES = N_CELLS + N_COMBO_FEATURES + len(SPREAD_IDS) * len(QUESTION_CATEGORIES)
+
+_COMBOS_BY_CARD: Dict[str, List[int]] = {}
+for _k, _combo in enumerate(COMBINATIONS):
+    for _name in _combo["cards"]:
+        _COMBOS_BY_CARD.setdefault(_name, []).append(_k)
+
+
+def prompt_features(prompt: TrainingPrompt) -> List[int]:
+    draw = parse_draw(prompt)
+    names = set()
+    features = []
+    for name, is_reversed, position in draw.cards:
+        features.append((CARD_INDEX[name] * len(POSITION_IDS) + _POSITION_INDEX[position]) * 2 + is_reversed)
+        names.add(name)
+    candidates = {k for name in names for k in _COMBOS_BY_CARD.get(name, ())}
+    features.extend(N_CELLS + k for k in sorted(candidates)
+                    if all(c in names for c in COMBINATIONS[k]["cards"]))
+    category = _CATEGORY_INDEX.get(draw.category, len(QUESTION_CATEGORIES) - 1)
+    features.append(N_CELLS + N_COMBO_FEATURES
+                    + _SPREAD_INDEX[draw.spread] * len(QUESTION_CATEGORIES) + category)
+    return features
+
+
+def _counts(prompts: Sequence[TrainingPrompt]) -> List[int]:
+    counts = [0] * N_FEATURES
+    for p in prompts:
+        for f in prompt_features(p):
+            counts[f] += 1
+    return counts
+
+
+def coverage_order(pending: Sequence[TrainingPrompt],
+                   completed: Sequence[TrainingPrompt] = ()) -> List[TrainingPrompt]:
+    """
+    pending reordered by spread quota, then marginal coverage value; ties keep
+    their original order.
+    """
+    counts = _counts(completed)
+    value = [1 / (1 + c) for c in counts]
+    features = [prompt_features(p) for p in pending]
+
+    def gain(i: int) -> float:
+        return sum(map(value.__getitem__, features[i]))
+
+    heaps: Dict[str, List] = {}
+    for i, p in enumerate(pending):
+        heaps.setdefault(p.spread_name, []).append((-gain(i), i))
+    total = {spread: len(heap) for spread, heap in heaps.items()}
+    taken = dict.fromkeys(heaps, 0)
+    for heap in heaps.values():
+        heapq.heapify(heap)
+
+    order = []
+    while len(order) < len(pending):
+        # The spread furthest behind its share of the pool goes next
+        spread = min((s for s in heaps if heaps[s]), key=lambda s: (taken[s] + 1) / total[s])
+        heap = heaps[spread]
+        while True:
+            _, i = heapq.heappop(heap)
+            g = gain(i)
+            if not heap or g >= -heap[0][0]:
+                break
+            heapq.heappush(heap, (-g, i))
+        taken[spread] += 1
+        order.append(pending[i])
+        for f in features[i]:
+            counts[f] += 1
+            value[f] = 1 / (1 + counts[f])
+    return order
+
+
+def prefix_balance(prompts: Sequence[TrainingPrompt], fraction: float) -> Dict[str, int]:
+    """Distinct features covered and the least covered feature's count in the first fraction."""
+    counts = _counts(prompts[:max(1, int(len(prompts) * fraction))])
+    return {"covered": sum(1 for c in counts if c), "features": N_FEATURES, "min_count": min(counts)}
@@ -0,0 +1,246 @@
+"""
+Multi-node sharding: pipeline stages spread across machines sharing a file drop.
+
+Prompts are partitioned by a hash of their ID (--shard i/N, 0 <= i < N).
+Each shard works in its own data directory, data/shards/<i>-of-<N>/, laid
+out like data/ itself, so every stage runs there unchanged. A shard's
+prompts come either from generate-prompts --shard, which makes every draw
+but renders only the shard's prompts, or from splitting an existing
+prompts.json (and its resets.json entries) on the first stage run with
+--shard. shard.json describes the shard:
+
+    shard, shards  i and N
+    origin         the generation parameters, or the SHA-256 of the
+                   prompts.json the shard was split from
+    total          prompts in the unsharded dataset
+    positions      each of the shard's prompts' index in the unsharded
+                   prompts.json, in shard order
+
+gather checks that all N shards share an origin and merges them back into
+data/: prompts.json in single-node order with each shard's merged
+responses, and, for hash-split (--streaming) SFT output, the split files and
+ids.tsv in the order a single-node streaming conversion writes them.
+Batches and response files stay in their shards. gather only replaces a
+data/prompts.json it can account for: the one the shards were split from
+(by source_sha256) or the output of the previous gather, recorded in
+data/shards/gather.json. Anything else was changed outside the shards and
+needs force.
+
+dedup and `run.py all` have no shard mode. Near-duplicates are found across
+all responses, so a shard cannot dedup alone, and `all` keeps one
+pipeline_state.json for data/; both run on the gathered data.
+
+(Not to be confused with shards.py, which splits SFT files for training.)
+"""
+
+import hashlib
+import heapq
+import json
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from convert_to_sft import IDS_FILE, SPLITS
+from fsutil import atomic_open, atomic_write_json, file_sha256
+from impact import RESETS_FILE, load_resets
+from prompt_generator import TrainingPrompt, iter_prompts, load_prompts, save_prompts
+
+SHARDS_DIR = "shards"
+MANIFEST_FILE = "shard.json"
+GATHER_FILE = "gather.json"
+
+Shard = Tuple[int, int]
+
+
+def shard_of(prompt_id: str, num_shards: int) -> int:
+    # blake2b rather than md5 so shards are independent of hash_split's splits
+    digest = hashlib.blake2b(prompt_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def shard_dir(data_dir: Path, shard: Shard) -> Path:
+    return data_dir / SHARDS_DIR / f"{shard[0]}-of-{shard[1]}"
+
+
+def load_manifest(directory: Path) -> Optional[Dict]:
+    path = directory / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(directory: Path, shard: Shard, origin: Dict, total: int, positions: List[int]):
+    atomic_write_json(directory / MANIFEST_FILE, {
+        "shard": shard[0],
+        "shards": shard[1],
+        "origin": origin,
+        "total": total,
+        "positions": positions,
+    }, indent=None)
+
+
+def partition_prompts(source: Path, directory: Path, shard: Shard) -> List[TrainingPrompt]:
+    """Write the shard's prompts (and their resets) from an unsharded prompts.json to directory."""
+    index, num_shards = shard
+    prompts, positions = [], []
+    total = 0
+    for position, p in enumerate(iter_prompts(source)):
+        total += 1
+        if shard_of(p.id, num_shards) == index:
+            prompts.append(p)
+            positions.append(position)
+    directory.mkdir(parents=True, exist_ok=True)
+    save_prompts(prompts, directory / "prompts.json")
+    write_manifest(directory, shard, {"source_sha256": file_sha256(source)}, total, positions)
+    resets = load_resets(source.parent)
+    if resets:
+        ids = {p.id for p in prompts}
+        atomic_write_json(directory / RESETS_FILE,
+                          {pid: t for pid, t in resets.items() if pid in ids}, indent=None)
+    return prompts
+
+
+def find_num_shards(data_dir: Path) -> int:
+    """N of the only shard layout under data/shards."""
+    found = {int(d.name.rsplit("-of-", 1)[1]) for d in (data_dir / SHARDS_DIR).glob("*-of-*")}
+    if len(found) != 1:
+        raise ValueError(f"Expected one shard layout in {data_dir / SHARDS_DIR}, found "
+                         f"{', '.join(f'N={n}' for n in sorted(found)) or 'none'}; pass --shards")
+    return found.pop()
+
+
+def _check_sft(dirs: List[Path]) -> Optional[Dict]:
+    """The shared SFT metadata of all shards, or None if no shard has converted."""
+    metas = []
+    for d in dirs:
+        path = d / "sft" / "metadata.json"
+        if path.exists():
+            with open(path) as f:
+                metas.append(json.load(f))
+    if not metas:
+        return None
+    if len(metas) != len(dirs):
+        raise ValueError(f"Only {len(metas)} of {len(dirs)} shards have SFT output; "
+                         f"run convert-sft --streaming in every shard")
+    keys = [(m.get("split_mode"), m.get("ratios"), m.get("format", "phi")) for m in metas]
+    if keys[0][0] != "hash" or any(k != keys[0] for k in keys):
+        raise ValueError("Shard SFT outputs must all come from convert-sft --streaming with the "
+                         "same ratios and format; shuffled splits cannot be gathered, so run "
+                         "convert-sft after gather instead")
+    return {"ratios": keys[0][1], "format": keys[0][2]}
+
+
+def _split_entries(sft_dir: Path, position: Dict[str, int]) -> Dict[str, List[Tuple[int, int, int]]]:
+    """(position, byte offset, length) of each line of each split file, by position."""
+    ids = {name: [] for name in SPLITS}
+    with open(sft_dir / IDS_FILE) as f:
+        for line in f:
+            if line.strip():
+                pid, split = line.rstrip("\n").split("\t")
+                ids[split].append(pid)
+    entries = {}
+    for name in SPLITS:
+        entries[name] = []
+        offset = 0
+        with open(sft_dir / f"{name}.jsonl", "rb") as f:
+            for pid, line in zip(ids[name], f):
+                if pid not in position:
+                    raise ValueError(f"{sft_dir}: {pid} is not in any shard's prompts.json")
+                entries[name].append((position[pid], offset, len(line)))
+                offset += len(line)
+        if len(entries[name]) != len(ids[name]):
+            raise ValueError(f"{sft_dir / name}.jsonl is shorter than {IDS_FILE} says")
+        entries[name].sort()
+    return entries
+
+
+def _check_target(data_dir: Path, origin: Dict):
+    """Refuse to replace a prompts.json that is neither the shards' source nor the last gather."""
+    target = data_dir / "prompts.json"
+    if not target.exists():
+        return
+    known = set()
+    if "source_sha256" in origin:
+        known.add(origin["source_sha256"])
+    path = data_dir / SHARDS_DIR / GATHER_FILE
+    if path.exists():
+        with open(path) as f:
+            known.add(json.load(f)["sha256"])
+    if file_sha256(target) not in known:
+        raise ValueError(f"{target} has changed since the shards were split from it or last "
+                         f"gathered, and gathering would discard those changes; pass --force "
+                         f"to replace it anyway")
+
+
+def gather(data_dir: Path, num_shards: int, force: bool = False) -> Dict:
+    """
+    Merge all shards' prompts (and hash-split SFT files) into data_dir.
+
+    Unless force, refuses to overwrite a data_dir/prompts.json changed
+    outside the shards. Returns the gathered prompts and the SFT split
+    counts (None without SFT output).
+    """
+    dirs = [shard_dir(data_dir, (i, num_shards)) for i in range(num_shards)]
+    manifests = [load_manifest(d) for d in dirs]
+    missing = [d.name for d, m in zip(dirs, manifests) if m is None]
+    if missing:
+        raise ValueError(f"Missing shards: {', '.join(missing)}")
+    first = manifests[0]
+    for d, m in zip(dirs, manifests):
+        if m["origin"] != first["origin"] or m["total"] != first["total"]:
+            raise ValueError(f"{d.name} was partitioned from a different run than {dirs[0].name}")
+    sft = _check_sft(dirs)
+    if not force:
+        _check_target(data_dir, first["origin"])
+
+    shard_prompts = []
+    for d, m in zip(dirs, manifests):
+        prompts = load_prompts(d / "prompts.json")
+        if len(prompts) != len(m["positions"]):
+            raise ValueError(f"{d.name}/prompts.json has {len(prompts)} prompts but "
+                             f"{MANIFEST_FILE} lists {len(m['positions'])}")
+        shard_prompts.append(zip(m["positions"], prompts))
+    merged = list(heapq.merge(*shard_prompts, key=itemgetter(0)))
+    if [pos for pos, _ in merged] != list(range(first["total"])):
+        raise ValueError(f"Shard positions do not cover 0..{first['total'] - 1} exactly once")
+    prompts = [p for _, p in merged]
+    save_prompts(prompts, data_dir / "prompts.json")
+    atomic_write_json(data_dir / SHARDS_DIR / GATHER_FILE,
+                      {"sha256": file_sha256(data_dir / "prompts.json")})
+    result = {"prompts": prompts, "sft": None}
+
+    if sft is not None:
+        position = {p.id: k for k, p in enumerate(prompts)}
+        sft_dir = data_dir / "sft"
+        entries = [_split_entries(d / "sft", position) for d in dirs]
+        counts = {}
+        ids = []
+        for name in SPLITS:
+            sources = [open(d / "sft" / f"{name}.jsonl", "rb") for d in dirs]
+            try:
+                with atomic_open(sft_dir / f"{name}.jsonl", "wb") as out:
+                    streams = [[(pos, k, offset, length) for pos, offset, length in e[name]]
+                               for k, e in enumerate(entries)]
+                    counts[name] = 0
+                    for pos, k, offset, length in heapq.merge(*streams):
+                        sources[k].seek(offset)
+                        out.write(sources[k].read(length))
+                        ids.append((pos, name))
+                        counts[name] += 1
+            finally:
+                for f in sources:
+                    f.close()
+        ids.sort()
+        with atomic_open(sft_dir / IDS_FILE) as f:
+            for pos, name in ids:
+                f.write(f"{prompts[pos].id}\t{name}\n")
+        atomic_write_json(sft_dir / "metadata.json", {
+            "total_examples": sum(counts.values()),
+            "splits": counts,
+            "split_mode": "hash",
+            "ratios": sft["ratios"],
+            "format": sft["format"],
+        })
+        result["sft"] = counts
+    return result
@@ -0,0 +1,224 @@
+"""
+Sharded SFT output and a concurrent shard reader.
+
+write_shards splits each train/valid/test JSONL into N roughly equal shards
+and writes a manifest with example counts, byte sizes and SHA-256 checksums.
+ShardedReader streams a split back with background-thread prefetch across
+shards, a shuffle buffer, per-worker shard assignment and shard-granular
+resume, using only the standard library.
+"""
+
+import hashlib
+import json
+import queue
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+SHARD_MANIFEST = "manifest.json"
+
+_DONE = object()
+
+
+class _ReaderError:
+    """An exception raised in a reader thread, passed to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def shard_name(split: str, index: int, num_shards: int) -> str:
+    return f"{split}-{index:05d}-of-{num_shards:05d}.jsonl"
+
+
+def write_shards(sft_dir: Path, num_shards: int, output_dir: Optional[Path] = None,
+                 splits=("train", "valid", "test")) -> Dict:
+    """Round-robin each split's examples into num_shards shard files."""
+    output_dir = output_dir or sft_dir / "shards"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {"num_shards": num_shards, "splits": {}}
+
+    for split in splits:
+        path = sft_dir / f"{split}.jsonl"
+        if not path.exists():
+            continue
+        files = [open(output_dir / shard_name(split, i, num_shards), "wb") for i in range(num_shards)]
+        hashes = [hashlib.sha256() for _ in range(num_shards)]
+        counts = [0] * num_shards
+        sizes = [0] * num_shards
+        try:
+            with open(path, "rb") as f:
+                n = 0
+                for line in f:
+                    if not line.strip():
+                        continue
+                    i = n % num_shards
+                    files[i].write(line)
+                    hashes[i].update(line)
+                    counts[i] += 1
+                    sizes[i] += len(line)
+                    n += 1
+        finally:
+            for f in files:
+                f.close()
+
+        manifest["splits"][split] = [
+            {
+                "file": shard_name(split, i, num_shards),
+                "examples": counts[i],
+                "bytes": sizes[i],
+                "sha256": hashes[i].hexdigest(),
+            }
+            for i in range(num_shards)
+        ]
+        print(f"  {split}: {sum(counts)} examples in {num_shards} shards")
+
+    with open(output_dir / SHARD_MANIFEST, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify_shards(shards_dir: Path) -> List[str]:
+    """Check every shard against the manifest; returns a list of problems."""
+    with open(shards_dir / SHARD_MANIFEST) as f:
+        manifest = json.load(f)
+
+    problems = []
+    for split, shards in manifest["splits"].items():
+        for shard in shards:
+            path = shards_dir / shard["file"]
+            if not path.exists():
+                problems.append(f"{shard['file']}: missing")
+                continue
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            if path.stat().st_size != shard["bytes"]:
+                problems.append(f"{shard['file']}: size {path.stat().st_size} != {shard['bytes']}")
+            elif h.hexdigest() != shard["sha256"]:
+                problems.append(f"{shard['file']}: checksum mismatch")
+    return problems
+
+
+class ShardedReader:
+    """
+    Iterate one split of a sharded dataset.
+
+    Each loader worker passes its worker_id/num_workers and reads a disjoint
+    subset of shards. Within a worker, `readers` background threads read
+    shards concurrently into a bounded prefetch queue, and a shuffle buffer
+    of `shuffle_buffer` examples randomises order across shards. Shard order
+    is reshuffled every epoch; with readers=1 an epoch is deterministic for a
+    given seed and can be resumed from a shard boundary via start_shard.
+    """
+
+    def __init__(self, shards_dir: Path, split: str = "train", shuffle_buffer: int = 1000,
+                 seed: int = 0, prefetch: int = 1024, readers: int = 1,
+                 worker_id: int = 0, num_workers: int = 1):
+        self.shards_dir = Path(shards_dir)
+        with open(self.shards_dir / SHARD_MANIFEST) as f:
+            manifest = json.load(f)
+        shards = manifest["splits"][split]
+        self.shards = shards[worker_id::num_workers]
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        self.prefetch = prefetch
+        self.readers = max(1, readers)
+
+    def __len__(self) -> int:
+        return sum(s["examples"] for s in self.shards)
+
+    def shard_order(self, epoch: int) -> List[str]:
+        files = [s["file"] for s in self.shards]
+        random.Random(self.seed * 1000003 + epoch).shuffle(files)
+        return files
+
+    @staticmethod
+    def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the consumer has stopped."""
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read_shards(self, files: queue.Queue, out: queue.Queue, stop: threading.Event):
+        # _DONE is always queued, so the consumer never waits on a dead thread
+        try:
+            while not stop.is_set():
+                try:
+                    name = files.get_nowait()
+                except queue.Empty:
+                    break
+                with open(self.shards_dir / name) as f:
+                    for line in f:
+                        if line.strip() and not self._put(out, line, stop):
+                            return
+        except Exception as e:
+            self._put(out, _ReaderError(e), stop)
+        finally:
+            self._put(out, _DONE, stop)
+
+    def iter_epoch(self, epoch: int = 0, start_shard: int = 0) -> Iterator[Dict]:
+        """Yield examples for one epoch, skipping the first start_shard shards of its order."""
+        files: queue.Queue = queue.Queue()
+        for name in self.shard_order(epoch)[start_shard:]:
+            files.put(name)
+
+        out: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._read_shards, args=(files, out, stop), daemon=True)
+            for _ in range(self.readers)
+        ]
+        for t in threads:
+            t.start()
+
+        rng = random.Random(self.seed * 1000003 + epoch + 1)
+        buffer: List[str] = []
+        finished = 0
+        try:
+            while finished < len(threads):
+                line = out.get()
+                if line is _DONE:
+                    finished += 1
+                    continue
+                if isinstance(line, _ReaderError):
+                    raise line.error
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(line)
+                    continue
+                i = rng.randrange(len(buffer))
+                buffer[i], line = line, buffer[i]
+                yield json.loads(line)
+
+            rng.shuffle(buffer)
+            for line in buffer:
+                yield json.loads(line)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.iter_epoch(0)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sft-dir", default="../data/sft")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--verify", action="store_true", help="Verify existing shards against the manifest")
+    args = parser.parse_args()
+
+    sft_dir = Path(__file__).parent / args.sft_dir
+    if args.verify:
+        problems = verify_shards(sft_dir / "shards")
+        print("\n".join(problems) if problems else "All shards match the manifest")
+    else:
+        write_shards(sft_dir, args.shards)
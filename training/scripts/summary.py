@@ -0,0 +1,90 @@
+"""
+Pipeline summary index.
+
+Every stage that changes pipeline state writes its counts into a small
+`summary.json` next to prompts.json, so `run.py status` can report progress
+without loading the dataset.
+"""
+
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable
+
+from fsutil import atomic_write_json
+
+SUMMARY_FILE = "summary.json"
+
+
+def prompt_summary(prompts: Iterable) -> Dict:
+    """Counts and response-length aggregates for a set of TrainingPrompts."""
+    total = with_question = 0
+    by_status: Dict[str, int] = {}
+    by_spread: Dict[str, Dict[str, int]] = {}
+    lengths = {"count": 0, "sum": 0, "min": 0, "max": 0}
+
+    for p in prompts:
+        total += 1
+        if p.question:
+            with_question += 1
+        by_status[p.status] = by_status.get(p.status, 0) + 1
+        spread = by_spread.setdefault(p.spread_name, {"total": 0, "completed": 0})
+        spread["total"] += 1
+
+        if p.status == "completed":
+            spread["completed"] += 1
+            if p.response:
+                n = len(p.response)
+                lengths["min"] = n if not lengths["count"] else min(lengths["min"], n)
+                lengths["max"] = max(lengths["max"], n)
+                lengths["count"] += 1
+                lengths["sum"] += n
+
+    return {
+        "total": total,
+        "with_question": with_question,
+        "by_status": by_status,
+        "by_spread": by_spread,
+        "response_chars": lengths,
+    }
+
+
+def load_summary(data_dir: Path) -> Dict:
+    path = data_dir / SUMMARY_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_summary(data_dir: Path, **sections: Dict) -> Dict:
+    """Replace the given top-level sections of the summary index."""
+    summary = load_summary(data_dir)
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for name, section in sections.items():
+        summary[name] = {**section, "updated_at": now}
+    atomic_write_json(data_dir / SUMMARY_FILE, summary)
+    return summary
+
+
+def format_progress(prompts: Dict) -> str:
+    """Format a prompt summary section as the progress report."""
+    total = prompts["total"]
+    completed = prompts["by_status"].get("completed", 0)
+    pending = prompts["by_status"].get("pending", 0)
+    lengths = prompts["response_chars"]
+    avg_len = lengths["sum"] / lengths["count"] if lengths["count"] else 0
+    pct = completed / total * 100 if total else 0
+
+    return f"""{'='*50}
+TRAINING DATA PROGRESS
+{'='*50}
+Total: {total}
+Completed: {completed} ({pct:.1f}%)
+Pending: {pending}
+
+Response lengths:
+  Avg: {avg_len:.0f} chars
+  Min: {lengths['min']}
+  Max: {lengths['max']}
+{'='*50}"""